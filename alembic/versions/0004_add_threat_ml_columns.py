@@ -0,0 +1,28 @@
+"""add ml_label / ml_confidence to threats
+
+Revision ID: 0004_threat_ml_columns
+Revises: 0003_add_clean_text
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0004_threat_ml_columns"
+down_revision = "0003_add_clean_text"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # hybrid_detector has been writing these columns; databases created from
+    # the migrations alone were missing them, older dev databases already have them
+    existing = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("threats")}
+    if "ml_label" not in existing:
+        op.add_column("threats", sa.Column("ml_label", sa.Integer(), nullable=True))
+    if "ml_confidence" not in existing:
+        op.add_column("threats", sa.Column("ml_confidence", sa.Float(), nullable=True))
+
+def downgrade():
+    op.drop_column("threats", "ml_confidence")
+    op.drop_column("threats", "ml_label")
@@ -0,0 +1,28 @@
+"""add content_hash / duplicate_of to crawled_pages
+
+Revision ID: 0005_page_content_hash
+Revises: 0004_threat_ml_columns
+Create Date: 2026-10-17 00:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0005_page_content_hash"
+down_revision = "0004_threat_ml_columns"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("crawled_pages", sa.Column("content_hash", sa.String(length=64), nullable=True))
+    op.add_column(
+        "crawled_pages",
+        sa.Column("duplicate_of", sa.Integer(), sa.ForeignKey("crawled_pages.id", ondelete="SET NULL"), nullable=True),
+    )
+    op.create_index("ix_crawled_pages_content_hash", "crawled_pages", ["content_hash"])
+
+def downgrade():
+    op.drop_index("ix_crawled_pages_content_hash", table_name="crawled_pages")
+    op.drop_column("crawled_pages", "duplicate_of")
+    op.drop_column("crawled_pages", "content_hash")
@@ -0,0 +1,23 @@
+"""add minhash signature to crawled_pages
+
+Revision ID: 0006_page_minhash
+Revises: 0005_page_content_hash
+Create Date: 2026-10-17 00:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0006_page_minhash"
+down_revision = "0005_page_content_hash"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # MinHash signature of clean_text (64 x uint32); the near-duplicate LSH
+    # index is built in memory from this column, so no DB index is needed
+    op.add_column("crawled_pages", sa.Column("minhash", sa.LargeBinary(), nullable=True))
+
+def downgrade():
+    op.drop_column("crawled_pages", "minhash")
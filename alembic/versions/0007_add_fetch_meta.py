@@ -0,0 +1,36 @@
+"""add fetch_meta table
+
+Revision ID: 0007_fetch_meta
+Revises: 0006_page_minhash
+Create Date: 2026-10-17 00:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0007_fetch_meta"
+down_revision = "0006_page_minhash"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "fetch_meta",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("url", sa.Text(), nullable=False, unique=True),
+        sa.Column("etag", sa.String(length=255), nullable=True),
+        sa.Column("last_modified", sa.String(length=64), nullable=True),
+        sa.Column("content_length", sa.Integer(), nullable=True),
+        sa.Column("body_hash", sa.String(length=64), nullable=True),
+        sa.Column("status_code", sa.Integer(), nullable=True),
+        sa.Column("fetched_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("changed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("next_due_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("revisit_seconds", sa.Float(), nullable=True),
+        sa.Column("fetch_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("change_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+def downgrade():
+    op.drop_table("fetch_meta")
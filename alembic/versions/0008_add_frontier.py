@@ -0,0 +1,36 @@
+"""add frontier table
+
+Revision ID: 0008_frontier
+Revises: 0007_fetch_meta
+Create Date: 2026-10-17 00:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0008_frontier"
+down_revision = "0007_fetch_meta"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "frontier",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("org_id", sa.Integer(), sa.ForeignKey("orgs.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("url", sa.Text(), nullable=False),
+        sa.Column("source", sa.String(length=50), nullable=False, server_default="seed"),
+        sa.Column("added_at", sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column("first_fetched_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("last_fetched_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("fetch_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("change_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("failure_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("threat_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("priority", sa.Float(), nullable=True),
+        sa.UniqueConstraint("org_id", "url", name="uq_frontier_org_url"),
+    )
+
+def downgrade():
+    op.drop_table("frontier")
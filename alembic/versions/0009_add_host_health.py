@@ -0,0 +1,35 @@
+"""add host_health table
+
+Revision ID: 0009_host_health
+Revises: 0008_frontier
+Create Date: 2026-10-17 00:50:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0009_host_health"
+down_revision = "0008_frontier"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "host_health",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("host", sa.String(length=255), nullable=False, unique=True),
+        sa.Column("state", sa.String(length=20), nullable=False, server_default="closed"),
+        sa.Column("consecutive_failures", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("total_failures", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("total_successes", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("last_success_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("last_failure_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("next_probe_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("probe_interval_seconds", sa.Float(), nullable=True),
+        sa.Column("failure_seconds", sa.Float(), nullable=True),
+    )
+
+def downgrade():
+    op.drop_table("host_health")
@@ -0,0 +1,20 @@
+"""index threats by indicator
+
+Revision ID: 0010_threat_indicator
+Revises: 0009_host_health
+Create Date: 2026-10-17 01:10:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0010_threat_indicator"
+down_revision = "0009_host_health"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index("ix_threats_indicator", "threats", ["indicator_type", "indicator"])
+
+def downgrade():
+    op.drop_index("ix_threats_indicator", table_name="threats")
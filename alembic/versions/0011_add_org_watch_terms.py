@@ -0,0 +1,32 @@
+"""add org_watch_terms table
+
+Revision ID: 0011_org_watch_terms
+Revises: 0010_threat_indicator
+Create Date: 2026-10-17 01:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0011_org_watch_terms"
+down_revision = "0010_threat_indicator"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "org_watch_terms",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("org_id", sa.Integer(), sa.ForeignKey("orgs.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("kind", sa.String(length=20), nullable=False),
+        sa.Column("term", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.UniqueConstraint("org_id", "kind", "term", name="uq_org_watch_term"),
+    )
+    op.create_index("ix_org_watch_terms_org_id", "org_watch_terms", ["org_id"])
+
+def downgrade():
+    op.drop_index("ix_org_watch_terms_org_id", table_name="org_watch_terms")
+    op.drop_table("org_watch_terms")
@@ -0,0 +1,32 @@
+"""key fetch_meta by (org_id, url)
+
+Revision ID: 0012_fetch_meta_per_org
+Revises: 0011_org_watch_terms
+Create Date: 2026-10-17 02:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0012_fetch_meta_per_org"
+down_revision = "0011_org_watch_terms"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # URL-only rows cannot be attributed to an org (and may have been recorded
+    # for pages that were never saved): start the cache over
+    op.execute("DELETE FROM fetch_meta")
+    op.drop_constraint("fetch_meta_url_key", "fetch_meta", type_="unique")
+    op.add_column(
+        "fetch_meta",
+        sa.Column("org_id", sa.Integer(), sa.ForeignKey("orgs.id", ondelete="CASCADE"), nullable=False),
+    )
+    op.create_unique_constraint("uq_fetch_meta_org_url", "fetch_meta", ["org_id", "url"])
+
+def downgrade():
+    op.execute("DELETE FROM fetch_meta")
+    op.drop_constraint("uq_fetch_meta_org_url", "fetch_meta", type_="unique")
+    op.drop_column("fetch_meta", "org_id")
+    op.create_unique_constraint("fetch_meta_url_key", "fetch_meta", ["url"])
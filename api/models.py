@@ -39,6 +39,10 @@ class CrawledPage(Base):
     content_snippet = sa.Column(sa.Text, nullable=True)  # short snippet for quick listing
     fetched_at = sa.Column(sa.DateTime(timezone=True), default=datetime.datetime.utcnow)
     clean_text = Column(Text, nullable=True)
+    content_hash = sa.Column(sa.String(64), nullable=True, index=True)  # sha256 of clean_text
+    minhash = sa.Column(sa.LargeBinary, nullable=True)  # MinHash signature of clean_text (near-duplicate index)
+    # repeat fetch of already-analyzed content: content/clean_text are not stored again
+    duplicate_of = sa.Column(sa.Integer, sa.ForeignKey("crawled_pages.id", ondelete="SET NULL"), nullable=True)
 
     org = relationship("Org", back_populates="crawled_pages")
     query = relationship("Query", back_populates="crawled_pages")
@@ -47,16 +51,90 @@ class CrawledPage(Base):
 
 class Threat(Base):
     __tablename__ = "threats"
+    # look up a specific leaked credential / wallet / card without scanning clean_text
+    # (IOC indicators are cut to IOC_MAX_CHARS in hybrid_detector so rows fit a btree entry)
+    __table_args__ = (sa.Index("ix_threats_indicator", "indicator_type", "indicator"),)
     id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
     org_id = sa.Column(sa.Integer, sa.ForeignKey("orgs.id", ondelete="CASCADE"), nullable=False)
     crawled_page_id = sa.Column(sa.Integer, sa.ForeignKey("crawled_pages.id", ondelete="CASCADE"), nullable=True)
     indicator_type = sa.Column(sa.String(100), nullable=False)   # e.g. "credential-leak", "btc-address", "email"
     indicator = sa.Column(sa.Text, nullable=False)               # matching string / pattern
     severity = sa.Column(sa.String(20), nullable=False, default="low")  # low/medium/high/critical
-    evidence = sa.Column(sa.Text, nullable=True)                 # optional snippet or JSON
+    evidence = sa.Column(sa.Text, nullable=True)                 # snippet, or JSON {offsets, count, snippet} for IOCs
+    ml_label = sa.Column(sa.Integer, nullable=True)              # classifier label id
+    ml_confidence = sa.Column(sa.Float, nullable=True)
     created_at = sa.Column(sa.DateTime(timezone=True), default=datetime.datetime.utcnow)
 
     # relationships
     org = relationship("Org")
     crawled_page = relationship("CrawledPage")
 
+
+
+class FetchMeta(Base):
+    """Per-(org, URL) HTTP validators and revisit schedule (conditional re-fetch)."""
+    __tablename__ = "fetch_meta"
+    __table_args__ = (sa.UniqueConstraint("org_id", "url", name="uq_fetch_meta_org_url"),)
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    org_id = sa.Column(sa.Integer, sa.ForeignKey("orgs.id", ondelete="CASCADE"), nullable=False)
+    url = sa.Column(sa.Text, nullable=False)
+    etag = sa.Column(sa.String(255), nullable=True)
+    last_modified = sa.Column(sa.String(64), nullable=True)
+    content_length = sa.Column(sa.Integer, nullable=True)
+    body_hash = sa.Column(sa.String(64), nullable=True)          # sha256 of the raw body
+    status_code = sa.Column(sa.Integer, nullable=True)
+    fetched_at = sa.Column(sa.DateTime(timezone=True), nullable=True)
+    changed_at = sa.Column(sa.DateTime(timezone=True), nullable=True)
+    next_due_at = sa.Column(sa.DateTime(timezone=True), nullable=True)
+    revisit_seconds = sa.Column(sa.Float, nullable=True)
+    fetch_count = sa.Column(sa.Integer, nullable=False, default=0)
+    change_count = sa.Column(sa.Integer, nullable=False, default=0)
+
+
+class FrontierUrl(Base):
+    """Per-org crawl frontier: revisit statistics used to rank URLs each run."""
+    __tablename__ = "frontier"
+    __table_args__ = (sa.UniqueConstraint("org_id", "url", name="uq_frontier_org_url"),)
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    org_id = sa.Column(sa.Integer, sa.ForeignKey("orgs.id", ondelete="CASCADE"), nullable=False)
+    url = sa.Column(sa.Text, nullable=False)
+    source = sa.Column(sa.String(50), nullable=False, default="seed")
+    added_at = sa.Column(sa.DateTime(timezone=True), default=datetime.datetime.utcnow)
+    first_fetched_at = sa.Column(sa.DateTime(timezone=True), nullable=True)
+    last_fetched_at = sa.Column(sa.DateTime(timezone=True), nullable=True)
+    fetch_count = sa.Column(sa.Integer, nullable=False, default=0)
+    change_count = sa.Column(sa.Integer, nullable=False, default=0)
+    failure_count = sa.Column(sa.Integer, nullable=False, default=0)   # consecutive failures
+    threat_count = sa.Column(sa.Integer, nullable=False, default=0)
+    priority = sa.Column(sa.Float, nullable=True)                     # expected value at last planning
+
+
+class HostHealth(Base):
+    """Per-host reachability and circuit-breaker state (dead onion tracking)."""
+    __tablename__ = "host_health"
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    host = sa.Column(sa.String(255), nullable=False, unique=True)
+    state = sa.Column(sa.String(20), nullable=False, default="closed")  # closed | open
+    consecutive_failures = sa.Column(sa.Integer, nullable=False, default=0)
+    total_failures = sa.Column(sa.Integer, nullable=False, default=0)
+    total_successes = sa.Column(sa.Integer, nullable=False, default=0)
+    last_error = sa.Column(sa.Text, nullable=True)
+    last_success_at = sa.Column(sa.DateTime(timezone=True), nullable=True)
+    last_failure_at = sa.Column(sa.DateTime(timezone=True), nullable=True)
+    next_probe_at = sa.Column(sa.DateTime(timezone=True), nullable=True)
+    probe_interval_seconds = sa.Column(sa.Float, nullable=True)
+    failure_seconds = sa.Column(sa.Float, nullable=True)              # EWMA of time spent on a failed fetch
+
+
+class OrgWatchTerm(Base):
+    """Per-org watchlist term; the org's name is always an implicit brand term."""
+    __tablename__ = "org_watch_terms"
+    __table_args__ = (sa.UniqueConstraint("org_id", "kind", "term", name="uq_org_watch_term"),)
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    org_id = sa.Column(sa.Integer, sa.ForeignKey("orgs.id", ondelete="CASCADE"), nullable=False, index=True)
+    kind = sa.Column(sa.String(20), nullable=False)       # brand | domain | email | ip_range
+    term = sa.Column(sa.Text, nullable=False)
+    created_at = sa.Column(sa.DateTime(timezone=True), default=datetime.datetime.utcnow)
+    updated_at = sa.Column(sa.DateTime(timezone=True), default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+    org = relationship("Org")
@@ -0,0 +1,450 @@
+# services/crawler/batch_writer.py
+"""
+Batched persistence for crawled pages and threats.
+
+save_page_to_db costs several round trips per page (org lookup, a Query row
+per URL, page insert + refresh, a separate transaction for the threat).
+BatchWriter buffers pages instead and flushes them together:
+
+- hybrid detection runs once per flush over all buffered pages (shared
+  cascade / DarkBERT batches), outside the DB transaction
+- one transaction per flush: missing orgs/queries, then pages and threats
+  (hybrid verdict + one row per distinct IOC of each page) as multi-row INSERTs (SQLAlchemy insertmanyvalues; RETURNING keeps page ids
+  in parameter order)
+- org ids and (org, query_text) query ids are cached, so repeated
+  query_text="seed-run" reuses one Query row per org instead of one per URL
+- flushes when DB_BATCH_SIZE pages are buffered or the oldest buffered page
+  is DB_BATCH_SECONDS old
+- pages whose content_hash was already analyzed (earlier run or earlier in
+  the batch) are stored as links (duplicate_of) without content and skip
+  detection; verdicts are copied when the duplicate belongs to another org
+  that the page is relevant to
+- near duplicates (MinHash similarity to an analyzed page above
+  NEARDUP_THRESHOLD) are linked the same way but keep their text and get
+  their own IOC rows; only the classifier verdict is copied
+- threats of a page are stored for its org if the page is relevant to it,
+  and for every other org whose watchlist (services/preprocessor/watchlist.py)
+  matches it, whether or not the page mentions its own org
+
+Callers that must know when a page is durable (queue workers acking a job)
+pass a callback; it gets (ok, error) after the flush commits or fails.
+"""
+
+import os
+import time
+import atexit
+import threading
+from datetime import datetime
+from typing import Callable, Optional
+
+from sqlalchemy import insert
+
+from api.db import engine as default_engine
+from api.models import Query, CrawledPage, Threat
+from services.crawler.crawler_db import (
+    clean_for_storage,
+    ensure_orgs,
+    find_analyzed_pages,
+    find_near_duplicate,
+    index_analyzed_page,
+    copy_threats,
+    dedupe_stats,
+    VERDICT_TYPES,
+)
+from services.preprocessor.fingerprint import content_hash
+from services.preprocessor import minhash
+from services.preprocessor import hybrid_detector
+from services.preprocessor.watchlist import org_mentioned, recipient_org_ids
+
+
+BATCH_WRITES = os.getenv("DB_BATCH_WRITES", "true").lower() in ("1", "true", "yes")
+BATCH_SIZE = int(os.getenv("DB_BATCH_SIZE", "50"))
+BATCH_SECONDS = float(os.getenv("DB_BATCH_SECONDS", "5"))
+
+
+class BatchWriter:
+    def __init__(
+        self,
+        engine=None,
+        max_rows: int = BATCH_SIZE,
+        max_seconds: float = BATCH_SECONDS,
+        analyze: bool = True,
+    ):
+        self.engine = engine or default_engine
+        self.max_rows = max(1, max_rows)
+        self.max_seconds = max_seconds
+        self.analyze = analyze
+
+        self._buffer = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        self._org_ids = {}
+        self._query_ids = {}
+
+        self._stop = threading.Event()
+        self._ticker = None
+
+        self.stats = {
+            "flushes": 0, "pages": 0, "duplicates": 0, "near_duplicates": 0,
+            "threats": 0, "failed_pages": 0, "db_seconds": 0.0,
+        }
+
+    # ---------------- BUFFER ----------------
+
+    def add_page(
+        self,
+        org_name: str,
+        url: str,
+        html: str,
+        status_code: Optional[int] = None,
+        query_text: Optional[str] = None,
+        callback: Optional[Callable] = None,
+    ) -> bool:
+        """Clean and buffer one page; False when the page is skipped (nothing to store)."""
+        try:
+            clean_text_value = clean_for_storage(url, html)
+        except Exception as e:
+            if callback:
+                callback(False, e)
+            raise
+        if clean_text_value is None:
+            if callback:
+                callback(True, None)
+            return False
+
+        page = {
+            "org_name": org_name,
+            "query_text": query_text,
+            "url": url,
+            "status_code": status_code,
+            "content": html,
+            "content_snippet": clean_text_value[:500],
+            "clean_text": clean_text_value,
+            "content_hash": content_hash(clean_text_value),
+            "minhash": minhash.signature(clean_text_value),
+            "fetched_at": datetime.utcnow(),
+            "callback": callback,
+        }
+
+        with self._lock:
+            self._buffer.append(page)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            full = len(self._buffer) >= self.max_rows
+
+        self._ensure_ticker()
+        if full:
+            self.flush()
+        return True
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._buffer)
+
+    def _ensure_ticker(self):
+        if self._ticker is None and self.max_seconds > 0:
+            with self._lock:
+                if self._ticker is None:
+                    self._ticker = threading.Thread(target=self._tick, name="batch-writer", daemon=True)
+                    self._ticker.start()
+
+    def _tick(self):
+        interval = min(1.0, self.max_seconds)
+        while not self._stop.wait(interval):
+            with self._lock:
+                due = self._oldest is not None and time.monotonic() - self._oldest >= self.max_seconds
+            if due:
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(" DB batch flush failed:", e)
+
+    # ---------------- FLUSH ----------------
+
+    def flush(self) -> int:
+        """Write everything buffered; returns the number of pages written."""
+        with self._flush_lock:
+            with self._lock:
+                pages, self._buffer, self._oldest = self._buffer, [], None
+            if not pages:
+                return 0
+
+            started = time.monotonic()
+            try:
+                originals = self._mark_duplicates(pages)
+            except Exception as e:
+                self.stats["failed_pages"] += len(pages)
+                print(f" DB batch of {len(pages)} pages failed:", e)
+                self._notify(pages, False, e)
+                raise
+            lookup_s = time.monotonic() - started
+
+            # only content seen for the first time goes through detection
+            threats = [[] for _ in pages]
+            try:
+                # org names enable the watchlist relevance filter, as in analyze_page
+                if self.analyze and originals:
+                    page_rows = hybrid_detector.page_threat_rows(
+                        [pages[i]["clean_text"] for i in originals],
+                        [pages[i]["org_name"] for i in originals],
+                    )
+                    for i, (rows, relevance) in zip(originals, page_rows):
+                        threats[i] = rows
+                        pages[i]["relevance"] = relevance
+                # near duplicates: own IOCs, the verdict is copied from the original in _write
+                near = [i for i, p in enumerate(pages) if p["near"]]
+                if self.analyze and near:
+                    ioc_rows = hybrid_detector.ioc_threat_rows(
+                        [pages[i]["clean_text"] for i in near],
+                        [pages[i]["org_name"] for i in near],
+                    )
+                    for i, (rows, relevance) in zip(near, ioc_rows):
+                        threats[i] = rows
+                        pages[i]["relevance"] = relevance
+                # cross-org copies only go to orgs the duplicate is relevant to
+                for p in pages:
+                    if p["duplicate_of"] is not None:
+                        p["relevant"] = p["relevance"][0] if "relevance" in p else org_mentioned(
+                            p["org_name"], p["clean_text"]
+                        )
+            except Exception as e:
+                self.stats["failed_pages"] += len(pages)
+                print(f" Detection for batch of {len(pages)} pages failed:", e)
+                self._notify(pages, False, e)
+                raise
+
+            started = time.monotonic()
+            try:
+                n_threats = self._write(pages, threats)
+            except Exception as e:
+                self.stats["failed_pages"] += len(pages)
+                print(f" DB batch of {len(pages)} pages failed:", e)
+                self._notify(pages, False, e)
+                raise
+
+            elapsed = time.monotonic() - started + lookup_s
+            # analyzed pages become near-duplicate candidates only once committed
+            for i in originals:
+                index_analyzed_page(pages[i]["minhash"], pages[i]["page_id"], pages[i]["org_id"])
+
+            n_dup = len(pages) - len(originals)
+            n_near = sum(1 for p in pages if p["near"])
+            self.stats["flushes"] += 1
+            self.stats["pages"] += len(pages)
+            self.stats["duplicates"] += n_dup
+            self.stats["near_duplicates"] += n_near
+            dedupe_stats["pages"] += len(pages)
+            dedupe_stats["duplicates"] += n_dup
+            dedupe_stats["near_duplicates"] += n_near
+            self.stats["threats"] += n_threats
+            self.stats["db_seconds"] += elapsed
+            print(
+                f"[OK] Flushed {len(pages)} pages ({n_dup} duplicates) / {n_threats} threats "
+                f"in {elapsed * 1000:.0f}ms"
+            )
+
+            self._notify(pages, True, None)
+            return len(pages)
+
+    def _mark_duplicates(self, pages):
+        """
+        Sets page["duplicate_of"] to ("page", (id, org_id)) for content analyzed
+        before, or ("batch", index) for a repeat within this batch (exact
+        content_hash first, then MinHash near duplicates); returns the indexes
+        of pages that need analysis.
+        """
+        with self.engine.connect() as conn:
+            known = find_analyzed_pages(conn, {p["content_hash"] for p in pages})
+
+        first_seen, originals = {}, []
+        batch_index = minhash.MinHashIndex() if minhash.ENABLED else None
+        for i, p in enumerate(pages):
+            h, sig = p["content_hash"], p["minhash"]
+            p["duplicate_of"], p["near"] = None, False
+
+            if h in known:
+                p["duplicate_of"] = ("page", known[h])
+            elif h in first_seen:
+                p["duplicate_of"] = ("batch", first_seen[h])
+            elif sig is not None:
+                near = find_near_duplicate(sig)
+                if near:
+                    p["duplicate_of"] = ("page", near)
+                elif batch_index is not None:
+                    hit = batch_index.query(sig)
+                    if hit:
+                        p["duplicate_of"] = ("batch", hit[1])
+                p["near"] = p["duplicate_of"] is not None
+
+            if p["duplicate_of"] is None:
+                first_seen[h] = i
+                originals.append(i)
+                if batch_index is not None and sig is not None:
+                    batch_index.add(sig, i)
+        return originals
+
+    def _write(self, pages, threats) -> int:
+        new_orgs, new_queries = {}, {}
+
+        with self.engine.begin() as conn:
+            # --- orgs ---
+            org_ids = dict(self._org_ids)
+            missing = {p["org_name"] for p in pages} - org_ids.keys()
+            if missing:
+                new_orgs = ensure_orgs(conn, missing)
+                org_ids.update(new_orgs)
+
+            # --- queries (one per org + query_text) ---
+            query_ids = dict(self._query_ids)
+            wanted = sorted({
+                (org_ids[p["org_name"]], p["query_text"])
+                for p in pages if p["query_text"]
+            } - query_ids.keys())
+            if wanted:
+                rows = conn.execute(
+                    insert(Query).returning(Query.id, sort_by_parameter_order=True),
+                    [{"org_id": o, "q_text": q, "status": "created"} for o, q in wanted],
+                )
+                for key, (query_id,) in zip(wanted, rows):
+                    new_queries[key] = query_id
+                query_ids.update(new_queries)
+
+            # --- pages: originals first, so in-batch duplicates can point at them ---
+            def page_row(p, duplicate_of=None):
+                row = {
+                    "org_id": org_ids[p["org_name"]],
+                    "query_id": query_ids.get((org_ids[p["org_name"]], p["query_text"])),
+                    "url": p["url"],
+                    "status_code": p["status_code"],
+                    "content_snippet": p["content_snippet"],
+                    "content_hash": p["content_hash"],
+                    "minhash": minhash.to_bytes(p["minhash"]),
+                    "fetched_at": p["fetched_at"],
+                    "duplicate_of": duplicate_of,
+                    "content": None,
+                    "clean_text": None,
+                }
+                if duplicate_of is None or p["near"]:
+                    row["content"] = p["content"]
+                    row["clean_text"] = p["clean_text"]
+                return row
+
+            originals = [i for i, p in enumerate(pages) if p["duplicate_of"] is None]
+            duplicates = [i for i, p in enumerate(pages) if p["duplicate_of"] is not None]
+
+            page_ids = [None] * len(pages)
+            if originals:
+                ids = conn.execute(
+                    insert(CrawledPage).returning(CrawledPage.id, sort_by_parameter_order=True),
+                    [page_row(pages[i]) for i in originals],
+                )
+                for i, (page_id,) in zip(originals, ids):
+                    page_ids[i] = page_id
+                    pages[i]["page_id"] = page_id
+                    pages[i]["org_id"] = org_ids[pages[i]["org_name"]]
+
+            # --- threats ---
+            # the page's org (if relevant) and the orgs whose watchlist matches it get the same rows
+            def own_threat_rows(indexes):
+                rows = []
+                for i in indexes:
+                    if not threats[i]:
+                        continue
+                    for org_id in recipient_org_ids(org_ids[pages[i]["org_name"]], pages[i]["relevance"]):
+                        rows += [{"org_id": org_id, "crawled_page_id": page_ids[i], **t} for t in threats[i]]
+                return rows
+
+            threat_rows = own_threat_rows(originals)
+            if threat_rows:
+                conn.execute(insert(Threat), threat_rows)
+
+            # --- duplicates: link to the analyzed page, reuse its verdicts for other orgs ---
+            # (exact duplicates get all its rows; near duplicates only the verdict,
+            # plus their own IOC rows)
+            copied = 0
+            if duplicates:
+                links = []
+                for i in duplicates:
+                    kind, ref = pages[i]["duplicate_of"]
+                    if kind == "page":
+                        links.append(ref)
+                    else:
+                        links.append((page_ids[ref], org_ids[pages[ref]["org_name"]]))
+
+                ids = conn.execute(
+                    insert(CrawledPage).returning(CrawledPage.id, sort_by_parameter_order=True),
+                    [page_row(pages[i], source_id) for i, (source_id, _) in zip(duplicates, links)],
+                )
+                copies, near_copies = [], []
+                for i, (page_id,), (source_id, source_org) in zip(duplicates, ids, links):
+                    page_ids[i] = page_id
+                    org_id = org_ids[pages[i]["org_name"]]
+                    if org_id != source_org and pages[i]["relevant"]:
+                        (near_copies if pages[i]["near"] else copies).append((source_id, org_id, page_id))
+                copied = copy_threats(conn, copies) + copy_threats(conn, near_copies, VERDICT_TYPES)
+
+                near_rows = own_threat_rows([i for i in duplicates if pages[i]["near"]])
+                if near_rows:
+                    conn.execute(insert(Threat), near_rows)
+                copied += len(near_rows)
+
+        # caches only learn ids from committed transactions
+        self._org_ids.update(new_orgs)
+        self._query_ids.update(new_queries)
+        return len(threat_rows) + copied
+
+    @staticmethod
+    def _notify(pages, ok: bool, error):
+        for p in pages:
+            if p["callback"]:
+                try:
+                    p["callback"](ok, error)
+                except Exception as e:
+                    print(" Batch writer callback failed:", e)
+
+    # ---------------- LIFECYCLE ----------------
+
+    def close(self):
+        self._stop.set()
+        if self._ticker is not None:
+            self._ticker.join()
+            self._ticker = None
+        try:
+            self.flush()
+        except Exception as e:
+            print(" DB batch flush on close failed:", e)
+        self._stop.clear()
+
+    def log_stats(self):
+        s = self.stats
+        rate = s["pages"] / s["db_seconds"] if s["db_seconds"] else 0.0
+        hit_rate = s["duplicates"] / s["pages"] if s["pages"] else 0.0
+        print(
+            f" DB batch writer: flushes={s['flushes']} pages={s['pages']} threats={s['threats']} "
+            f"failed_pages={s['failed_pages']} db_time={s['db_seconds']:.2f}s ({rate:.0f} pages/sec) "
+            f"dedupe_hits={s['duplicates']} ({hit_rate:.1%}, near={s['near_duplicates']})"
+        )
+
+
+# ---------------- SHARED WRITER ----------------
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_batch_writer() -> BatchWriter:
+    """Process-wide writer; flushed at interpreter exit as a safety net."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = BatchWriter()
+            atexit.register(_writer.close)
+        return _writer
+
+
+def close_batch_writer():
+    if _writer is not None:
+        _writer.close()
+        _writer.log_stats()
@@ -0,0 +1,60 @@
+# services/crawler/bloom.py
+"""
+Bloom filter seen-set for discovered URLs.
+
+A focused crawl sees every outlink of every page, most of them repeatedly;
+a set of URL strings grows with all of them, a Bloom filter costs a fixed
+~1.8 bytes per URL at 0.1% false positives (a false positive means one
+discovered link is not followed, which a crawl can afford).
+
+usage:
+    seen = BloomFilter(capacity=1_000_000, error_rate=0.001)
+    if seen.add(url):      # True when url was not (probably) seen before
+        ...
+"""
+
+import math
+import hashlib
+
+
+class BloomFilter:
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        # double hashing (Kirsch-Mitzenmacher): k positions from one 128-bit digest
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        m = self.num_bits
+        return [(h1 + i * h2) % m for i in range(self.num_hashes)]
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    def add(self, item: str) -> bool:
+        """Insert item; returns True if it was not already (probably) present."""
+        bits = self._bits
+        new = False
+        for p in self._positions(item):
+            mask = 1 << (p & 7)
+            if not bits[p >> 3] & mask:
+                bits[p >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self._bits)
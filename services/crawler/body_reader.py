@@ -0,0 +1,262 @@
+# services/crawler/body_reader.py
+"""
+Streaming response bodies with size / time caps.
+
+r.text buffers the whole response before anything looks at it, so a
+multi-hundred-MB dump or a tarpit onion dripping bytes forever ends up in
+worker memory. BodyReader is fed chunks as they arrive instead:
+
+- binaries are rejected on the first chunk: by Content-Type (images, archives,
+  PDFs, executables, ...) or by magic bytes / NULs when the type is missing
+  or generic (application/octet-stream)
+- text is decoded incrementally (charset from Content-Type, else <meta
+  charset> in the first chunk, else UTF-8), so only decoded text is kept
+- past FETCH_MAX_BYTES (or FETCH_MAX_SECONDS of reading) the body is
+  truncated, or rejected with FETCH_OVERSIZE=reject; a Content-Length above
+  the cap is rejected before the body is read
+- the time cap is a wall-clock deadline, not a check per chunk: reads return
+  whatever has arrived, and a read still blocked at the deadline is aborted
+  (asyncio.timeout for httpx, a timer shutting the socket down for requests)
+- the connection is closed instead of drained, so nothing past the cap is read
+- Playwright-rendered HTML gets the same byte cap (cap_rendered)
+
+Env:
+  FETCH_MAX_BYTES     default 5242880 (5 MiB, decoded body)
+  FETCH_MAX_SECONDS   default 120 (total time reading one body)
+  FETCH_OVERSIZE      truncate | reject (default truncate)
+"""
+
+import os
+import re
+import time
+import socket
+import asyncio
+import codecs
+import threading
+from typing import Optional
+
+MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(5 * 1024 * 1024)))
+MAX_SECONDS = float(os.getenv("FETCH_MAX_SECONDS", "120"))
+OVERSIZE = os.getenv("FETCH_OVERSIZE", "truncate").lower()
+CHUNK_SIZE = 16 * 1024
+
+BINARY_TYPES = (
+    "image/", "audio/", "video/", "font/",
+    "application/zip", "application/gzip", "application/x-gzip", "application/x-7z",
+    "application/x-rar", "application/vnd.rar", "application/x-tar", "application/x-bzip",
+    "application/x-xz", "application/pdf", "application/msword", "application/vnd.",
+    "application/x-msdownload", "application/x-executable", "application/x-sharedlib",
+    "application/wasm", "application/java-archive",
+)
+MAGIC = (
+    b"PK\x03\x04", b"\x1f\x8b", b"7z\xbc\xaf\x27\x1c", b"Rar!", b"%PDF", b"\x89PNG",
+    b"\xff\xd8\xff", b"GIF8", b"\x7fELF", b"MZ", b"BZh", b"\xfd7zXZ", b"OggS", b"ID3",
+)
+_META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([A-Za-z0-9_.:-]+)""", re.I)
+
+stream_stats = {
+    "pages": 0,
+    "bytes_read": 0,
+    "truncated": 0,
+    "rejected_binary": 0,
+    "rejected_oversize": 0,
+    "bytes_saved": 0,       # declared Content-Length not read (unknown lengths count 0)
+}
+_stats_lock = threading.Lock()
+
+
+def _count(**kwargs):
+    with _stats_lock:
+        for key, n in kwargs.items():
+            stream_stats[key] += n
+
+
+class BodyRejected(Exception):
+    """Response body not worth keeping (binary or oversized); not retried."""
+
+
+def _charset(content_type: str) -> Optional[str]:
+    for param in content_type.split(";")[1:]:
+        key, _, value = param.strip().partition("=")
+        if key.lower() == "charset" and value:
+            return value.strip("\"' ")
+    return None
+
+
+def _codec(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+def looks_binary(content_type: str, head: bytes) -> bool:
+    mime = content_type.split(";")[0].strip().lower()
+    if mime.startswith(BINARY_TYPES):
+        return True
+    if mime and not mime.startswith("application/octet-stream") and (
+        mime.startswith("text/") or "html" in mime or "xml" in mime or "json" in mime
+    ):
+        return False
+    return head.startswith(MAGIC) or b"\x00" in head[:1024]
+
+
+class BodyReader:
+    def __init__(self, url: str, headers, max_bytes: int = MAX_BYTES, max_seconds: float = MAX_SECONDS):
+        self.url = url
+        self.max_bytes = max_bytes
+        self.deadline = time.monotonic() + max_seconds
+        self.content_type = headers.get("Content-Type", "") or ""
+        try:
+            self.declared = int(headers.get("Content-Length") or 0) or None
+        except ValueError:
+            self.declared = None
+        self.bytes_read = 0
+        self.truncated = False
+        self._decoder = None
+        self._parts = []
+
+        if self.declared and self.declared > max_bytes and OVERSIZE == "reject":
+            self._reject("rejected_oversize", f"Content-Length {self.declared} > {max_bytes}", saved=self.declared)
+
+    def _reject(self, key: str, reason: str, saved: int = 0):
+        _count(**{key: 1, "bytes_saved": saved, "bytes_read": self.bytes_read})
+        raise BodyRejected(f"{reason} ({self.url})")
+
+    def _start(self, head: bytes):
+        if looks_binary(self.content_type, head):
+            self._reject("rejected_binary", f"binary content ({self.content_type or 'sniffed'})",
+                         saved=max(0, (self.declared or 0) - len(head)))
+        meta = _META_CHARSET_RE.search(head[:4096])
+        encoding = (
+            _codec(_charset(self.content_type))
+            or _codec(meta.group(1).decode("ascii", "ignore") if meta else None)
+            or "utf-8"
+        )
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+
+    def feed(self, chunk: bytes) -> bool:
+        """Consume one chunk; False once the cap is hit (stop reading)."""
+        if not chunk:
+            return True
+        if self._decoder is None:
+            self._start(chunk)
+
+        room = self.max_bytes - self.bytes_read
+        if len(chunk) > room:
+            if OVERSIZE == "reject":
+                self._reject("rejected_oversize", "body over size cap",
+                             saved=max(0, (self.declared or 0) - self.bytes_read))
+            chunk = chunk[:max(0, room)]
+            self.truncated = True
+
+        self.bytes_read += len(chunk)
+        self._parts.append(self._decoder.decode(chunk))
+        return not self.truncated
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    def timed_out(self):
+        """The time cap stopped the read with the body still arriving."""
+        if OVERSIZE == "reject":
+            self._reject("rejected_oversize", "body over time cap",
+                         saved=max(0, (self.declared or 0) - self.bytes_read))
+        self.truncated = True
+
+    def text(self) -> str:
+        if self._decoder is not None:
+            self._parts.append(self._decoder.decode(b"", final=True))
+        saved = max(0, (self.declared or 0) - self.bytes_read) if self.truncated else 0
+        _count(pages=1, bytes_read=self.bytes_read, truncated=1 if self.truncated else 0, bytes_saved=saved)
+        if self.truncated:
+            print(f" [TRUNCATED] {self.url} after {self.bytes_read / 1024:.0f}KiB")
+        return "".join(self._parts)
+
+
+def _shutdown_socket(response):
+    """Unblock a read in another thread (closing the response alone does not)."""
+    fp = getattr(getattr(response.raw, "_fp", None), "fp", None)
+    sock = getattr(getattr(fp, "raw", None), "_sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+def read_body(response, url: str) -> str:
+    """Stream a requests response (stream=True) through a BodyReader and close it."""
+    timer = None
+    try:
+        reader = BodyReader(url, response.headers)
+        timer = threading.Timer(reader.remaining(), _shutdown_socket, (response,))
+        timer.daemon = True
+        timer.start()
+        # read1: whatever has arrived (up to CHUNK_SIZE), not a full chunk
+        while True:
+            if not reader.remaining():
+                reader.timed_out()
+                break
+            try:
+                chunk = response.raw.read1(CHUNK_SIZE, decode_content=True)
+            except Exception:
+                if reader.remaining():
+                    raise
+                chunk = b""
+            if not chunk:
+                # a socket shut down by the timer can also read as a clean EOF
+                if not reader.remaining():
+                    reader.timed_out()
+                break
+            if not reader.feed(chunk):
+                break
+        return reader.text()
+    finally:
+        if timer is not None:
+            timer.cancel()
+        response.close()
+
+
+async def read_body_async(response, url: str) -> str:
+    """httpx twin of read_body (response sent with stream=True)."""
+    try:
+        reader = BodyReader(url, response.headers)
+        try:
+            async with asyncio.timeout(reader.remaining()):
+                # no chunk size: chunks are yielded as they arrive
+                async for chunk in response.aiter_bytes():
+                    if not reader.feed(chunk):
+                        break
+        except TimeoutError:
+            reader.timed_out()
+        return reader.text()
+    finally:
+        await response.aclose()
+
+
+def cap_rendered(html: str, url: str, max_bytes: int = MAX_BYTES) -> str:
+    """FETCH_MAX_BYTES for Playwright-rendered HTML (page.content() is not streamed)."""
+    data = html.encode("utf-8")
+    if len(data) <= max_bytes:
+        _count(pages=1, bytes_read=len(data))
+        return html
+    if OVERSIZE == "reject":
+        _count(rejected_oversize=1, bytes_read=len(data))
+        raise BodyRejected(f"rendered page {len(data)} bytes > {max_bytes} ({url})")
+    _count(pages=1, bytes_read=max_bytes, truncated=1)
+    print(f" [TRUNCATED] {url} after {max_bytes / 1024:.0f}KiB (rendered)")
+    return data[:max_bytes].decode("utf-8", "ignore")
+
+
+def log_stream_stats():
+    s = stream_stats
+    if not s["pages"] and not s["rejected_binary"] and not s["rejected_oversize"]:
+        return
+    print(
+        f" Body streaming: pages={s['pages']} read={s['bytes_read'] / 1024:.0f}KiB "
+        f"truncated={s['truncated']} rejected_binary={s['rejected_binary']} "
+        f"rejected_oversize={s['rejected_oversize']} bytes_saved~{s['bytes_saved'] / 1024:.0f}KiB"
+    )
@@ -0,0 +1,246 @@
+# services/crawler/browser_pool.py
+"""
+Long-lived Playwright browser pool for the JS fallback path.
+
+- N Chromium processes x M contexts each, launched once per process
+- contexts are recycled after PLAYWRIGHT_CONTEXT_MAX_PAGES pages (cookies/cache/RAM)
+- images, fonts and media are aborted at the network layer
+- readiness heuristic instead of a fixed sleep: short networkidle wait, then
+  poll until the rendered text length stops changing
+- rendered HTML gets the FETCH_MAX_BYTES cap of body_reader
+
+Playwright's async API runs on a dedicated event-loop thread, so the pool can
+be used from plain threads (crawler_tor) and from asyncio code (crawler_async).
+
+Env:
+  PLAYWRIGHT_BROWSERS, PLAYWRIGHT_CONTEXTS, PLAYWRIGHT_CONTEXT_MAX_PAGES
+"""
+
+import os
+import time
+import atexit
+import asyncio
+import threading
+from typing import Optional
+
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeout
+
+from services.crawler.body_reader import cap_rendered
+
+
+# ---------------- CONFIG ----------------
+
+POOL_BROWSERS = int(os.getenv("PLAYWRIGHT_BROWSERS", "1"))
+POOL_CONTEXTS = int(os.getenv("PLAYWRIGHT_CONTEXTS", "2"))
+CONTEXT_MAX_PAGES = int(os.getenv("PLAYWRIGHT_CONTEXT_MAX_PAGES", "25"))
+
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+
+NETWORKIDLE_TIMEOUT_MS = 5000
+SETTLE_POLL_MS = 250
+SETTLE_MAX_MS = 3000
+
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0 Safari/537.36"
+)
+
+
+# ---------------- HELPERS ----------------
+
+async def _block_heavy_resources(route):
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def wait_until_ready(page):
+    """
+    Cheap readiness check: give the network a short chance to go idle, then
+    wait until document.body.innerText stops growing (or SETTLE_MAX_MS passes).
+    """
+    try:
+        await page.wait_for_load_state("networkidle", timeout=NETWORKIDLE_TIMEOUT_MS)
+    except PlaywrightTimeout:
+        pass
+
+    deadline = time.monotonic() + SETTLE_MAX_MS / 1000
+    last = -1
+    while time.monotonic() < deadline:
+        size = await page.evaluate("document.body ? document.body.innerText.length : 0")
+        if size == last:
+            return
+        last = size
+        await page.wait_for_timeout(SETTLE_POLL_MS)
+
+
+# ---------------- POOL ----------------
+
+class _Slot:
+    def __init__(self, browser_idx: int):
+        self.browser_idx = browser_idx
+        self.context = None
+        self.pages = 0
+
+
+class BrowserPool:
+    def __init__(
+        self,
+        browsers: int = POOL_BROWSERS,
+        contexts_per_browser: int = POOL_CONTEXTS,
+        max_pages_per_context: int = CONTEXT_MAX_PAGES,
+        proxy: Optional[str] = None,
+        block_resources: bool = True,
+    ):
+        self.n_browsers = max(1, browsers)
+        self.n_contexts = max(1, contexts_per_browser)
+        self.max_pages_per_context = max_pages_per_context
+        self.proxy = proxy
+        self.block_resources = block_resources
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="browser-pool", daemon=True)
+        self._thread.start()
+
+        self._playwright = None
+        self._browsers = []
+        self._slots = None
+        self._closed = False
+
+        try:
+            self._call(self._start())
+        except BaseException:
+            # launch failed (Chromium missing, ...): don't leave the loop thread running
+            self._closed = True
+            try:
+                self._call(self._shutdown(), timeout=30)
+            except Exception:
+                pass
+            self._stop_loop()
+            raise
+
+    # ---- event-loop plumbing ----
+
+    def _call(self, coro, timeout: Optional[float] = None):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    async def _start(self):
+        self._playwright = await async_playwright().start()
+        self._slots = asyncio.Queue()
+        for i in range(self.n_browsers):
+            self._browsers.append(await self._launch())
+            for _ in range(self.n_contexts):
+                self._slots.put_nowait(_Slot(i))
+
+    async def _launch(self):
+        kwargs = {"headless": True}
+        if self.proxy:
+            kwargs["proxy"] = {"server": self.proxy}
+        return await self._playwright.chromium.launch(**kwargs)
+
+    async def _ensure_context(self, slot: _Slot):
+        browser = self._browsers[slot.browser_idx]
+        if not browser.is_connected():
+            print(f" Browser {slot.browser_idx} died, relaunching")
+            self._browsers[slot.browser_idx] = browser = await self._launch()
+            slot.context = None
+
+        if slot.context is not None and slot.pages >= self.max_pages_per_context:
+            await self._close_context(slot)
+
+        if slot.context is None:
+            slot.context = await browser.new_context(user_agent=USER_AGENT)
+            if self.block_resources:
+                await slot.context.route("**/*", _block_heavy_resources)
+            slot.pages = 0
+        return slot.context
+
+    async def _close_context(self, slot: _Slot):
+        try:
+            await slot.context.close()
+        except Exception:
+            pass
+        slot.context = None
+
+    async def _fetch(self, url: str, timeout: int) -> str:
+        slot = await self._slots.get()
+        try:
+            context = await self._ensure_context(slot)
+            page = await context.new_page()
+            try:
+                await page.goto(url, timeout=timeout, wait_until="domcontentloaded")
+                await wait_until_ready(page)
+                return cap_rendered(await page.content(), url)
+            finally:
+                slot.pages += 1
+                await page.close()
+        except Exception:
+            # a failed navigation can leave the context in a bad state
+            if slot.context is not None:
+                await self._close_context(slot)
+            raise
+        finally:
+            self._slots.put_nowait(slot)
+
+    async def _shutdown(self):
+        for browser in self._browsers:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+        if self._playwright is not None:
+            await self._playwright.stop()
+
+    # ---- public API ----
+
+    def fetch(self, url: str, timeout: int = 45000) -> str:
+        """Blocking fetch of fully rendered HTML (safe to call from any thread)."""
+        return self._call(self._fetch(url, timeout))
+
+    async def fetch_async(self, url: str, timeout: int = 45000) -> str:
+        """Awaitable fetch for callers running their own event loop."""
+        fut = asyncio.run_coroutine_threadsafe(self._fetch(url, timeout), self._loop)
+        return await asyncio.wrap_future(fut)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._call(self._shutdown(), timeout=30)
+        finally:
+            self._stop_loop()
+
+    def _stop_loop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=10)
+        if not self._thread.is_alive():
+            self._loop.close()
+
+
+# ---------------- SHARED INSTANCE ----------------
+
+_pool: Optional[BrowserPool] = None
+_pool_error: Optional[BaseException] = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool(proxy: Optional[str] = None) -> BrowserPool:
+    """
+    Process-wide pool, started on first use and closed at exit. A failed
+    start is remembered: later calls raise without relaunching Chromium.
+    """
+    global _pool, _pool_error
+    with _pool_lock:
+        if _pool_error is not None:
+            raise RuntimeError(f"browser pool unavailable: {_pool_error}") from _pool_error
+        if _pool is None:
+            try:
+                _pool = BrowserPool(proxy=proxy)
+            except Exception as e:
+                _pool_error = e
+                raise
+            atexit.register(_pool.close)
+        return _pool
@@ -0,0 +1,302 @@
+# services/crawler/crawler_async.py
+"""
+Asyncio crawl engine for crawler_tor.
+
+- fetches many URLs concurrently over the Tor SOCKS proxy pool (httpx, one client per slot)
+- a global semaphore caps the number of in-flight fetches
+- per-host politeness comes from the shared PolitenessScheduler token buckets,
+  so it only applies between requests to the same host
+- keeps fetch_and_save semantics: retries with backoff, Playwright fallback,
+  conditional re-fetch via the fetch cache, host circuit breaker, save_page_to_db
+"""
+
+import asyncio
+import time
+from urllib.parse import urlparse
+from typing import Optional, List, Dict
+
+import httpx
+
+from services.crawler.tor_session import DEFAULT_HEADERS
+from services.crawler.proxy_pool import ProxyPool, ProxySlot, get_proxy_pool
+from services.crawler.tor_control import get_rotator
+from services.crawler.crawler_db import save_page_to_db
+from services.crawler.batch_writer import BATCH_WRITES, get_batch_writer
+from services.pipeline.analyzer_worker import PIPELINE_MODE, enqueue_page, fetch_meter
+from services.crawler.tor_playwright import fetch_via_tor_playwright
+from services.crawler.scheduler import PolitenessScheduler
+from services.crawler.crawler_tor import (
+    PER_HOST_DELAY,
+    DEFAULT_TIMEOUT,
+    ONION_TIMEOUT,
+    RETRY_ATTEMPTS,
+    RETRY_BACKOFF,
+    is_onion,
+    load_cached_meta,
+    classify_fetch,
+    take_fetch_record,
+    store_fetch_record,
+    fetch_saved_callback,
+    host_verdict,
+    note_host,
+)
+from services.crawler.fetch_cache import conditional_headers, SKIP_OUTCOMES
+from services.crawler.host_health import SKIP, PROBE, get_host_health
+from services.crawler.body_reader import BodyRejected, read_body_async
+
+
+# ---------------- CONFIG ----------------
+
+DEFAULT_CONCURRENCY = 8
+
+
+# ---------------- CLIENTS ----------------
+
+class AsyncTorClients:
+    """One pooled httpx.AsyncClient per proxy slot, created on first use."""
+
+    def __init__(self, proxies: ProxyPool, concurrency: int):
+        self.proxies = proxies
+        self.limits = httpx.Limits(max_connections=max(1, concurrency) * 2)
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def client_for(self, slot: ProxySlot) -> httpx.AsyncClient:
+        client = self._clients.get(slot.name)
+        if client is None:
+            client = self._clients[slot.name] = httpx.AsyncClient(
+                proxy=slot.proxy_url,
+                headers=DEFAULT_HEADERS,
+                limits=self.limits,
+                follow_redirects=True,
+            )
+        return client
+
+    async def aclose(self):
+        for client in self._clients.values():
+            await client.aclose()
+
+
+# ---------------- FETCH LOGIC ----------------
+
+async def fetch_via_tor_async(
+    clients: AsyncTorClients,
+    url: str,
+    rotate_circuit: bool = False,
+    headers: Optional[dict] = None,
+    probe: bool = False,
+):
+    """
+    Async twin of crawler_tor.fetch_via_tor_once (same return value):
+    1. Try httpx-over-Tor (RETRY_ATTEMPTS with backoff)
+    2. If it fails → fallback to Playwright (run in a worker thread)
+    probe=True makes a single attempt without the Playwright fallback.
+    Bodies are streamed with the body_reader size cap; BodyRejected is not retried.
+    """
+
+    timeout = ONION_TIMEOUT if is_onion(url) else DEFAULT_TIMEOUT
+
+    attempts = 1 if probe else RETRY_ATTEMPTS
+
+    # ---- httpx + Tor ----
+    for attempt in range(1, attempts + 1):
+        proxy = clients.proxies.acquire()
+        # the slot's Tor instance gets the outcome; note_request() only touches
+        # counters, so it is safe on the event loop
+        rotator = get_rotator(proxy.control_port) if rotate_circuit else None
+        started = time.monotonic()
+        try:
+            print(f" Attempt {attempt} via httpx+Tor ({proxy.name}) → {url}")
+            try:
+                client = clients.client_for(proxy)
+                r = await client.send(client.build_request("GET", url, timeout=timeout, headers=headers), stream=True)
+            except Exception:
+                clients.proxies.release(proxy, ok=False, latency=time.monotonic() - started)
+                if rotator:
+                    rotator.note_request(ok=False)
+                raise
+            clients.proxies.release(proxy, ok=True, latency=time.monotonic() - started)
+            if rotator:
+                rotator.note_request(ok=True)
+            if r.is_error:
+                await r.aclose()
+                r.raise_for_status()
+            return r.status_code, await read_body_async(r, url), r.headers
+
+        except BodyRejected:
+            raise
+        except Exception as e:
+            print(f"  Attempt {attempt} failed:", e)
+            if attempt < attempts:
+                wait = RETRY_BACKOFF * attempt
+                print(f"  Retrying in {wait}s...")
+                await asyncio.sleep(wait)
+
+    if probe:
+        raise RuntimeError("Host probe failed")
+
+    # ---- Playwright fallback (critical) ----
+    try:
+        print(" Falling back to Playwright (JS-rendered Tor fetch)")
+        html = await asyncio.to_thread(fetch_via_tor_playwright, url)
+        return 200, html, {}
+    except BodyRejected:
+        raise
+    except Exception as e:
+        print(" Playwright fetch failed:", e)
+
+    raise RuntimeError("All fetch attempts failed")
+
+
+# ---------------- FETCH + SAVE ----------------
+
+async def fetch_and_save_async(
+    clients: AsyncTorClients,
+    semaphore: asyncio.Semaphore,
+    scheduler: PolitenessScheduler,
+    stats: dict,
+    org_name: str,
+    url: str,
+    query_text: Optional[str] = None,
+    rotate_circuit: bool = False,
+):
+    host = urlparse(url).hostname or "unknown"
+
+    # broken hosts are skipped before they cost a politeness wait or a fetch slot
+    verdict = host_verdict(host)
+    if verdict == SKIP:
+        print(f" [HOST DOWN] {url} — circuit open, skipping")
+        stats["skipped"] += 1
+        return
+
+    # wait for the host slot before taking a fetch slot, so URLs queued behind
+    # a busy host do not block fetches to other hosts
+    wait = scheduler.reserve(host)
+    if wait > 0:
+        print(f" Waiting {wait:.1f}s before contacting: {host}")
+        await asyncio.sleep(wait)
+        # earlier requests to this host may have opened its breaker meanwhile
+        if verdict != PROBE and host_verdict(host) == SKIP:
+            print(f" [HOST DOWN] {url} — circuit open, skipping")
+            stats["skipped"] += 1
+            return
+
+    meta = await asyncio.to_thread(load_cached_meta, org_name, url)
+
+    async with semaphore:
+        started = time.monotonic()
+        try:
+            status_code, html, headers = await fetch_via_tor_async(
+                clients,
+                url=url,
+                rotate_circuit=rotate_circuit,
+                headers=conditional_headers(meta),
+                probe=verdict == PROBE,
+            )
+        except BodyRejected as e:
+            print(f" [REJECTED] {e}")
+            fetch_meter.record(True, time.monotonic() - started)
+            await asyncio.to_thread(note_host, host, True, time.monotonic() - started)
+            stats["failed"] += 1
+            return
+        except Exception as e:
+            print(f" Fetch failed for {url}: {e}")
+            fetch_meter.record(False, time.monotonic() - started)
+            await asyncio.to_thread(note_host, host, False, time.monotonic() - started, str(e))
+            stats["failed"] += 1
+            return
+        fetch_meter.record(True, time.monotonic() - started)
+        await asyncio.to_thread(note_host, host, True, time.monotonic() - started)
+
+    outcome = await asyncio.to_thread(classify_fetch, org_name, url, status_code, headers, html, meta)
+    if outcome in SKIP_OUTCOMES:
+        stats["saved"] += 1
+        return
+
+    # the fetch cache entry is stored only once the page is saved
+    fetch_record = take_fetch_record(org_name, url)
+    if PIPELINE_MODE == "queue":
+        try:
+            await asyncio.to_thread(
+                enqueue_page, org_name, url, html, status_code=status_code, query_text=query_text,
+                fetch_record=fetch_record,
+            )
+            print(f" Queued {url} for analysis")
+            stats["saved"] += 1
+        except Exception as e:
+            print(" Error queueing page:", e)
+            stats["failed"] += 1
+        return
+
+    # saving (clean + DB + analysis) runs outside the fetch slot
+    try:
+        print(f" Saving result for {url}")
+        if BATCH_WRITES:
+            await asyncio.to_thread(
+                get_batch_writer().add_page,
+                org_name, url, html, status_code=status_code, query_text=query_text,
+                callback=fetch_saved_callback(org_name, url, fetch_record),
+            )
+            stats["saved"] += 1
+            return
+        await asyncio.to_thread(
+            save_page_to_db,
+            org_name=org_name,
+            url=url,
+            query_text=query_text,
+            fetched_html=html,
+            status_code=status_code,
+        )
+        await asyncio.to_thread(store_fetch_record, org_name, url, fetch_record)
+        stats["saved"] += 1
+    except Exception as e:
+        print(" Error saving page to DB:", e)
+        stats["failed"] += 1
+
+
+# ---------------- CRAWL ----------------
+
+async def crawl_async(
+    org_name: str,
+    urls: List[str],
+    query_text: Optional[str] = None,
+    rotate_circuit: bool = False,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    proxies: Optional[ProxyPool] = None,
+    scheduler: Optional[PolitenessScheduler] = None,
+) -> dict:
+    """Crawl `urls` concurrently; returns run stats (saved, failed, skipped, elapsed, pages_per_sec)."""
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    scheduler = scheduler or PolitenessScheduler(legacy_delay=PER_HOST_DELAY)
+    stats = {"saved": 0, "failed": 0, "skipped": 0}
+    # load host health off the event loop; later checks are in-memory
+    await asyncio.to_thread(get_host_health)
+    clients = AsyncTorClients(proxies or get_proxy_pool(), concurrency)
+
+    started = time.monotonic()
+    try:
+        await asyncio.gather(*(
+            fetch_and_save_async(
+                clients,
+                semaphore,
+                scheduler,
+                stats,
+                org_name=org_name,
+                url=url,
+                query_text=query_text,
+                rotate_circuit=rotate_circuit,
+            )
+            for url in urls
+        ))
+    finally:
+        await clients.aclose()
+
+    stats["elapsed"] = time.monotonic() - started
+    stats["pages_per_sec"] = stats["saved"] / stats["elapsed"] if stats["elapsed"] else 0.0
+    scheduler.log_summary()
+    clients.proxies.log_stats()
+    return stats
+
+
+def run_async_crawl(org_name: str, urls: List[str], **kwargs) -> dict:
+    return asyncio.run(crawl_async(org_name, urls, **kwargs))
@@ -5,15 +5,30 @@ from bs4 import BeautifulSoup
 from datetime import datetime
 import json
 import os
+import threading
+import numpy as np
 
 from api.db import SessionLocal, engine
 from api.models import Base, Org, Query, CrawledPage, Threat
 from services.preprocessor.html_cleaner import clean_html
+from services.preprocessor.fingerprint import content_hash
+from services.preprocessor import minhash
+from sqlalchemy import select, insert
 
-from services.preprocessor.hybrid_detector import analyze_page
+from services.preprocessor.hybrid_detector import analyze_page, ioc_threat_rows
+from services.preprocessor.watchlist import org_mentioned, recipient_org_ids
 
 # NOTE: do NOT call Base.metadata.create_all here (Alembic manages schema)
 
+# pages whose clean_text was already analyzed (exact content_hash match,
+# or near duplicates above NEARDUP_THRESHOLD MinHash similarity)
+dedupe_stats = {"pages": 0, "duplicates": 0, "near_duplicates": 0}
+
+THREAT_COPY_COLUMNS = ("indicator_type", "indicator", "severity", "evidence", "ml_label", "ml_confidence")
+# threat rows that describe the whole page (classifier verdict); IOC rows point
+# into their page's text, so near duplicates only reuse these
+VERDICT_TYPES = ("hybrid",)
+
 
 def fetch_html_using_session(url: str, session: requests.Session = None, timeout: int = 20):
     """Fetch using provided session (which may be Tor); returns (status_code, text)."""
@@ -23,6 +38,157 @@ def fetch_html_using_session(url: str, session: requests.Session = None, timeout
     return r.status_code, r.text
 
 
+def clean_for_storage(url: str, html: str):
+    """Clean text worth storing, or None (page is skipped)."""
+    if not html:
+        print(f"[SKIP] Empty HTML for {url}")
+        return None
+
+    # --- CLEAN TEXT (THIS IS THE KEY FIX) ---
+    clean_text_value = clean_html(html)
+
+    if not clean_text_value or len(clean_text_value) < 100:
+        print(f"[SKIP] No usable text for {url}")
+        return None
+    return clean_text_value
+
+
+def ensure_orgs(conn, names):
+    """org name -> id for `names`, inserting missing orgs in one statement."""
+    names = set(names)
+    if not names:
+        return {}
+    ids = {
+        name: org_id
+        for org_id, name in conn.execute(select(Org.id, Org.name).where(Org.name.in_(names)))
+    }
+    missing = sorted(names - ids.keys())
+    if missing:
+        rows = conn.execute(
+            insert(Org).returning(Org.id, Org.name, sort_by_parameter_order=True),
+            [{"name": n} for n in missing],
+        )
+        for org_id, name in rows:
+            ids[name] = org_id
+    return ids
+
+
+def find_analyzed_pages(conn, hashes):
+    """content_hash -> (page_id, org_id) of the original (analyzed) page."""
+    if not hashes:
+        return {}
+    rows = conn.execute(
+        select(CrawledPage.id, CrawledPage.org_id, CrawledPage.content_hash)
+        .where(CrawledPage.content_hash.in_(list(hashes)))
+        .where(CrawledPage.duplicate_of.is_(None))
+        .order_by(CrawledPage.id)
+    )
+    found = {}
+    for page_id, org_id, h in rows:
+        found.setdefault(h, (page_id, org_id))
+    return found
+
+
+_neardup_index = None
+_neardup_lock = threading.Lock()
+
+
+def get_neardup_index():
+    """
+    MinHash LSH index over analyzed pages, values (page_id, org_id); built from
+    crawled_pages.minhash on first use. None when NEARDUP_ENABLED is off.
+    """
+    global _neardup_index
+    if not minhash.ENABLED:
+        return None
+    if _neardup_index is None:
+        with _neardup_lock:
+            if _neardup_index is None:
+                index = minhash.MinHashIndex()
+                with engine.connect() as conn:
+                    rows = conn.execute(
+                        select(CrawledPage.id, CrawledPage.org_id, CrawledPage.minhash)
+                        .where(CrawledPage.minhash.is_not(None))
+                        .where(CrawledPage.duplicate_of.is_(None))
+                    ).all()
+                if rows:
+                    index.add_many(
+                        np.stack([minhash.from_bytes(blob) for _, _, blob in rows]),
+                        [(page_id, org_id) for page_id, org_id, _ in rows],
+                    )
+                print(f" Near-duplicate index loaded: {len(index)} pages")
+                _neardup_index = index
+    return _neardup_index
+
+
+def find_near_duplicate(sig):
+    """(page_id, org_id) of an analyzed page above NEARDUP_THRESHOLD similarity, or None."""
+    index = get_neardup_index()
+    if index is None or sig is None:
+        return None
+    hit = index.query(sig)
+    return hit[1] if hit else None
+
+
+def index_analyzed_page(sig, page_id, org_id):
+    index = get_neardup_index()
+    if index is not None and sig is not None:
+        index.add(sig, (page_id, org_id))
+
+
+def copy_threats(conn, links, kinds=None):
+    """
+    Reuse verdicts of analyzed pages: links are (source_page_id, org_id, page_id);
+    the source page's threats (only indicator_type in `kinds`, when given) are
+    copied to page_id under org_id. The source page holds the same rows once
+    per recipient org (its own org and watchlist fan-out); one org's set is
+    copied, and orgs that already are recipients of the source page get no copy.
+    """
+    if not links:
+        return 0
+    targets = {}
+    for source_id, org_id, page_id in links:
+        targets.setdefault(source_id, []).append((org_id, page_id))
+
+    cols = [getattr(Threat, c) for c in THREAT_COPY_COLUMNS]
+    query = (
+        select(Threat.crawled_page_id, Threat.org_id, *cols)
+        .where(Threat.crawled_page_id.in_(list(targets)))
+        .order_by(Threat.id)
+    )
+    if kinds:
+        query = query.where(Threat.indicator_type.in_(list(kinds)))
+    by_source = {}
+    for source_id, org_id, *values in conn.execute(query):
+        by_source.setdefault(source_id, {}).setdefault(org_id, []).append(values)
+
+    rows = []
+    for source_id, by_org in by_source.items():
+        source_rows = by_org[min(by_org)]
+        for org_id, page_id in targets[source_id]:
+            if org_id in by_org:
+                continue
+            rows += [
+                {"org_id": org_id, "crawled_page_id": page_id, **dict(zip(THREAT_COPY_COLUMNS, values))}
+                for values in source_rows
+            ]
+
+    if rows:
+        conn.execute(insert(Threat), rows)
+    return len(rows)
+
+
+def log_dedupe_stats():
+    pages = dedupe_stats["pages"]
+    if not pages:
+        return
+    print(
+        f" Dedupe: {dedupe_stats['duplicates']}/{pages} pages already analyzed "
+        f"({dedupe_stats['near_duplicates']} near duplicates, "
+        f"hit rate {dedupe_stats['duplicates'] / pages:.1%})"
+    )
+
+
 def save_page_to_db(
     org_name: str,
     url: str,
@@ -55,17 +221,53 @@ def save_page_to_db(
         else:
             html = fetched_html
 
-        if not html:
-            print(f"[SKIP] Empty HTML for {url}")
+        clean_text_value = clean_for_storage(url, html)
+        if clean_text_value is None:
             return
+        snippet = clean_text_value[:500]
+        page_hash = content_hash(clean_text_value)
 
-        # --- CLEAN TEXT (THIS IS THE KEY FIX) ---
-        clean_text_value = clean_html(html)
+        sig = minhash.signature(clean_text_value)
 
-        if not clean_text_value or len(clean_text_value) < 100:
-            print(f"[SKIP] No usable text for {url}")
+        # --- same (or nearly the same) content already analyzed: link instead of re-analyzing ---
+        original = find_analyzed_pages(db.connection(), [page_hash]).get(page_hash)
+        near = None if original else find_near_duplicate(sig)
+        dedupe_stats["pages"] += 1
+        if original or near:
+            original = original or near
+            dedupe_stats["duplicates"] += 1
+            dedupe_stats["near_duplicates"] += 1 if near else 0
+            original_id, original_org_id = original
+            # near duplicates keep their own text and IOCs; only the verdict is reused
+            iocs, relevance = ioc_threat_rows([clean_text_value], [org_name])[0] if near else ([], None)
+            cp = CrawledPage(
+                org_id=org.id,
+                query_id=q.id if q else None,
+                url=url,
+                status_code=status_code,
+                content=html if near else None,
+                content_snippet=snippet,
+                clean_text=clean_text_value if near else None,
+                content_hash=page_hash,
+                minhash=minhash.to_bytes(sig),
+                duplicate_of=original_id,
+                fetched_at=datetime.utcnow(),
+            )
+            db.add(cp)
+            db.flush()
+            # cross-org copies only when the page is relevant to this org
+            if original_org_id != org.id and (relevance[0] if near else org_mentioned(org_name, clean_text_value)):
+                copy_threats(db.connection(), [(original_id, org.id, cp.id)], VERDICT_TYPES if near else None)
+            if iocs:
+                org_ids = recipient_org_ids(org.id, relevance)
+                db.connection().execute(
+                    insert(Threat),
+                    [{"org_id": o, "crawled_page_id": cp.id, **t} for o in org_ids for t in iocs],
+                )
+            db.commit()
+            kind = "near duplicate" if near else "duplicate"
+            print(f"[DUP] Saved CrawledPage id={cp.id} as {kind} of id={original_id}")
             return
-        snippet = clean_text_value[:500]
 
         # --- save page ---
         cp = CrawledPage(
@@ -76,12 +278,15 @@ def save_page_to_db(
             content=html,                 # OK
             content_snippet=snippet,       # OK
             clean_text=clean_text_value,   # ✅ REQUIRED
+            content_hash=page_hash,
+            minhash=minhash.to_bytes(sig),
             fetched_at=datetime.utcnow(),
         )
 
         db.add(cp)
         db.commit()
         db.refresh(cp)
+        index_analyzed_page(sig, cp.id, org.id)
 
         print(f"[OK] Saved CrawledPage id={cp.id}")
 
@@ -90,7 +295,8 @@ def save_page_to_db(
             engine=engine,
             org_id=org.id,
             page_id=cp.id,
-            clean_text=clean_text_value
+            clean_text=clean_text_value,
+            org_name=org_name,
         )
 
         db.commit()
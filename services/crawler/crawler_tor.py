@@ -5,12 +5,35 @@ import os
 import time
 import random
 from urllib.parse import urlparse
-from typing import Optional, List
-
-from services.crawler.tor_session import make_tor_session
-from services.crawler.tor_control import renew_tor_circuit
-from services.crawler.crawler_db import save_page_to_db
+from typing import Dict, List, Optional, Tuple
+
+from services.crawler.tor_session import get_tor_session, log_session_stats
+from services.crawler.proxy_pool import get_proxy_pool
+from services.crawler.tor_control import get_rotator
+from services.crawler.crawler_db import save_page_to_db, log_dedupe_stats
+from services.crawler.batch_writer import BATCH_WRITES, get_batch_writer, close_batch_writer
+from services.crawler.fetch_cache import (
+    FETCH_CACHE,
+    SKIP_OUTCOMES,
+    load_meta,
+    filter_due,
+    conditional_headers,
+    fetch_outcome,
+    record_fetch,
+    log_fetch_cache_stats,
+)
+from services.crawler.host_health import SKIP, PROBE, get_host_health, log_host_health
+from services.crawler.body_reader import BodyRejected, read_body, log_stream_stats
 from services.crawler.tor_playwright import fetch_via_tor_playwright
+from services.crawler.scheduler import PolitenessScheduler
+from services.ml.darkbert_infer import warm_up_in_background
+from services.pipeline.analyzer_worker import (
+    PIPELINE_MODE,
+    enqueue_page,
+    fetch_meter,
+    start_local_analyzers,
+    log_pipeline_stats,
+)
 
 
 # ---------------- CONFIG ----------------
@@ -45,45 +68,72 @@ def is_onion(url: str) -> bool:
 def fetch_via_tor_once(
     url: str,
     rotate_circuit: bool = False,
-    control_port: int = 9051,
+    headers: Optional[dict] = None,
+    probe: bool = False,
 ):
     """
     1. Try requests-over-Tor
     2. If it fails OR site is .onion → fallback to Playwright
+
+    `headers` are extra request headers (conditional-request validators).
+    probe=True (host circuit breaker re-probe) makes a single attempt without
+    the Playwright fallback.
+    Bodies are streamed with a size cap (services.crawler.body_reader);
+    binary / oversized responses raise BodyRejected without retry or fallback.
+    Returns (status_code, text, response_headers); a 304 has an empty body.
     """
 
     timeout = ONION_TIMEOUT if is_onion(url) else DEFAULT_TIMEOUT
-    session = make_tor_session()
+    proxies = get_proxy_pool()
 
-    # Optional Tor circuit rotation
-    if rotate_circuit:
-        try:
-            print(" Requesting new Tor circuit (NEWNYM)")
-            renew_tor_circuit(control_port=control_port)
-            time.sleep(1.5)
-        except Exception as e:
-            print("  Tor circuit rotation skipped:", e)
+    attempts = 1 if probe else RETRY_ATTEMPTS
 
     # ---- requests + Tor ----
-    for attempt in range(1, RETRY_ATTEMPTS + 1):
+    for attempt in range(1, attempts + 1):
+        # every attempt picks a slot, so retries route around a bad circuit
+        proxy = proxies.acquire()
+        # Optional Tor circuit rotation: the rotator of the slot's Tor instance decides
+        # when to send NEWNYM (request count / error burst / timer); we only report outcomes
+        rotator = get_rotator(proxy.control_port) if rotate_circuit else None
+        session = get_tor_session(proxy.url, proxy.isolation)
+        started = time.monotonic()
         try:
-            print(f" Attempt {attempt} via requests+Tor → {url}")
-            r = session.get(url, timeout=timeout)
-            r.raise_for_status()
-            return r.status_code, r.text
-
+            print(f" Attempt {attempt} via requests+Tor ({proxy.name}) → {url}")
+            try:
+                r = session.get(url, timeout=timeout, headers=headers, stream=True)
+            except Exception:
+                proxies.release(proxy, ok=False, latency=time.monotonic() - started)
+                if rotator:
+                    rotator.note_request(ok=False)
+                raise
+            # an HTTP error status still means the circuit delivered a response
+            proxies.release(proxy, ok=True, latency=time.monotonic() - started)
+            if rotator:
+                rotator.note_request(ok=True)
+            if not r.ok:
+                r.close()
+                r.raise_for_status()
+            return r.status_code, read_body(r, url), r.headers
+
+        except BodyRejected:
+            raise
         except Exception as e:
             print(f"  Attempt {attempt} failed:", e)
-            if attempt < RETRY_ATTEMPTS:
+            if attempt < attempts:
                 wait = RETRY_BACKOFF * attempt
                 print(f"  Retrying in {wait}s...")
                 time.sleep(wait)
 
+    if probe:
+        raise RuntimeError("Host probe failed")
+
     # ---- Playwright fallback (critical) ----
     try:
         print(" Falling back to Playwright (JS-rendered Tor fetch)")
         html = fetch_via_tor_playwright(url)
-        return 200, html
+        return 200, html, {}
+    except BodyRejected:
+        raise
     except Exception as e:
         print(" Playwright fetch failed:", e)
 
@@ -97,22 +147,93 @@ def fetch_and_save(
     url: str,
     query_text: Optional[str] = None,
     rotate_circuit: bool = False,
+    wait_for_host: bool = True,
 ):
+    """
+    Fetch + save one URL. Callers that dispatch through a PolitenessScheduler
+    pass wait_for_host=False; the scheduler already spaced the request.
+    With PIPELINE_MODE=queue the page is handed to the analyzer workers
+    instead of being cleaned/analyzed here.
+
+    Returns False when the fetch or save failed, None when the host's circuit
+    breaker is open (nothing was fetched), else the fetch outcome (see
+    classify_fetch), which is truthy.
+    """
+    outcome, status_code, html = fetch_page(org_name, url, rotate_circuit=rotate_circuit, wait_for_host=wait_for_host)
+    if not outcome or outcome in SKIP_OUTCOMES:
+        return outcome
+    if not save_fetched_page(org_name, url, html, status_code, query_text):
+        return False
+    return outcome
+
+
+def fetch_page(org_name: str, url: str, rotate_circuit: bool = False, wait_for_host: bool = True):
+    """
+    Fetch one URL for an org (host circuit breaker, conditional request, fetch cache).
+    Returns (outcome, status_code, html); outcome as for fetch_and_save.
+    """
     host = urlparse(url).hostname or "unknown"
-    print(f"\n Sleeping {PER_HOST_DELAY}s before contacting: {host}")
-    time.sleep(PER_HOST_DELAY)
+    verdict = host_verdict(host)
+    if verdict == SKIP:
+        print(f" [HOST DOWN] {url} — circuit open, skipping")
+        return None, None, None
+
+    if wait_for_host:
+        print(f"\n Sleeping {PER_HOST_DELAY}s before contacting: {host}")
+        time.sleep(PER_HOST_DELAY)
+    else:
+        print(f"\n Contacting: {host}")
 
+    meta = load_cached_meta(org_name, url)
+
+    started = time.monotonic()
     try:
-        status_code, html = fetch_via_tor_once(
+        status_code, html, headers = fetch_via_tor_once(
             url=url,
             rotate_circuit=rotate_circuit,
+            headers=conditional_headers(meta),
+            probe=verdict == PROBE,
         )
+    except BodyRejected as e:
+        # the host answered; the content is just not worth keeping
+        print(f" [REJECTED] {e}")
+        fetch_meter.record(True, time.monotonic() - started)
+        note_host(host, True, time.monotonic() - started)
+        return False, None, None
     except Exception as e:
         print(f" Fetch failed for {url}: {e}")
-        return
+        fetch_meter.record(False, time.monotonic() - started)
+        note_host(host, False, time.monotonic() - started, str(e))
+        return False, None, None
+    fetch_meter.record(True, time.monotonic() - started)
+    note_host(host, True, time.monotonic() - started)
+
+    return classify_fetch(org_name, url, status_code, headers, html, meta), status_code, html
+
+
+def save_fetched_page(org_name: str, url: str, html: str, status_code: int, query_text: Optional[str] = None) -> bool:
+    """
+    Queue (PIPELINE_MODE=queue), batch or save + analyze a fetched page; False on error.
+    The page's fetch cache entry is recorded once the save is durable.
+    """
+    fetch_record = take_fetch_record(org_name, url)
+    if PIPELINE_MODE == "queue":
+        try:
+            enqueue_page(org_name, url, html, status_code=status_code, query_text=query_text, fetch_record=fetch_record)
+            print(f" Queued {url} for analysis")
+            return True
+        except Exception as e:
+            print(" Error queueing page:", e)
+            return False
 
     try:
         print(f" Saving result for {url}")
+        if BATCH_WRITES:
+            get_batch_writer().add_page(
+                org_name, url, html, status_code=status_code, query_text=query_text,
+                callback=fetch_saved_callback(org_name, url, fetch_record),
+            )
+            return True
         save_page_to_db(
             org_name=org_name,
             url=url,
@@ -120,17 +241,131 @@ def fetch_and_save(
             fetched_html=html,
             status_code=status_code,
         )
+        store_fetch_record(org_name, url, fetch_record)
+        return True
     except Exception as e:
         print(" Error saving page to DB:", e)
+        return False
+
+
+def host_verdict(host: str) -> str:
+    """Host circuit-breaker verdict (ALLOW / PROBE / SKIP); ALLOW when tracking is off."""
+    registry = get_host_health()
+    return registry.check(host) if registry else "allow"
+
+
+def note_host(host: str, ok: bool, elapsed: float, error: Optional[str] = None):
+    registry = get_host_health()
+    if registry is None:
+        return
+    try:
+        registry.record(host, ok, elapsed, error)
+    except Exception as e:
+        print(" Host health update failed:", e)
+
+
+def load_cached_meta(org_name: str, url: str):
+    if not FETCH_CACHE:
+        return None
+    try:
+        return load_meta(org_name, url)
+    except Exception as e:
+        print(" Fetch cache lookup failed:", e)
+        return None
+
+
+# fetch cache records of new / changed pages, held until the page is saved
+_pending_fetch_records: Dict[Tuple[str, str], dict] = {}
+
+
+def classify_fetch(org_name: str, url: str, status_code: int, headers, html: str, meta) -> str:
+    """
+    Classify the fetch against the fetch cache and return its outcome: new,
+    changed, unchanged or not_modified ("fetched" when the cache is off).
+    Outcomes in SKIP_OUTCOMES need no save/analysis and are recorded now;
+    new / changed pages are recorded by save_fetched_page once saved.
+    """
+    if not FETCH_CACHE:
+        return "fetched"
+    outcome, record = fetch_outcome(status_code, headers, html, meta)
+    if outcome in SKIP_OUTCOMES:
+        print(f" [{outcome.upper()}] {url} — skipping save/analysis")
+        store_fetch_record(org_name, url, record)
+    else:
+        _pending_fetch_records[(org_name, url)] = record
+    return outcome
+
+
+def take_fetch_record(org_name: str, url: str) -> Optional[dict]:
+    return _pending_fetch_records.pop((org_name, url), None)
+
+
+def store_fetch_record(org_name: str, url: str, record: Optional[dict]):
+    if record is None:
+        return
+    try:
+        record_fetch(org_name, url, record)
+    except Exception as e:
+        print(" Fetch cache update failed:", e)
+
+
+def fetch_saved_callback(org_name: str, url: str, record: Optional[dict]):
+    """Batch writer callback recording the fetch once the page's flush commits."""
+    if record is None:
+        return None
+
+    def done(ok, error):
+        if ok:
+            store_fetch_record(org_name, url, record)
+
+    return done
+
+
+def drop_fresh_urls(urls: List[str], org_name: str, force: bool = False) -> List[str]:
+    """Remove URLs this org does not need to revisit yet (fetch cache freshness policy)."""
+    if force or not FETCH_CACHE:
+        return urls
+    try:
+        due, fresh = filter_due(urls, org_name)
+    except Exception as e:
+        print(" Fetch cache lookup failed:", e)
+        return urls
+    if fresh:
+        print(f" Skipping {len(fresh)} URLs fetched recently (not due yet; --force to refetch)")
+    return due
+
+
+def print_run_summary(mode: str, saved: int, failed: int, elapsed: float, skipped: int = 0):
+    rate = saved / elapsed if elapsed else 0.0
+    print(
+        f"\n Crawl finished ({mode}): saved={saved} failed={failed} skipped_hosts_down={skipped} "
+        f"elapsed={elapsed:.1f}s pages/sec={rate:.3f}"
+    )
+
+
+def finish_pipeline(analyzers):
+    """Wait for in-process analyzers (queue mode), flush batched writes, report stats (incl. dedupe hit rate)."""
+    if analyzers:
+        print(" Waiting for analyzer workers to drain the queue...")
+        analyzers.drain()
+    if BATCH_WRITES:
+        close_batch_writer()
+    log_dedupe_stats()
+    log_fetch_cache_stats()
+    log_host_health()
+    log_stream_stats()
+    if PIPELINE_MODE == "queue":
+        log_pipeline_stats()
 
 
 # ---------------- MAIN ----------------
 
 def main():
-    if len(sys.argv) < 3:
+    if len(sys.argv) < 3 or sys.argv[1] in ("-h", "--help"):
         print(
             "Usage: python -m services.crawler.crawler_tor "
-            "<org_name> <url_or_seedfile> [<query_text>] [--rotate]"
+            "<org_name> <url_or_seedfile> [<query_text>] [--rotate] "
+            "[--async] [--concurrency=N] [--force]"
         )
         sys.exit(1)
 
@@ -143,6 +378,12 @@ def main():
     )
 
     rotate = "--rotate" in sys.argv
+    use_async = "--async" in sys.argv
+    force = "--force" in sys.argv
+    concurrency = None
+    for arg in sys.argv[3:]:
+        if arg.startswith("--concurrency="):
+            concurrency = int(arg.split("=", 1)[1])
 
     if os.path.isfile(target):
         print(f" Loading seeds from: {target}")
@@ -157,16 +398,52 @@ def main():
         sys.exit(1)
 
     print(f" Starting crawl for org: {org_name}")
+    urls = drop_fresh_urls(urls, org_name, force)
+    warm_up_in_background()
+    analyzers = start_local_analyzers()
     if rotate:
         print(" Tor circuit rotation enabled")
 
+    if use_async:
+        # imported lazily so the sequential path does not need httpx
+        from services.crawler.crawler_async import run_async_crawl, DEFAULT_CONCURRENCY
+
+        concurrency = concurrency or DEFAULT_CONCURRENCY
+        print(f" Async mode enabled (concurrency={concurrency})")
+        stats = run_async_crawl(
+            org_name,
+            urls,
+            query_text=query_text,
+            rotate_circuit=rotate,
+            concurrency=concurrency,
+        )
+        print_run_summary("async", stats["saved"], stats["failed"], stats["elapsed"], stats["skipped"])
+        finish_pipeline(analyzers)
+        return
+
+    scheduler = PolitenessScheduler(legacy_delay=PER_HOST_DELAY)
     for url in urls:
-        fetch_and_save(
+        scheduler.add(url)
+
+    started = time.monotonic()
+    saved = skipped = 0
+    while len(scheduler):
+        url, _ = scheduler.next()
+        ok = fetch_and_save(
             org_name=org_name,
             url=url,
             query_text=query_text,
             rotate_circuit=rotate,
+            wait_for_host=False,
         )
+        saved += 1 if ok else 0
+        skipped += 1 if ok is None else 0
+
+    print_run_summary("sequential", saved, len(urls) - saved - skipped, time.monotonic() - started, skipped)
+    scheduler.log_summary()
+    log_session_stats()
+    get_proxy_pool().log_stats()
+    finish_pipeline(analyzers)
 
 
 if __name__ == "__main__":
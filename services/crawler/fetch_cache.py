@@ -0,0 +1,217 @@
+# services/crawler/fetch_cache.py
+"""
+Fetch metadata store for conditional re-fetch.
+
+Per (org, URL) (fetch_meta table): ETag, Last-Modified, content length,
+body hash and an adaptive revisit interval. Orgs crawling the same URL keep
+separate entries, so one org's fetch never makes the page "unchanged" for
+another org that has not stored it yet.
+
+- filter_due() drops URLs whose next_due_at is still in the future, before
+  any Tor request is made
+- conditional_headers() turns stored validators into If-None-Match /
+  If-Modified-Since for fetch_via_tor_once
+- fetch_outcome() classifies the response as new / changed / unchanged /
+  not_modified; only new and changed pages go on to save + analysis
+- record_fetch() stores the entry; for new / changed pages callers only call
+  it once the page is durably saved, so a failed save is fetched again
+  instead of being skipped as unchanged
+- freshness: the revisit interval halves when a page changed and doubles
+  when it did not (clamped to FETCH_REVISIT_MIN/MAX_SECONDS), so busy sites
+  are revisited often and static ones rarely
+
+Env:
+  FETCH_CACHE                   true | false (default true)
+  FETCH_REVISIT_MIN_SECONDS     default 3600
+  FETCH_REVISIT_MAX_SECONDS     default 604800 (7 days)
+  FETCH_REVISIT_DEFAULT_SECONDS default 86400
+"""
+
+import os
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, insert, update
+
+from api.db import engine
+from api.models import FetchMeta, Org
+from services.crawler.crawler_db import ensure_orgs
+
+
+FETCH_CACHE = os.getenv("FETCH_CACHE", "true").lower() in ("1", "true", "yes")
+REVISIT_MIN = float(os.getenv("FETCH_REVISIT_MIN_SECONDS", "3600"))
+REVISIT_MAX = float(os.getenv("FETCH_REVISIT_MAX_SECONDS", str(7 * 86400)))
+REVISIT_DEFAULT = float(os.getenv("FETCH_REVISIT_DEFAULT_SECONDS", "86400"))
+
+SKIP_OUTCOMES = ("not_modified", "unchanged")
+
+fetch_cache_stats = {
+    "fresh_skipped": 0,
+    "new": 0,
+    "changed": 0,
+    "unchanged": 0,
+    "not_modified": 0,
+    "bytes_avoided": 0,
+}
+_stats_lock = threading.Lock()
+
+_meta_table = FetchMeta.__table__
+
+
+def _utc(dt: Optional[datetime]) -> Optional[datetime]:
+    """Naive UTC (what datetime.utcnow() gives) whatever the DB driver returns."""
+    if dt is not None and dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def _count(key: str, n: int = 1):
+    with _stats_lock:
+        fetch_cache_stats[key] += n
+
+
+def body_hash(body: str) -> str:
+    return hashlib.sha256((body or "").encode("utf-8", "replace")).hexdigest()
+
+
+# ---------------- LOOKUP ----------------
+
+def _org_id_query(org_name: str):
+    return select(Org.id).where(Org.name == org_name).scalar_subquery()
+
+
+def load_meta(org_name: str, url: str) -> Optional[dict]:
+    with engine.connect() as conn:
+        row = conn.execute(
+            select(_meta_table)
+            .where(_meta_table.c.org_id == _org_id_query(org_name))
+            .where(_meta_table.c.url == url)
+        ).mappings().first()
+    return dict(row) if row else None
+
+
+def filter_due(urls: Iterable[str], org_name: str, now: Optional[datetime] = None) -> Tuple[List[str], List[str]]:
+    """(due, fresh): fresh URLs were fetched for this org recently enough to be skipped this run."""
+    urls = list(urls)
+    if not FETCH_CACHE or not urls:
+        return urls, []
+
+    now = now or datetime.utcnow()
+    due_at: Dict[str, datetime] = {}
+    with engine.connect() as conn:
+        for start in range(0, len(urls), 500):
+            rows = conn.execute(
+                select(_meta_table.c.url, _meta_table.c.next_due_at, _meta_table.c.content_length)
+                .where(_meta_table.c.org_id == _org_id_query(org_name))
+                .where(_meta_table.c.url.in_(urls[start:start + 500]))
+            )
+            for url, next_due_at, length in rows:
+                next_due_at = _utc(next_due_at)
+                if next_due_at is not None and next_due_at > now:
+                    due_at[url] = next_due_at
+                    _count("bytes_avoided", length or 0)
+
+    due = [u for u in urls if u not in due_at]
+    fresh = [u for u in urls if u in due_at]
+    _count("fresh_skipped", len(fresh))
+    return due, fresh
+
+
+def conditional_headers(meta: Optional[dict]) -> dict:
+    if not meta:
+        return {}
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    return headers
+
+
+# ---------------- RECORD ----------------
+
+def next_interval(previous: Optional[float], changed: bool) -> float:
+    if previous is None:
+        return REVISIT_DEFAULT
+    interval = previous / 2 if changed else previous * 2
+    return min(REVISIT_MAX, max(REVISIT_MIN, interval))
+
+
+def fetch_outcome(status_code: int, headers, body: Optional[str], meta: Optional[dict] = None) -> Tuple[str, dict]:
+    """
+    Outcome of a fetch: new, changed, unchanged (same body hash) or
+    not_modified (HTTP 304), and the record to store with record_fetch().
+    `meta` is the row loaded before the request, if any. The record is
+    JSON-safe, so it can travel with a queued page.
+    """
+    headers = headers or {}
+    values = {}
+
+    if status_code == 304 and meta:
+        outcome = "not_modified"
+        _count("bytes_avoided", meta.get("content_length") or 0)
+    else:
+        digest = body_hash(body)
+        if meta is None:
+            outcome = "new"
+        elif digest == meta.get("body_hash"):
+            outcome = "unchanged"
+        else:
+            outcome = "changed"
+        values.update({
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "content_length": len((body or "").encode("utf-8", "replace")),
+            "body_hash": digest,
+            "status_code": status_code,
+        })
+
+    _count(outcome)
+    return outcome, {"outcome": outcome, "values": values}
+
+
+def record_fetch(org_name: str, url: str, record: dict):
+    """Store a fetch_outcome() record for (org, url) and move its next_due_at."""
+    now = datetime.utcnow()
+    changed = record["outcome"] in ("new", "changed")
+    values = dict(record["values"], fetched_at=now)
+    if changed:
+        values["changed_at"] = now
+
+    with engine.begin() as conn:
+        org_id = ensure_orgs(conn, [org_name])[org_name]
+        row = conn.execute(
+            select(_meta_table.c.id, _meta_table.c.revisit_seconds)
+            .where(_meta_table.c.org_id == org_id)
+            .where(_meta_table.c.url == url)
+        ).first()
+
+        interval = next_interval(row.revisit_seconds if row else None, changed)
+        values["revisit_seconds"] = interval
+        values["next_due_at"] = now + timedelta(seconds=interval)
+
+        if row is None:
+            conn.execute(insert(_meta_table).values(org_id=org_id, url=url, fetch_count=1, change_count=1, **values))
+        else:
+            conn.execute(
+                update(_meta_table)
+                .where(_meta_table.c.id == row.id)
+                .values(
+                    fetch_count=_meta_table.c.fetch_count + 1,
+                    change_count=_meta_table.c.change_count + (1 if changed else 0),
+                    **values,
+                )
+            )
+
+
+def log_fetch_cache_stats():
+    s = fetch_cache_stats
+    if not any(s.values()):
+        return
+    print(
+        f" Fetch cache: fresh_skipped={s['fresh_skipped']} new={s['new']} changed={s['changed']} "
+        f"unchanged={s['unchanged']} not_modified={s['not_modified']} "
+        f"bytes_avoided~{s['bytes_avoided'] / 1024:.0f}KiB"
+    )
@@ -0,0 +1,316 @@
+# services/crawler/focused.py
+"""
+Depth-limited focused crawl: follows .onion outlinks by estimated relevance.
+
+- every fetched page's outlinks are normalised (services.crawler.links),
+  checked against a Bloom filter seen-set and pushed into a priority queue
+- link score = relevance of anchor text / URL (org keywords weigh more than
+  threat indicators) * weight of the parent page's estimated severity
+  * FOCUSED_DEPTH_DECAY ** depth
+- parent severity is a rule-based estimate from the fetched page (indicator
+  hits + org mention); the full ML analysis runs later in the pipeline
+- per-host page budget (FOCUSED_PER_HOST_MAX) and per-host politeness via
+  PolitenessScheduler; while the best URL's host is still cooling down the
+  next-best URLs on ready hosts go first (FOCUSED_LOOKAHEAD)
+- discovered URLs are added to the persistent frontier (source="discovered")
+  so later runner passes can revisit them
+
+usage:
+    python -m services.crawler.focused <org_name> <url_or_seedfile> [<query_text>]
+        [--depth=N] [--max-pages=N] [--per-host=N] [--rotate]
+
+Env:
+  FOCUSED_MAX_DEPTH        default 2 (seeds are depth 0)
+  FOCUSED_MAX_PAGES        default 200
+  FOCUSED_PER_HOST_MAX     default 25
+  FOCUSED_DEPTH_DECAY      default 0.7
+  FOCUSED_KEYWORDS         extra org keywords, comma separated
+  FOCUSED_BLOOM_CAPACITY   default 1000000
+  FOCUSED_LOOKAHEAD        default 8
+"""
+
+import os
+import sys
+import time
+import heapq
+from collections import Counter
+from urllib.parse import urlsplit, unquote
+from typing import Callable, List, Optional
+
+from services.crawler.bloom import BloomFilter
+from services.crawler.links import extract_links, normalize_url
+from services.crawler.scheduler import PolitenessScheduler, host_of
+from services.crawler.fetch_cache import SKIP_OUTCOMES
+from services.preprocessor.html_cleaner import clean_html
+from services.preprocessor.hybrid_detector import INDICATORS, detect_rules
+
+
+# ---------------- CONFIG ----------------
+
+MAX_DEPTH = int(os.getenv("FOCUSED_MAX_DEPTH", "2"))
+MAX_PAGES = int(os.getenv("FOCUSED_MAX_PAGES", "200"))
+PER_HOST_MAX = int(os.getenv("FOCUSED_PER_HOST_MAX", "25"))
+DEPTH_DECAY = float(os.getenv("FOCUSED_DEPTH_DECAY", "0.7"))
+EXTRA_KEYWORDS = [k.strip().lower() for k in os.getenv("FOCUSED_KEYWORDS", "").split(",") if k.strip()]
+BLOOM_CAPACITY = int(os.getenv("FOCUSED_BLOOM_CAPACITY", "1000000"))
+LOOKAHEAD = int(os.getenv("FOCUSED_LOOKAHEAD", "8"))
+
+ORG_TERM_WEIGHT = 2.0
+URL_TERM_WEIGHT = 0.5
+SEED_SCORE = 1e9
+
+SEVERITY_WEIGHT = {"CRITICAL": 1.0, "HIGH": 0.8, "MEDIUM": 0.5, "LOW": 0.2}
+
+
+# ---------------- SCORING ----------------
+
+def org_terms(org_name: str) -> List[str]:
+    terms = [org_name.lower()] + [t for t in org_name.lower().replace("-", " ").split() if len(t) > 2]
+    return list(dict.fromkeys(terms + EXTRA_KEYWORDS))
+
+
+def estimate_severity(clean_text: str, terms: List[str]) -> str:
+    """Cheap stand-in for the detector's severity: indicator hits and org mention."""
+    lower = (clean_text or "").lower()
+    hits = detect_rules(lower)
+    mentions_org = any(t in lower for t in terms)
+    if hits and mentions_org:
+        return "CRITICAL"
+    if hits:
+        return "HIGH"
+    if mentions_org:
+        return "MEDIUM"
+    return "LOW"
+
+
+def score_link(url: str, anchor: str, depth: int, parent_severity: str, terms: List[str]) -> float:
+    anchor = (anchor or "").lower()
+    parts = urlsplit(url)
+    path = unquote(parts.path + " " + parts.query).lower()
+
+    relevance = 1.0
+    relevance += ORG_TERM_WEIGHT * sum(t in anchor for t in terms)
+    relevance += sum(ind in anchor for ind in INDICATORS)
+    relevance += URL_TERM_WEIGHT * sum(t in path for t in terms + INDICATORS)
+    return relevance * (0.5 + SEVERITY_WEIGHT.get(parent_severity, 0.2)) * DEPTH_DECAY ** depth
+
+
+# ---------------- CRAWLER ----------------
+
+class FocusedCrawler:
+    """
+    fetch(url) -> (outcome, status_code, html) and save(org, url, html, status_code, query_text) -> bool
+    default to crawler_tor.fetch_page / save_fetched_page; tests and the
+    fixture site pass their own (and a `score` function to compare orderings).
+    """
+
+    def __init__(
+        self,
+        org_name: str,
+        max_depth: int = MAX_DEPTH,
+        max_pages: int = MAX_PAGES,
+        per_host_max: int = PER_HOST_MAX,
+        query_text: Optional[str] = None,
+        fetch: Optional[Callable] = None,
+        save: Optional[Callable] = None,
+        scheduler: Optional[PolitenessScheduler] = None,
+        frontier=None,
+        rotate_circuit: bool = False,
+        score: Callable = score_link,
+    ):
+        self.org_name = org_name
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.per_host_max = per_host_max
+        self.query_text = query_text
+        self.rotate_circuit = rotate_circuit
+        if fetch is None or save is None:
+            # imported lazily: crawler_tor pulls in the Tor / DB stack
+            from services.crawler.crawler_tor import fetch_page, save_fetched_page
+
+            fetch = fetch or (lambda url: fetch_page(org_name, url, rotate_circuit=self.rotate_circuit, wait_for_host=False))
+            save = save or save_fetched_page
+        self.fetch = fetch
+        self.save = save
+        # PolitenessScheduler defines __len__, so an empty one is falsy
+        self.scheduler = scheduler if scheduler is not None else PolitenessScheduler()
+        self.frontier = frontier
+        self.score = score
+
+        self.terms = org_terms(org_name)
+        self.seen = BloomFilter(BLOOM_CAPACITY)
+        self.per_host = Counter()
+        self._heap = []
+        self._seq = 0
+        self.visited: List[str] = []
+        self.stats = Counter()
+
+    # ---------------- QUEUE ----------------
+
+    def _push(self, score: float, url: str, depth: int):
+        self._seq += 1
+        heapq.heappush(self._heap, (-score, self._seq, url, depth))
+
+    def add_seeds(self, urls: List[str]):
+        for url in urls:
+            url = normalize_url(url) or url
+            if self.seen.add(url):
+                self._push(SEED_SCORE, url, 0)
+
+    def _next(self):
+        """Best queued URL whose host is ready now, else the best one (caller waits)."""
+        now = time.monotonic()
+        deferred, choice = [], None
+        while self._heap and len(deferred) < LOOKAHEAD:
+            item = heapq.heappop(self._heap)
+            host = host_of(item[2])
+            if self.per_host[host] >= self.per_host_max:
+                self.stats["host_budget_skips"] += 1
+                continue
+            if self.scheduler.bucket(host).ready_at(now) <= now:
+                choice = item
+                break
+            deferred.append(item)
+        if choice is None and deferred:
+            choice = deferred.pop(0)
+        for item in deferred:
+            heapq.heappush(self._heap, item)
+        return choice
+
+    # ---------------- CRAWL ----------------
+
+    def crawl(self) -> dict:
+        started = time.monotonic()
+        while self._heap and self.stats["fetched"] < self.max_pages:
+            item = self._next()
+            if item is None:
+                break
+            _, _, url, depth = item
+            host = host_of(url)
+
+            wait = self.scheduler.reserve(host)
+            if wait > 0:
+                time.sleep(wait)
+
+            outcome, status_code, html = self.fetch(url)
+            self._record_frontier(url, outcome)
+            if outcome is None:
+                self.stats["host_down"] += 1
+                continue
+            if not outcome:
+                self.stats["failed"] += 1
+                continue
+
+            self.stats["fetched"] += 1
+            self.per_host[host] += 1
+            self.visited.append(url)
+            if outcome not in SKIP_OUTCOMES:
+                self.stats["saved"] += 1 if self.save(self.org_name, url, html, status_code, self.query_text) else 0
+
+            if html:
+                self._expand(url, html, depth)
+
+        self.stats["elapsed"] = time.monotonic() - started
+        return dict(self.stats)
+
+    def _expand(self, url: str, html: str, depth: int):
+        severity = estimate_severity(clean_html(html), self.terms)
+        if severity in ("HIGH", "CRITICAL"):
+            self.stats["relevant"] += 1
+        if depth >= self.max_depth:
+            self.stats["depth_limited"] += 1
+            return
+
+        discovered = []
+        for link, anchor in extract_links(html, url):
+            if not self.seen.add(link):
+                self.stats["already_seen"] += 1
+                continue
+            discovered.append(link)
+            self._push(self.score(link, anchor, depth + 1, severity, self.terms), link, depth + 1)
+        self.stats["discovered"] += len(discovered)
+
+        if self.frontier is not None and discovered:
+            try:
+                self.frontier.add_urls(self.org_name, discovered, source="discovered")
+            except Exception as e:
+                print(" Frontier update failed:", e)
+
+    def _record_frontier(self, url: str, outcome):
+        if self.frontier is None:
+            return
+        try:
+            self.frontier.record(self.org_name, url, outcome)
+        except Exception as e:
+            print(" Frontier update failed:", e)
+
+    def log_summary(self):
+        s = self.stats
+        fetched = s["fetched"]
+        print(
+            f" Focused crawl: fetched={fetched} saved={s['saved']} failed={s['failed']} "
+            f"host_down={s['host_down']} discovered={s['discovered']} already_seen={s['already_seen']} "
+            f"depth_limited={s['depth_limited']} host_budget_skips={s['host_budget_skips']} "
+            f"queued={len(self._heap)} harvest_rate={s['relevant'] / fetched if fetched else 0.0:.1%} "
+            f"seen_set={self.seen.size_bytes / 1024:.0f}KiB"
+        )
+
+
+# ---------------- MAIN ----------------
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] in ("-h", "--help"):
+        print(
+            "Usage: python -m services.crawler.focused "
+            "<org_name> <url_or_seedfile> [<query_text>] "
+            "[--depth=N] [--max-pages=N] [--per-host=N] [--rotate]"
+        )
+        sys.exit(1)
+
+    from services.crawler.crawler_tor import load_seeds, is_url, finish_pipeline, PER_HOST_DELAY
+    from services.crawler.tor_session import log_session_stats
+    from services.crawler.proxy_pool import get_proxy_pool
+    from services.crawler.frontier import Frontier
+    from services.ml.darkbert_infer import warm_up_in_background
+    from services.pipeline.analyzer_worker import start_local_analyzers
+
+    org_name, target = sys.argv[1], sys.argv[2]
+    query_text = sys.argv[3] if len(sys.argv) > 3 and not sys.argv[3].startswith("--") else "focused-crawl"
+    opts = dict(a[2:].split("=", 1) for a in sys.argv[3:] if a.startswith("--") and "=" in a)
+
+    if os.path.isfile(target):
+        seeds = load_seeds(target)
+    elif is_url(target):
+        seeds = [target]
+    else:
+        print(f" ERROR: {target} is neither a URL nor a seed file.")
+        sys.exit(1)
+
+    warm_up_in_background()
+    analyzers = start_local_analyzers()
+
+    frontier = Frontier()
+    crawler = FocusedCrawler(
+        org_name,
+        max_depth=int(opts.get("depth", MAX_DEPTH)),
+        max_pages=int(opts.get("max-pages", MAX_PAGES)),
+        per_host_max=int(opts.get("per-host", PER_HOST_MAX)),
+        query_text=query_text,
+        scheduler=PolitenessScheduler(legacy_delay=PER_HOST_DELAY),
+        frontier=frontier,
+        rotate_circuit="--rotate" in sys.argv,
+    )
+    frontier.add_urls(org_name, seeds)
+    crawler.add_seeds(seeds)
+    print(f" Focused crawl for {org_name}: {len(seeds)} seeds, depth {crawler.max_depth}, max {crawler.max_pages} pages")
+
+    crawler.crawl()
+    crawler.log_summary()
+    crawler.scheduler.log_summary()
+    log_session_stats()
+    get_proxy_pool().log_stats()
+    finish_pipeline(analyzers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# services/crawler/frontier.py
+"""
+Persistent crawl frontier (frontier table) and expected-value planning.
+
+Each (org, url) row tracks first/last fetch, fetch and change counts,
+consecutive failures and how many of its pages produced threats. Every run
+ranks URLs by the expected value of one Tor request:
+
+  value = P(reachable) * P(new content since last fetch) * (1 + W * threat yield)
+
+- P(reachable)   FAILURE_DECAY ** consecutive failures
+- P(new content) 1 for never-fetched URLs, else 1 - exp(-rate * elapsed),
+                 rate = (changes + 1) / (observed seconds + CHANGE_PRIOR)
+- threat yield   (threatened pages + 0.1) / (fetches + 1), smoothed share of
+                 fetches whose page got a threat for this org (pages, not
+                 rows: a dump with many IOCs counts once, and watchlist
+                 fan-out rows for other orgs do not count)
+
+and takes the best URLs under the run budget (with a per-org cap), so new
+URLs, pages that change often and pages that produced threats are visited
+first instead of the first N lines of each seed file.
+
+Env:
+  FRONTIER_THREAT_WEIGHT        default 2.0
+  FRONTIER_FAILURE_DECAY        default 0.5
+  FRONTIER_CHANGE_PRIOR_SECONDS default 604800 (one change per week prior)
+  FRONTIER_MIN_VALUE            default 0.05 (below this a URL is not worth a request)
+"""
+
+import os
+import math
+from urllib.parse import urlparse
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, insert, update, func, bindparam
+
+from api.db import engine as default_engine
+from api.models import FrontierUrl, CrawledPage, Threat
+from services.crawler.crawler_db import ensure_orgs
+
+
+THREAT_WEIGHT = float(os.getenv("FRONTIER_THREAT_WEIGHT", "2.0"))
+FAILURE_DECAY = float(os.getenv("FRONTIER_FAILURE_DECAY", "0.5"))
+CHANGE_PRIOR_SECONDS = float(os.getenv("FRONTIER_CHANGE_PRIOR_SECONDS", str(7 * 86400)))
+MIN_VALUE = float(os.getenv("FRONTIER_MIN_VALUE", "0.05"))
+
+# fetch outcomes (crawler_tor.classify_fetch) that count as changed content
+CHANGED_OUTCOMES = ("changed", "fetched")
+
+_table = FrontierUrl.__table__
+
+
+def _utc(dt: Optional[datetime]) -> Optional[datetime]:
+    if dt is not None and dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def expected_value(row, now: datetime) -> float:
+    reachable = FAILURE_DECAY ** row["failure_count"]
+
+    last = _utc(row["last_fetched_at"])
+    if last is None:
+        p_new = 1.0
+    else:
+        first = _utc(row["first_fetched_at"]) or last
+        observed = (last - first).total_seconds() + CHANGE_PRIOR_SECONDS
+        rate = (row["change_count"] + 1) / observed
+        elapsed = max(0.0, (now - last).total_seconds())
+        p_new = 1.0 - math.exp(-rate * elapsed)
+
+    threat_yield = (row["threat_count"] + 0.1) / (row["fetch_count"] + 1)
+    return reachable * p_new * (1.0 + THREAT_WEIGHT * threat_yield)
+
+
+class Frontier:
+    def __init__(self, engine=None):
+        self.engine = engine or default_engine
+        self._org_ids: Dict[str, int] = {}
+
+    def _org_id(self, conn, org_name: str) -> int:
+        if org_name not in self._org_ids:
+            self._org_ids.update(ensure_orgs(conn, [org_name]))
+        return self._org_ids[org_name]
+
+    # ---------------- URLS ----------------
+
+    def add_urls(self, org_name: str, urls: Iterable[str], source: str = "seed") -> int:
+        """Insert URLs not yet in the org's frontier; returns how many were new."""
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return 0
+        with self.engine.begin() as conn:
+            org_id = self._org_id(conn, org_name)
+            known = set()
+            for start in range(0, len(urls), 500):
+                known.update(conn.execute(
+                    select(_table.c.url)
+                    .where(_table.c.org_id == org_id)
+                    .where(_table.c.url.in_(urls[start:start + 500]))
+                ).scalars())
+            new = [u for u in urls if u not in known]
+            if new:
+                now = datetime.utcnow()
+                conn.execute(insert(_table), [
+                    {"org_id": org_id, "url": u, "source": source, "added_at": now} for u in new
+                ])
+        return len(new)
+
+    def refresh_threat_counts(self, org_names: List[str]):
+        """Recount threatened pages per (org, url) from stored pages into the frontier."""
+        with self.engine.begin() as conn:
+            org_ids = [self._org_id(conn, name) for name in org_names]
+            counts = conn.execute(
+                select(CrawledPage.org_id, CrawledPage.url, func.count(func.distinct(CrawledPage.id)))
+                .join(Threat, Threat.crawled_page_id == CrawledPage.id)
+                .where(CrawledPage.org_id.in_(org_ids))
+                .where(Threat.org_id == CrawledPage.org_id)
+                .group_by(CrawledPage.org_id, CrawledPage.url)
+            ).all()
+            if counts:
+                conn.execute(
+                    update(_table)
+                    .where(_table.c.org_id == bindparam("b_org"))
+                    .where(_table.c.url == bindparam("b_url"))
+                    .values(threat_count=bindparam("b_count")),
+                    [{"b_org": o, "b_url": u, "b_count": n} for o, u, n in counts],
+                )
+
+    # ---------------- PLANNING ----------------
+
+    def plan(
+        self,
+        org_names: List[str],
+        budget: int,
+        per_org_max: Optional[int] = None,
+        min_value: float = MIN_VALUE,
+        skip_host: Optional[Callable[[str], bool]] = None,
+        fresh_urls: Optional[Callable[[str, List[str]], Iterable[str]]] = None,
+    ) -> List[Tuple[str, str, float]]:
+        """
+        Best (url, org_name, value) first, at most `budget` URLs in total.
+        URLs whose host matches `skip_host` (open host circuit breaker), and
+        URLs that `fresh_urls(org_name, urls)` reports as not due yet (fetch
+        cache), do not use up the budget.
+        """
+        now = datetime.utcnow()
+        with self.engine.begin() as conn:
+            org_ids = {self._org_id(conn, name): name for name in org_names}
+            rows = conn.execute(select(_table).where(_table.c.org_id.in_(list(org_ids)))).mappings().all()
+
+        fresh = set()
+        if fresh_urls:
+            for org_id, org in org_ids.items():
+                urls = [r["url"] for r in rows if r["org_id"] == org_id]
+                fresh.update((org_id, u) for u in fresh_urls(org, urls))
+
+        scored = sorted(
+            ((expected_value(r, now), r) for r in rows),
+            key=lambda vr: vr[0],
+            reverse=True,
+        )
+
+        picked, per_org = [], {}
+        skipped_hosts = 0
+        for value, r in scored:
+            if len(picked) >= budget or value < min_value:
+                break
+            if skip_host and skip_host(urlparse(r["url"]).hostname or ""):
+                skipped_hosts += 1
+                continue
+            if (r["org_id"], r["url"]) in fresh:
+                continue
+            org = org_ids[r["org_id"]]
+            if per_org_max is not None and per_org.get(org, 0) >= per_org_max:
+                continue
+            per_org[org] = per_org.get(org, 0) + 1
+            picked.append((r["url"], org, value))
+
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(_table).where(_table.c.id == bindparam("b_id")).values(priority=bindparam("b_value")),
+                [{"b_id": r["id"], "b_value": v} for v, r in scored],
+            )
+
+        skipped_low = sum(1 for v, _ in scored if v < min_value)
+        print(
+            f" Frontier: {len(rows)} URLs, planned {len(picked)} (budget {budget}), "
+            f"{skipped_low} below min value {min_value}, {skipped_hosts} on hosts that are down, "
+            f"{len(fresh)} not due yet"
+        )
+        return picked
+
+    # ---------------- RESULTS ----------------
+
+    def record(self, org_name: str, url: str, outcome):
+        """
+        Update statistics after a fetch; outcome is fetch_and_save's return
+        value (None = not fetched because the host is down, nothing to record).
+        """
+        if outcome is None:
+            return
+        now = datetime.utcnow()
+        c = _table.c
+        with self.engine.begin() as conn:
+            org_id = self._org_id(conn, org_name)
+            stmt = update(_table).where(c.org_id == org_id).where(c.url == url)
+            if not outcome:
+                conn.execute(stmt.values(failure_count=c.failure_count + 1))
+                return
+            conn.execute(stmt.values(
+                failure_count=0,
+                fetch_count=c.fetch_count + 1,
+                change_count=c.change_count + (1 if outcome in CHANGED_OUTCOMES else 0),
+                first_fetched_at=func.coalesce(c.first_fetched_at, now),
+                last_fetched_at=now,
+            ))
+
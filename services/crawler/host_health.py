@@ -0,0 +1,242 @@
+# services/crawler/host_health.py
+"""
+Host health registry with a per-host circuit breaker (dead onion tracking).
+
+A dead onion costs RETRY_ATTEMPTS timeouts with backoff plus a Playwright
+launch before the fetch gives up, and used to cost that again on every run.
+
+- every fetch outcome is recorded per host (host_health table, loaded once
+  per process and kept in memory)
+- HOST_FAIL_THRESHOLD consecutive failed fetches open the breaker: URLs on
+  that host are skipped instantly until next_probe_at
+- once due, a single probe request is let through (one attempt, no
+  Playwright fallback); success closes the breaker, failure doubles the
+  probe interval (HOST_PROBE_BASE_SECONDS .. HOST_PROBE_MAX_SECONDS)
+- time saved = skipped requests * the host's average failed-fetch duration,
+  reported with per-host health in the run summary
+
+Env:
+  HOST_HEALTH                 true | false (default true)
+  HOST_FAIL_THRESHOLD         default 2
+  HOST_PROBE_BASE_SECONDS     default 3600
+  HOST_PROBE_MAX_SECONDS      default 604800 (7 days)
+  HOST_HEALTH_REPORT          hosts listed in the summary (default 20)
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Set
+
+from sqlalchemy import select, insert, update
+
+from api.db import engine as default_engine
+from api.models import HostHealth
+
+
+HOST_HEALTH = os.getenv("HOST_HEALTH", "true").lower() in ("1", "true", "yes")
+FAIL_THRESHOLD = int(os.getenv("HOST_FAIL_THRESHOLD", "2"))
+PROBE_BASE = float(os.getenv("HOST_PROBE_BASE_SECONDS", "3600"))
+PROBE_MAX = float(os.getenv("HOST_PROBE_MAX_SECONDS", str(7 * 86400)))
+REPORT_HOSTS = int(os.getenv("HOST_HEALTH_REPORT", "20"))
+
+EWMA_ALPHA = 0.3
+
+# check() verdicts
+ALLOW = "allow"
+PROBE = "probe"
+SKIP = "skip"
+
+_table = HostHealth.__table__
+
+
+def _utc(dt: Optional[datetime]) -> Optional[datetime]:
+    if dt is not None and dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+class HostHealthRegistry:
+    def __init__(self, engine=None):
+        self.engine = engine or default_engine
+        self._hosts: Dict[str, dict] = {}
+        self._probing: Set[str] = set()
+        self._touched: Set[str] = set()
+        self._lock = threading.Lock()
+        self.stats = {"skipped": 0, "probes": 0, "recovered": 0, "opened": 0, "seconds_saved": 0.0}
+        self._load()
+
+    def _load(self):
+        with self.engine.connect() as conn:
+            for row in conn.execute(select(_table)).mappings():
+                h = dict(row)
+                h["next_probe_at"] = _utc(h["next_probe_at"])
+                self._hosts[h["host"]] = h
+
+    # ---------------- CHECK ----------------
+
+    def check(self, host: str, now: Optional[datetime] = None) -> str:
+        """ALLOW a normal fetch, let a single PROBE through, or SKIP a broken host."""
+        host = (host or "").lower()
+        now = now or datetime.utcnow()
+        with self._lock:
+            self._touched.add(host)
+            h = self._hosts.get(host)
+            if h is None or h["state"] != "open":
+                return ALLOW
+            if host not in self._probing and (h["next_probe_at"] is None or h["next_probe_at"] <= now):
+                self._probing.add(host)
+                self.stats["probes"] += 1
+                return PROBE
+            self.stats["skipped"] += 1
+            self.stats["seconds_saved"] += h["failure_seconds"] or 0.0
+            return SKIP
+
+    def is_blocked(self, host: str, now: Optional[datetime] = None) -> bool:
+        """
+        True when the breaker is open and no probe is due; counted as a skip.
+        Used to plan around broken hosts before anything is queued.
+        """
+        host = (host or "").lower()
+        now = now or datetime.utcnow()
+        with self._lock:
+            h = self._hosts.get(host)
+            if h is None or h["state"] != "open" or h["next_probe_at"] is None or h["next_probe_at"] <= now:
+                return False
+            self._touched.add(host)
+            self.stats["skipped"] += 1
+            self.stats["seconds_saved"] += h["failure_seconds"] or 0.0
+            return True
+
+    # ---------------- RECORD ----------------
+
+    def record(self, host: str, ok: bool, elapsed: float, error: Optional[str] = None):
+        """Record one fetch; opens / closes the breaker and persists the host row."""
+        host = (host or "").lower()
+        now = datetime.utcnow()
+        with self._lock:
+            was_probe = host in self._probing
+            self._probing.discard(host)
+            h = self._hosts.get(host)
+            is_new = h is None
+            if is_new:
+                h = self._hosts[host] = {
+                    "host": host,
+                    "state": "closed",
+                    "consecutive_failures": 0,
+                    "total_failures": 0,
+                    "total_successes": 0,
+                    "last_error": None,
+                    "last_success_at": None,
+                    "last_failure_at": None,
+                    "next_probe_at": None,
+                    "probe_interval_seconds": None,
+                    "failure_seconds": None,
+                }
+
+            if ok:
+                if h["state"] == "open":
+                    self.stats["recovered"] += 1
+                    print(f" Host {host} is reachable again, closing circuit")
+                h.update(
+                    state="closed",
+                    consecutive_failures=0,
+                    total_successes=h["total_successes"] + 1,
+                    last_success_at=now,
+                    next_probe_at=None,
+                    probe_interval_seconds=None,
+                )
+            else:
+                h["consecutive_failures"] += 1
+                h["total_failures"] += 1
+                h["last_failure_at"] = now
+                h["last_error"] = (error or "")[:500] or None
+                if was_probe:
+                    # a probe is a single cheap attempt; a full failed fetch would have cost more
+                    self.stats["seconds_saved"] += max(0.0, (h["failure_seconds"] or elapsed) - elapsed)
+                else:
+                    prev = h["failure_seconds"]
+                    h["failure_seconds"] = elapsed if prev is None else EWMA_ALPHA * elapsed + (1 - EWMA_ALPHA) * prev
+
+                if h["state"] == "open":
+                    # requests already in flight when the breaker opened do not push the probe out
+                    interval = min(PROBE_MAX, 2 * (h["probe_interval_seconds"] or PROBE_BASE)) if was_probe else None
+                elif h["consecutive_failures"] >= FAIL_THRESHOLD:
+                    interval = PROBE_BASE
+                    self.stats["opened"] += 1
+                else:
+                    interval = None
+                if interval is not None:
+                    h.update(
+                        state="open",
+                        probe_interval_seconds=interval,
+                        next_probe_at=now + timedelta(seconds=interval),
+                    )
+                    print(f" Host {host} unreachable ({h['consecutive_failures']} failures), next probe in {interval / 3600:.1f}h")
+
+            values = {k: v for k, v in h.items() if k not in ("id", "host")}
+
+        with self.engine.begin() as conn:
+            if is_new:
+                conn.execute(insert(_table).values(host=host, **values))
+            else:
+                conn.execute(update(_table).where(_table.c.host == host).values(**values))
+
+    # ---------------- REPORT ----------------
+
+    def log_summary(self):
+        s = self.stats
+        with self._lock:
+            touched = [self._hosts[h] for h in self._touched if h in self._hosts]
+        if not touched and not s["skipped"]:
+            return
+        open_hosts = sum(1 for h in touched if h["state"] == "open")
+        print(
+            f" Host health: hosts={len(touched)} open={open_hosts} skipped={s['skipped']} "
+            f"probes={s['probes']} recovered={s['recovered']} newly_open={s['opened']} "
+            f"time_saved~{s['seconds_saved']:.0f}s"
+        )
+        now = datetime.utcnow()
+        unhealthy = sorted(
+            (h for h in touched if h["consecutive_failures"]),
+            key=lambda h: h["consecutive_failures"],
+            reverse=True,
+        )
+        for h in unhealthy[:REPORT_HOSTS]:
+            probe = ""
+            if h["state"] == "open" and h["next_probe_at"] is not None:
+                probe = f" next_probe_in={max(0.0, (h['next_probe_at'] - now).total_seconds()) / 3600:.1f}h"
+            print(
+                f"  {h['host']}: {h['state']} failures={h['consecutive_failures']} "
+                f"(total {h['total_failures']}, ok {h['total_successes']}){probe}"
+            )
+        if len(unhealthy) > REPORT_HOSTS:
+            print(f"  ... {len(unhealthy) - REPORT_HOSTS} more unhealthy hosts")
+
+
+# ---------------- SHARED INSTANCE ----------------
+
+_registry: Optional[HostHealthRegistry] = None
+_registry_failed = False
+_registry_lock = threading.Lock()
+
+
+def get_host_health() -> Optional[HostHealthRegistry]:
+    """Shared registry, or None when HOST_HEALTH is off or the table is unavailable."""
+    global _registry, _registry_failed
+    if not HOST_HEALTH or _registry_failed:
+        return None
+    with _registry_lock:
+        if _registry is None:
+            try:
+                _registry = HostHealthRegistry()
+            except Exception as e:
+                print(" Host health registry unavailable:", e)
+                _registry_failed = True
+                return None
+        return _registry
+
+
+def log_host_health():
+    if _registry is not None:
+        _registry.log_summary()
@@ -0,0 +1,75 @@
+# services/crawler/links.py
+"""
+Outlink extraction and URL normalisation for the focused crawler.
+
+normalize_url() maps the many spellings of one page to a single key:
+- resolved against the page URL (or its <base href>)
+- scheme and host lowercased, trailing dot and default port dropped
+- empty path becomes "/", fragment removed
+- tracking parameters (utm_*, fbclid, ...) dropped, remaining query sorted
+Only http(s) links to v3 onion hosts (optionally with subdomains) are kept.
+"""
+
+import re
+from typing import List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+
+from bs4 import BeautifulSoup
+
+
+ONION_HOST_RE = re.compile(r"^(?:[a-z0-9-]+\.)*[a-z2-7]{56}\.onion$")
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "ref_src")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def is_onion_host(host: Optional[str]) -> bool:
+    return bool(host) and ONION_HOST_RE.match(host) is not None
+
+
+def normalize_url(url: str, base: Optional[str] = None) -> Optional[str]:
+    """Canonical form of `url` (resolved against `base`), or None if it is not a crawlable onion URL."""
+    url = (url or "").strip()
+    if not url or url.startswith(("#", "javascript:", "mailto:", "data:")):
+        return None
+    if base:
+        url = urljoin(base, url)
+
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return None
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    if scheme not in DEFAULT_PORTS or not is_onion_host(host):
+        return None
+
+    netloc = host if port in (None, DEFAULT_PORTS[scheme]) else f"{host}:{port}"
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(TRACKING_PARAMS)
+    ))
+    return urlunsplit((scheme, netloc, parts.path or "/", query, ""))
+
+
+def extract_links(html: str, page_url: str) -> List[Tuple[str, str]]:
+    """[(normalized onion url, anchor text)] in page order, first occurrence of each URL."""
+    if not html:
+        return []
+    soup = BeautifulSoup(html, "lxml")
+
+    base = page_url
+    base_tag = soup.find("base", href=True)
+    if base_tag:
+        base = urljoin(page_url, base_tag["href"])
+
+    links, seen = [], set()
+    for a in soup.find_all("a", href=True):
+        url = normalize_url(a["href"], base)
+        if url is None or url in seen:
+            continue
+        seen.add(url)
+        anchor = " ".join(a.get_text(" ", strip=True).split()) or a.get("title", "")
+        links.append((url, anchor[:200]))
+    return links
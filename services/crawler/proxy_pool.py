@@ -0,0 +1,177 @@
+# services/crawler/proxy_pool.py
+"""
+Pool of Tor SOCKS endpoints with health-aware selection.
+
+- endpoints come from TOR_SOCKS_POOL (comma separated), falling back to TOR_SOCKS
+- every slot carries the control port of its Tor instance (circuit rotation
+  goes to that instance): TOR_CONTROL_POOL, in TOR_SOCKS_POOL order; else
+  TOR_CONTROL_PORT for a single endpoint, SOCKS port + 1 for several
+  (the layout of docker-compose.tor.yml)
+- TOR_ISOLATION_SLOTS > 1 splits every endpoint into username-isolated slots
+  (IsolateSOCKSAuth), i.e. separate circuits on the same Tor instance
+- each slot tracks an EWMA of fetch latency, success/failure counts and
+  in-flight requests; acquire() picks the better of two random healthy slots
+- repeated failures put a slot in exponential cooldown so traffic routes
+  away from slow or broken circuits
+
+usage:
+    proxy = get_proxy_pool().acquire()
+    ... fetch through proxy.url / proxy.isolation ...
+    get_proxy_pool().release(proxy, ok=True, latency=elapsed)
+"""
+
+import os
+import time
+import random
+import threading
+from typing import List, Optional
+from urllib.parse import urlparse
+
+from services.crawler.tor_control import DEFAULT_CONTROL_PORT
+from services.crawler.tor_session import DEFAULT_SOCKS, with_isolation
+
+
+# ---------------- CONFIG ----------------
+
+EWMA_ALPHA = 0.3
+INITIAL_LATENCY = 5.0        # optimistic prior (s) for slots without samples
+FAIL_THRESHOLD = 3           # consecutive failures before cooldown
+COOLDOWN_BASE = 30.0         # seconds, doubled for every further failure
+COOLDOWN_MAX = 600.0
+
+
+def pool_endpoints_from_env() -> List[str]:
+    spec = os.getenv("TOR_SOCKS_POOL", "")
+    endpoints = [e.strip() for e in spec.split(",") if e.strip()]
+    return endpoints or [DEFAULT_SOCKS]
+
+
+def control_ports_for(endpoints: List[str]) -> List[int]:
+    spec = os.getenv("TOR_CONTROL_POOL", "")
+    ports = [int(p) for p in spec.split(",") if p.strip()]
+    if ports:
+        if len(ports) != len(endpoints):
+            raise ValueError(f"TOR_CONTROL_POOL has {len(ports)} ports for {len(endpoints)} SOCKS endpoints")
+        return ports
+    if len(endpoints) == 1:
+        return [DEFAULT_CONTROL_PORT]
+    return [(urlparse(url).port or 9050) + 1 for url in endpoints]
+
+
+# ---------------- PROXY SLOT ----------------
+
+class ProxySlot:
+    def __init__(self, url: str, isolation: Optional[str] = None, control_port: int = DEFAULT_CONTROL_PORT):
+        self.url = url
+        self.isolation = isolation
+        self.control_port = control_port
+        self.latency = INITIAL_LATENCY
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.inflight = 0
+
+    @property
+    def name(self) -> str:
+        return self.url + (f"#{self.isolation}" if self.isolation else "")
+
+    @property
+    def proxy_url(self) -> str:
+        """SOCKS URL including the isolation username (for httpx/requests)."""
+        return with_isolation(self.url, self.isolation)
+
+    def failure_rate(self) -> float:
+        total = self.successes + self.failures
+        # Laplace smoothing so fresh slots are neither perfect nor dead
+        return (self.failures + 1) / (total + 2)
+
+    def score(self) -> float:
+        """Lower is better: expected latency inflated by load and failure rate."""
+        return self.latency * (1 + self.inflight) / max(0.05, 1 - self.failure_rate())
+
+    def as_dict(self) -> dict:
+        return {
+            "latency_ewma": round(self.latency, 3),
+            "successes": self.successes,
+            "failures": self.failures,
+            "failure_rate": round(self.failure_rate(), 3),
+            "cooling_down": self.cooldown_until > time.monotonic(),
+        }
+
+
+# ---------------- POOL ----------------
+
+class ProxyPool:
+    def __init__(
+        self,
+        endpoints: Optional[List[str]] = None,
+        isolation_slots: int = 1,
+        control_ports: Optional[List[int]] = None,
+    ):
+        endpoints = endpoints or pool_endpoints_from_env()
+        control_ports = control_ports or control_ports_for(endpoints)
+        self.slots: List[ProxySlot] = []
+        for url, control_port in zip(endpoints, control_ports):
+            if isolation_slots > 1:
+                self.slots.extend(ProxySlot(url, f"slot{i}", control_port) for i in range(isolation_slots))
+            else:
+                self.slots.append(ProxySlot(url, control_port=control_port))
+        self._lock = threading.Lock()
+
+    def acquire(self) -> ProxySlot:
+        with self._lock:
+            now = time.monotonic()
+            healthy = [s for s in self.slots if s.cooldown_until <= now]
+            if not healthy:
+                # everything is cooling down: use the one that recovers first
+                slot = min(self.slots, key=lambda s: s.cooldown_until)
+            elif len(healthy) == 1:
+                slot = healthy[0]
+            else:
+                a, b = random.sample(healthy, 2)
+                slot = a if a.score() <= b.score() else b
+            slot.inflight += 1
+            return slot
+
+    def release(self, slot: ProxySlot, ok: bool, latency: Optional[float] = None):
+        with self._lock:
+            slot.inflight = max(0, slot.inflight - 1)
+            if latency is not None:
+                slot.latency = EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * slot.latency
+            if ok:
+                slot.successes += 1
+                slot.consecutive_failures = 0
+                return
+            slot.failures += 1
+            slot.consecutive_failures += 1
+            if slot.consecutive_failures >= FAIL_THRESHOLD:
+                backoff = COOLDOWN_BASE * 2 ** (slot.consecutive_failures - FAIL_THRESHOLD)
+                slot.cooldown_until = time.monotonic() + min(backoff, COOLDOWN_MAX)
+                print(f" Proxy {slot.name} cooling down for {min(backoff, COOLDOWN_MAX):.0f}s")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {s.name: s.as_dict() for s in self.slots}
+
+    def log_stats(self):
+        for name, st in self.stats().items():
+            print(
+                f" Proxy {name}: ok={st['successes']} failed={st['failures']} "
+                f"failure_rate={st['failure_rate']:.0%} latency_ewma={st['latency_ewma']:.2f}s"
+                + (" (cooling down)" if st["cooling_down"] else "")
+            )
+
+
+# ---------------- SHARED INSTANCE ----------------
+
+_pool: Optional[ProxyPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_proxy_pool() -> ProxyPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProxyPool(isolation_slots=int(os.getenv("TOR_ISOLATION_SLOTS", "1")))
+        return _pool
@@ -2,18 +2,36 @@
 """
 Simple focused crawler runner:
 - expects seeds/<org>.txt with one URL per line (ignores blank lines and comments)
+- seeds are merged into the persistent frontier; each run visits the URLs
+  with the highest expected value (see services.crawler.frontier) under a
+  run budget (RUNNER_BUDGET) and a per-org cap (RUNNER_PER_ORG_MAX)
 - uses services.crawler.crawler_tor.fetch_and_save to fetch via Tor and save results
-- enforces per-org max_pages per run and per-host politeness (delegated to fetch function)
+- per-host politeness comes from a shared PolitenessScheduler so URLs of all
+  orgs are interleaved by host readiness
+- hosts with an open circuit breaker (services.crawler.host_health) and URLs
+  the fetch cache says are not due yet (crawler_tor.drop_fresh_urls) are left
+  out of the plan, so they do not use up the budget; --force plans them anyway
 """
 import os
 import time
 from pathlib import Path
 from typing import List
-from services.crawler.crawler_tor import fetch_and_save
+from services.crawler.crawler_tor import fetch_and_save, drop_fresh_urls, finish_pipeline, PER_HOST_DELAY
+from services.crawler.frontier import Frontier
+from services.crawler.host_health import get_host_health
+from services.crawler.scheduler import PolitenessScheduler
+from services.crawler.tor_session import log_session_stats
+from services.ml.darkbert_infer import warm_up_in_background
+from services.crawler.proxy_pool import get_proxy_pool
+from services.pipeline.analyzer_worker import start_local_analyzers
 
 SEEDS_DIR = Path("seeds")
 PER_ORG_MAX = int(os.getenv("RUNNER_PER_ORG_MAX", "20"))
+# total Tor requests per run; 0 = RUNNER_PER_ORG_MAX per org
+RUN_BUDGET = int(os.getenv("RUNNER_BUDGET", "0"))
+# legacy pauses; no longer slept, only used to report the idle time the scheduler saves
 DELAY_BETWEEN_ORGS = float(os.getenv("RUNNER_DELAY_BETWEEN_ORGS", "2.0"))
+DELAY_BETWEEN_SEEDS = 0.5
 ROTATE_CIRCUIT = os.getenv("RUNNER_ROTATE_CIRCUIT", "false").lower() in ("1","true","yes")
 
 def load_seeds_for_org(org: str) -> List[str]:
@@ -24,7 +42,7 @@ def load_seeds_for_org(org: str) -> List[str]:
     seeds = [ln for ln in lines if ln and not ln.startswith("#")]
     return seeds
 
-def run_all(orgs: List[str] = None):
+def run_all(orgs: List[str] = None, force: bool = False):
     if not SEEDS_DIR.exists():
         print("No seeds/ directory found. Create seeds/<org>.txt files first.")
         return
@@ -34,21 +52,49 @@ def run_all(orgs: List[str] = None):
     else:
         org_list = org_files
     print("Found org seeds:", org_list)
+    warm_up_in_background()
+    analyzers = start_local_analyzers()
+    frontier = Frontier()
     for org in org_list:
-        seeds = load_seeds_for_org(org)[:PER_ORG_MAX]
-        print(f"== Running for org={org} seeds={len(seeds)} (max {PER_ORG_MAX}) rotate_circuit={ROTATE_CIRCUIT}")
-        for url in seeds:
-            try:
-                fetch_and_save(org, url, query_text="seed-run", rotate_circuit=ROTATE_CIRCUIT)
-            except Exception as e:
-                print("Runner: fetch failed:", e)
-            # small pause between seeds to be polite (fetch function also pauses per-host)
-            time.sleep(0.5)
-        print(f"Finished org={org}, sleeping {DELAY_BETWEEN_ORGS}s before next org")
-        time.sleep(DELAY_BETWEEN_ORGS)
+        added = frontier.add_urls(org, load_seeds_for_org(org))
+        print(f"== Org={org}: {added} new seeds added to the frontier")
+    frontier.refresh_threat_counts(org_list)
+
+    budget = RUN_BUDGET or PER_ORG_MAX * len(org_list)
+    health = get_host_health()
+    plan = frontier.plan(
+        org_list,
+        budget=budget,
+        per_org_max=PER_ORG_MAX,
+        skip_host=health.is_blocked if health else None,
+        fresh_urls=lambda org, urls: set(urls) - set(drop_fresh_urls(urls, org, force)),
+    )
+
+    scheduler = PolitenessScheduler(legacy_delay=PER_HOST_DELAY + DELAY_BETWEEN_SEEDS)
+    for url, org, value in plan:
+        scheduler.add(url, org)
+    print(f"== Queued {len(plan)} URLs (max {PER_ORG_MAX}/org) rotate_circuit={ROTATE_CIRCUIT}")
+
+    started = time.monotonic()
+    while len(scheduler):
+        url, org = scheduler.next()
+        outcome = False
+        try:
+            outcome = fetch_and_save(org, url, query_text="seed-run", rotate_circuit=ROTATE_CIRCUIT, wait_for_host=False)
+        except Exception as e:
+            print("Runner: fetch failed:", e)
+        try:
+            frontier.record(org, url, outcome)
+        except Exception as e:
+            print("Runner: frontier update failed:", e)
+    print(f"Finished {len(org_list)} orgs in {time.monotonic() - started:.1f}s")
+    scheduler.log_summary(extra_legacy_seconds=DELAY_BETWEEN_ORGS * len(org_list))
+    log_session_stats()
+    get_proxy_pool().log_stats()
+    finish_pipeline(analyzers)
 
 if __name__ == "__main__":
     # optional: pass org names as args to restrict run to specific orgs
     import sys
-    selected = sys.argv[1:] if len(sys.argv) > 1 else None
-    run_all(selected)
+    selected = [a for a in sys.argv[1:] if not a.startswith("--")] or None
+    run_all(selected, force="--force" in sys.argv)
@@ -0,0 +1,176 @@
+# services/crawler/scheduler.py
+"""
+Per-host politeness scheduler.
+
+- every host gets a token bucket (rate = requests/sec, burst = tokens)
+- pending URLs are queued per host; a heap keyed by each host's ready time
+  decides which URL goes next, so waits for one host overlap with fetches
+  to other hosts instead of accumulating
+- used by crawler_tor (sequential + async) and runner.py
+
+Env:
+  CRAWL_HOST_RATE   default requests/sec per host (0.5 == one request every 2s)
+  CRAWL_HOST_BURST  tokens a host may spend back-to-back (default 1)
+  CRAWL_HOST_RATES  per-host overrides, e.g. "abc.onion=0.2,def.onion=1"
+"""
+
+import os
+import time
+import heapq
+from collections import deque
+from urllib.parse import urlparse
+from typing import Any, Dict, Optional, Tuple
+
+
+# ---------------- CONFIG ----------------
+
+DEFAULT_HOST_RATE = float(os.getenv("CRAWL_HOST_RATE", "0.5"))
+DEFAULT_HOST_BURST = int(os.getenv("CRAWL_HOST_BURST", "1"))
+
+
+def parse_host_rates(spec: Optional[str]) -> Dict[str, float]:
+    """Parse "host=rate,host=rate" into a dict (bad entries are ignored)."""
+    rates = {}
+    for part in (spec or "").split(","):
+        host, _, rate = part.strip().partition("=")
+        if not host or not rate:
+            continue
+        try:
+            rates[host.lower()] = float(rate)
+        except ValueError:
+            print(f"Scheduler: ignoring bad host rate {part!r}")
+    return rates
+
+
+def host_of(url: str) -> str:
+    return (urlparse(url).hostname or "unknown").lower()
+
+
+# ---------------- TOKEN BUCKET ----------------
+
+class HostBucket:
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = max(rate, 1e-6)
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready_at(self, now: float) -> float:
+        """Monotonic time at which one token is available."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return now
+        return now + (1 - self.tokens) / self.rate
+
+    def reserve(self, now: float) -> float:
+        """Take a token (possibly borrowing ahead); returns the time it may be used."""
+        start = self.ready_at(now)
+        self.tokens -= 1
+        return start
+
+
+# ---------------- SCHEDULER ----------------
+
+class PolitenessScheduler:
+    """
+    add(url, item) queues work; next() blocks until some host is eligible and
+    returns (url, item) for it. reserve(host) is the non-queueing variant for
+    callers that do their own waiting (the async engine).
+
+    `legacy_delay` is what the old code slept per URL; it is only used to
+    report how much idle time the scheduler eliminated.
+    """
+
+    def __init__(
+        self,
+        default_rate: float = DEFAULT_HOST_RATE,
+        burst: int = DEFAULT_HOST_BURST,
+        host_rates: Optional[Dict[str, float]] = None,
+        legacy_delay: float = 0.0,
+    ):
+        self.default_rate = default_rate
+        self.burst = burst
+        self.host_rates = parse_host_rates(os.getenv("CRAWL_HOST_RATES"))
+        self.host_rates.update({h.lower(): r for h, r in (host_rates or {}).items()})
+        self.legacy_delay = legacy_delay
+
+        self._buckets: Dict[str, HostBucket] = {}
+        self._queues: Dict[str, deque] = {}
+        self._heap = []
+        self._seq = 0
+
+        self.dispatched = 0
+        self.idle_seconds = 0.0
+
+    def bucket(self, host: str) -> HostBucket:
+        b = self._buckets.get(host)
+        if b is None:
+            b = HostBucket(self.host_rates.get(host, self.default_rate), self.burst)
+            self._buckets[host] = b
+        return b
+
+    def _push_host(self, host: str):
+        self._seq += 1
+        ready = self.bucket(host).ready_at(time.monotonic())
+        heapq.heappush(self._heap, (ready, self._seq, host))
+
+    def add(self, url: str, item: Any = None):
+        host = host_of(url)
+        q = self._queues.get(host)
+        if q is None:
+            q = self._queues[host] = deque()
+        if not q:
+            self._push_host(host)
+        q.append((url, item))
+
+    def __len__(self):
+        return sum(len(q) for q in self._queues.values())
+
+    def next(self) -> Tuple[str, Any]:
+        """Pop the next URL whose host is eligible, sleeping only if none is."""
+        if not self._heap:
+            raise IndexError("scheduler is empty")
+
+        ready, _, host = heapq.heappop(self._heap)
+        now = time.monotonic()
+        if ready > now:
+            self.idle_seconds += ready - now
+            time.sleep(ready - now)
+
+        self.bucket(host).reserve(time.monotonic())
+        url, item = self._queues[host].popleft()
+        if self._queues[host]:
+            self._push_host(host)
+
+        self.dispatched += 1
+        return url, item
+
+    def reserve(self, host: str) -> float:
+        """Reserve a slot for `host`; returns seconds the caller must wait."""
+        now = time.monotonic()
+        wait = max(0.0, self.bucket(host.lower()).reserve(now) - now)
+        self.dispatched += 1
+        self.idle_seconds += wait
+        return wait
+
+    def summary(self, extra_legacy_seconds: float = 0.0) -> dict:
+        legacy = self.legacy_delay * self.dispatched + extra_legacy_seconds
+        return {
+            "dispatched": self.dispatched,
+            "hosts": len(self._buckets),
+            "idle_seconds": self.idle_seconds,
+            "legacy_idle_seconds": legacy,
+            "idle_eliminated": max(0.0, legacy - self.idle_seconds),
+        }
+
+    def log_summary(self, extra_legacy_seconds: float = 0.0):
+        s = self.summary(extra_legacy_seconds)
+        print(
+            f" Scheduler: dispatched={s['dispatched']} hosts={s['hosts']} "
+            f"idle={s['idle_seconds']:.1f}s (blanket sleeps would be "
+            f"{s['legacy_idle_seconds']:.1f}s, eliminated {s['idle_eliminated']:.1f}s)"
+        )
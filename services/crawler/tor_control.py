@@ -1,32 +1,43 @@
 # services/crawler/tor_control.py
 """
-Small helper to request NEWNYM (new Tor circuit) using stem.
-Tries cookie-based auth first (recommended), then falls back to password auth.
+Tor control-port helpers (stem).
+- renew_tor_circuit(): one-off NEWNYM. Tries cookie-based auth first (recommended), then password auth.
+- CircuitRotator: background service holding one authenticated control connection that
+  rotates circuits on a policy (every N requests, on error bursts, on a timer), honours
+  Tor's NEWNYM rate limit and never blocks fetch workers. get_rotator() keeps one per
+  Tor instance (control port); fetches report to the rotator of the proxy slot they used.
+
+Env (rotator):
+  TOR_CONTROL_PORT, TOR_CONTROL_PASSWORD, TOR_CONTROL_COOKIE
+  TOR_ROTATE_EVERY          rotate after this many requests (0 = off, default 50)
+  TOR_ROTATE_ERROR_BURST    rotate after this many failures ... (0 = off, default 5)
+  TOR_ROTATE_ERROR_WINDOW   ... within this many seconds (default 60)
+  TOR_ROTATE_INTERVAL       rotate at least every N seconds (0 = off, default 600)
 """
 
-from typing import Optional
+from typing import Dict, Optional
+from collections import deque
 import os
+import time
+import threading
 
-def renew_tor_circuit(control_port: int = 9051, password: Optional[str] = None, cookie_path: Optional[str] = None, timeout: int = 10):
+
+DEFAULT_CONTROL_PORT = int(os.getenv("TOR_CONTROL_PORT", "9051"))
+
+
+def _connect_controller(control_port: int = 9051, password: Optional[str] = None, cookie_path: Optional[str] = None, timeout: int = 10):
     """
-    Request a NEWNYM from Tor control port.
-    - control_port: port where Tor control listens (default 9051)
-    - password: control password (if set). If None, try cookie auth.
-    - cookie_path: path to control_auth_cookie (optional)
-    Raises ImportError if stem is not installed.
-    Raises Exception on failure.
+    Open and authenticate a stem Controller.
+    Raises ImportError if stem is not installed, RuntimeError on connection/auth failure.
     """
     try:
-        from stem import Signal
         from stem.control import Controller
     except Exception as e:
         raise ImportError("stem not installed; run `pip install stem` to enable circuit rotation") from e
 
-    controller = None
-
     # Try cookie auth if password not provided
     try:
-        controller = Controller.from_port(port=control_port, timeout=timeout)
+        controller = Controller.from_port(port=control_port)
     except Exception as e:
         raise RuntimeError(f"Could not connect to Tor control port at localhost:{control_port}: {e}")
 
@@ -50,7 +61,29 @@ def renew_tor_circuit(control_port: int = 9051, password: Optional[str] = None,
             except Exception as e:
                 # If cookie auth fails and password provided later, attempt password path
                 raise RuntimeError("Cookie authentication to Tor control port failed") from e
+    except Exception:
+        try:
+            controller.close()
+        except Exception:
+            pass
+        raise
+
+    return controller
+
 
+def renew_tor_circuit(control_port: int = 9051, password: Optional[str] = None, cookie_path: Optional[str] = None, timeout: int = 10):
+    """
+    Request a NEWNYM from Tor control port.
+    - control_port: port where Tor control listens (default 9051)
+    - password: control password (if set). If None, try cookie auth.
+    - cookie_path: path to control_auth_cookie (optional)
+    Raises ImportError if stem is not installed.
+    Raises Exception on failure.
+    """
+    controller = _connect_controller(control_port, password, cookie_path, timeout)
+    from stem import Signal
+
+    try:
         controller.signal(Signal.NEWNYM)
         # Optionally wait until newnym takes effect
     finally:
@@ -58,3 +91,156 @@ def renew_tor_circuit(control_port: int = 9051, password: Optional[str] = None,
             controller.close()
         except Exception:
             pass
+
+
+# ---------------- ROTATION SERVICE ----------------
+
+class CircuitRotator:
+    """
+    Fetch workers call note_request(ok) after every request; it only updates
+    counters and sets an event. A daemon thread owns the control connection,
+    waits out Tor's NEWNYM rate limit and sends the signal.
+    """
+
+    def __init__(
+        self,
+        control_port: int = DEFAULT_CONTROL_PORT,
+        password: Optional[str] = os.getenv("TOR_CONTROL_PASSWORD"),
+        cookie_path: Optional[str] = os.getenv("TOR_CONTROL_COOKIE"),
+        every_n_requests: int = int(os.getenv("TOR_ROTATE_EVERY", "50")),
+        error_burst: int = int(os.getenv("TOR_ROTATE_ERROR_BURST", "5")),
+        error_window: float = float(os.getenv("TOR_ROTATE_ERROR_WINDOW", "60")),
+        interval: float = float(os.getenv("TOR_ROTATE_INTERVAL", "600")),
+    ):
+        self.control_port = control_port
+        self.password = password
+        self.cookie_path = cookie_path
+        self.every_n_requests = every_n_requests
+        self.error_burst = error_burst
+        self.error_window = error_window
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        self._wanted = threading.Event()
+        self._stop = threading.Event()
+        self._reason = None
+        self._requests_since = 0
+        self._errors = deque()
+        self._last_rotation = time.monotonic()
+        self._controller = None
+        self._thread = None
+
+        self.rotations = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    # ---- called from fetch workers (never blocks on Tor) ----
+
+    def note_request(self, ok: bool = True):
+        with self._lock:
+            self._requests_since += 1
+            now = time.monotonic()
+            if not ok:
+                self._errors.append(now)
+            while self._errors and now - self._errors[0] > self.error_window:
+                self._errors.popleft()
+
+            if self.every_n_requests and self._requests_since >= self.every_n_requests:
+                self._want(f"{self._requests_since} requests")
+            elif self.error_burst and len(self._errors) >= self.error_burst:
+                self._want(f"{len(self._errors)} errors in {self.error_window:.0f}s")
+
+    def request_rotation(self, reason: str = "manual"):
+        with self._lock:
+            self._want(reason)
+
+    def _want(self, reason: str):
+        if self._wanted.is_set():
+            self.coalesced += 1
+            return
+        self._reason = reason
+        self._wanted.set()
+
+    # ---- background thread ----
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"tor-rotator-{self.control_port}", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wanted.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._close_controller()
+
+    def _run(self):
+        while not self._stop.is_set():
+            timeout = None
+            if self.interval:
+                timeout = max(0.0, self._last_rotation + self.interval - time.monotonic())
+            if not self._wanted.wait(timeout):
+                self.request_rotation(f"timer ({self.interval:.0f}s)")
+            if self._stop.is_set():
+                break
+            try:
+                self._rotate()
+            except ImportError as e:
+                print(f"  Tor circuit rotation disabled (control port {self.control_port}):", e)
+                return
+            except Exception as e:
+                self.failures += 1
+                print(f"  Tor circuit rotation failed (control port {self.control_port}):", e)
+                self._close_controller()
+                # back off before reconnecting; keep the request pending
+                self._stop.wait(min(60, 5 * self.failures))
+
+    def _rotate(self):
+        if self._controller is None:
+            self._controller = _connect_controller(self.control_port, self.password, self.cookie_path)
+        from stem import Signal
+
+        # Tor ignores NEWNYM sent within ~10s of the previous one
+        if not self._controller.is_newnym_available():
+            self._stop.wait(self._controller.get_newnym_wait())
+
+        self._controller.signal(Signal.NEWNYM)
+        with self._lock:
+            reason = self._reason
+            self._wanted.clear()
+            self._requests_since = 0
+            self._errors.clear()
+            self._last_rotation = time.monotonic()
+            self.rotations += 1
+        self.failures = 0
+        print(f" Tor circuit rotated (NEWNYM, control port {self.control_port}) — {reason}")
+
+    def _close_controller(self):
+        if self._controller is not None:
+            try:
+                self._controller.close()
+            except Exception:
+                pass
+            self._controller = None
+
+    def stats(self) -> dict:
+        return {
+            "rotations": self.rotations,
+            "coalesced_requests": self.coalesced,
+            "failures": self.failures,
+        }
+
+
+_rotators: Dict[int, CircuitRotator] = {}
+_rotator_lock = threading.Lock()
+
+
+def get_rotator(control_port: int = DEFAULT_CONTROL_PORT) -> CircuitRotator:
+    """Rotation service of the Tor instance at control_port (one per port), started on first use."""
+    with _rotator_lock:
+        rotator = _rotators.get(control_port)
+        if rotator is None:
+            rotator = _rotators[control_port] = CircuitRotator(control_port=control_port).start()
+        return rotator
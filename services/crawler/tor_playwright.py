@@ -1,18 +1,42 @@
 # services/crawler/tor_playwright.py
-from playwright.sync_api import sync_playwright
+import os
 import time
+from typing import Optional
+
+from playwright.sync_api import sync_playwright
+
+from services.crawler.body_reader import cap_rendered
+from services.crawler.tor_session import DEFAULT_SOCKS
+
+# Chromium only understands socks5:// (it always resolves names through the proxy)
+TOR_SOCKS = DEFAULT_SOCKS.replace("socks5h://", "socks5://", 1)
+
+# set PLAYWRIGHT_POOL=0 to go back to one browser launch per fallback URL
+USE_POOL = os.getenv("PLAYWRIGHT_POOL", "1").lower() in ("1", "true", "yes")
 
-TOR_SOCKS = "socks5://127.0.0.1:9050"
 
 def fetch_via_tor_playwright(url: str, timeout: int = 45000) -> str:
     """
-    Fetch fully rendered HTML using Playwright over Tor
+    Fetch fully rendered HTML using Playwright over Tor.
+    Uses the shared BrowserPool unless PLAYWRIGHT_POOL is disabled.
+    """
+    if USE_POOL:
+        from services.crawler.browser_pool import get_browser_pool
+
+        return get_browser_pool(proxy=TOR_SOCKS).fetch(url, timeout=timeout)
+
+    return fetch_via_tor_playwright_once(url, timeout=timeout)
+
+
+def fetch_via_tor_playwright_once(url: str, timeout: int = 45000, proxy: Optional[str] = TOR_SOCKS) -> str:
+    """
+    Original one-shot path: launches a fresh Chromium for this URL only.
     """
     with sync_playwright() as p:
-        browser = p.chromium.launch(
-            headless=True,
-            proxy={"server": TOR_SOCKS}
-        )
+        launch_kwargs = {"headless": True}
+        if proxy:
+            launch_kwargs["proxy"] = {"server": proxy}
+        browser = p.chromium.launch(**launch_kwargs)
 
         context = browser.new_context(
             user_agent=(
@@ -29,4 +53,4 @@ def fetch_via_tor_playwright(url: str, timeout: int = 45000) -> str:
         html = page.content()
 
         browser.close()
-        return html
+        return cap_rendered(html, url)
@@ -3,53 +3,167 @@
 """
 Tor-enabled requests session helper.
 
-- Uses socks5h://127.0.0.1:9050 by default (the dperson/torproxy container above).
+- Uses $TOR_SOCKS, default socks5h://127.0.0.1:19050 (docker-compose.tor.yml maps the container's 9050 there).
 - Adds retries + sensible headers and a small convenience function to renew circuits using stem (optional).
+- get_tor_session() hands out process-wide pooled sessions keyed by (SOCKS endpoint,
+  isolation token) so keep-alive connections and SOCKS handshakes are reused across fetches.
 """
 
-from typing import Optional
+import os
+import threading
+from typing import Optional, Dict, Tuple
+from urllib.parse import urlsplit, urlunsplit, quote
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
-DEFAULT_SOCKS = "socks5h://127.0.0.1:19050"
+DEFAULT_SOCKS = os.getenv("TOR_SOCKS", "socks5h://127.0.0.1:19050")
 
-def make_tor_session(socks_proxy: str = DEFAULT_SOCKS, timeout: int = 30) -> requests.Session:
+# number of per-host connection pools kept, and connections kept per host pool
+POOL_CONNECTIONS = int(os.getenv("TOR_POOL_CONNECTIONS", "32"))
+POOL_MAXSIZE = int(os.getenv("TOR_POOL_MAXSIZE", "8"))
+
+DEFAULT_HEADERS = {
+    "User-Agent": "org-dwthreat-bot/0.1 (+https://your-org.example)",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+}
+
+
+class SessionStats:
+    """Requests sent vs. new (SOCKS-handshaking) connections opened by a session."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def count_connection(self):
+        with self._lock:
+            self.new_connections += 1
+
+    def as_dict(self) -> dict:
+        reused = max(0, self.requests - self.new_connections)
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_connections": reused,
+            "reuse_ratio": reused / self.requests if self.requests else 0.0,
+        }
+
+
+def _counting_pool_class(pool_cls, stats: SessionStats):
+    class CountingPool(pool_cls):
+        def _new_conn(self):
+            stats.count_connection()
+            return super()._new_conn()
+
+    CountingPool.__name__ = f"Counting{pool_cls.__name__}"
+    return CountingPool
+
+
+class CountingAdapter(HTTPAdapter):
+    """HTTPAdapter that records requests and newly opened proxy connections."""
+
+    def __init__(self, stats: SessionStats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        if not getattr(manager, "_dw_counting", False):
+            manager.pool_classes_by_scheme = {
+                scheme: _counting_pool_class(cls, self.stats)
+                for scheme, cls in manager.pool_classes_by_scheme.items()
+            }
+            manager._dw_counting = True
+        return manager
+
+    def send(self, request, **kwargs):
+        self.stats.count_request()
+        return super().send(request, **kwargs)
+
+
+def with_isolation(socks_proxy: str, isolation: Optional[str]) -> str:
+    """
+    Put an isolation token into the SOCKS username. Tor's SocksPort has
+    IsolateSOCKSAuth on by default, so each token gets its own circuits.
+    """
+    if not isolation:
+        return socks_proxy
+    parts = urlsplit(socks_proxy)
+    host = parts.hostname + (f":{parts.port}" if parts.port else "")
+    netloc = f"{quote(isolation, safe='')}:x@{host}"
+    return urlunsplit((parts.scheme, netloc, parts.path, parts.query, parts.fragment))
+
+
+def make_tor_session(
+    socks_proxy: str = DEFAULT_SOCKS,
+    timeout: int = 30,
+    pool_connections: int = POOL_CONNECTIONS,
+    pool_maxsize: int = POOL_MAXSIZE,
+) -> requests.Session:
     s = requests.Session()
     s.proxies.update({"http": socks_proxy, "https": socks_proxy})
     # retries for transient errors
     retries = Retry(total=3, backoff_factor=1, status_forcelist=(502, 503, 504))
-    s.mount("http://", HTTPAdapter(max_retries=retries))
-    s.mount("https://", HTTPAdapter(max_retries=retries))
-    s.headers.update({
-        "User-Agent": "org-dwthreat-bot/0.1 (+https://your-org.example)",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-    })
+    stats = SessionStats()
+    adapter = CountingAdapter(
+        stats,
+        max_retries=retries,
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+    )
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    s.headers.update(DEFAULT_HEADERS)
     # store default timeout on session for convenience (not used by requests directly)
     s.request_timeout = timeout
+    s.pool_stats = stats
     return s
 
-# Optional: stem helpers (best-effort — only active if 'stem' installed and control port configured)
-def renew_tor_circuit(control_port: int = 9051, password: Optional[str] = None):
+
+# ---------------- SHARED SESSIONS ----------------
+
+_sessions: Dict[Tuple[str, Optional[str]], requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_tor_session(socks_proxy: str = DEFAULT_SOCKS, isolation: Optional[str] = None) -> requests.Session:
     """
-    Try to request a new Tor circuit using stem. This will only work if a Tor control port
-    is available and you configured authentication. It's optional — function will
-    raise ImportError if stem is not installed.
+    Process-wide pooled session for (socks_proxy, isolation). Repeated fetches
+    to the same onion reuse kept-alive connections instead of new SOCKS handshakes.
     """
-    try:
-        from stem import Signal
-        from stem.control import Controller
-    except Exception as e:
-        raise ImportError("stem not available; install 'stem' to use renew_tor_circuit") from e
-
-    # default assumes control port is reachable at localhost:9051
-    with Controller.from_port(port=control_port) as controller:
-        if password:
-            controller.authenticate(password=password)
-        else:
-            try:
-                controller.authenticate()
-            except Exception:
-                # if control port requires auth and password not set, this will fail
-                pass
-        controller.signal(Signal.NEWNYM)
+    key = (socks_proxy, isolation)
+    with _sessions_lock:
+        s = _sessions.get(key)
+        if s is None:
+            s = _sessions[key] = make_tor_session(with_isolation(socks_proxy, isolation))
+        return s
+
+
+def session_stats() -> Dict[str, dict]:
+    """Connection reuse stats per shared session, keyed "endpoint[#isolation]"."""
+    with _sessions_lock:
+        items = list(_sessions.items())
+    out = {}
+    for (proxy, isolation), s in items:
+        name = proxy + (f"#{isolation}" if isolation else "")
+        out[name] = s.pool_stats.as_dict()
+    return out
+
+
+def log_session_stats():
+    for name, st in session_stats().items():
+        print(
+            f" Tor session {name}: requests={st['requests']} "
+            f"new_connections={st['new_connections']} reused={st['reused_connections']} "
+            f"({st['reuse_ratio']:.0%})"
+        )
+
+
+# Circuit renewal lives in tor_control; re-exported here for older callers
+from services.crawler.tor_control import renew_tor_circuit  # noqa: E402,F401
@@ -0,0 +1,101 @@
+"""
+Inference backends for the DarkBERT classifier.
+
+Selected with DARKBERT_BACKEND:
+  torch       fp32 PyTorch model (default, same as before)
+  torch-int8  PyTorch model with dynamically int8-quantized Linear layers (CPU)
+  onnx        ONNX Runtime session over the export written by tools/08_export_onnx.py
+
+Every backend exposes `tokenizer` and `classify(features)`, where features are
+tokenizer outputs (lists of ids, unpadded); it returns [(label, confidence)].
+"""
+import os
+from typing import List, Tuple
+
+ONNX_MODEL_PATH = os.getenv("DARKBERT_ONNX_PATH", "models/darkbert-onnx/model.onnx")
+
+BACKENDS = ("torch", "torch-int8", "onnx")
+
+
+class TorchBackend:
+    name = "torch"
+
+    def __init__(self, model_path: str):
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+        self.torch = torch
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_path)
+        self.model.to(self.device)
+        self.model.eval()
+
+    def classify(self, features) -> List[Tuple[int, float]]:
+        torch = self.torch
+        batch = self.tokenizer.pad(features, padding=True, return_tensors="pt")
+        batch = {k: v.to(self.device) for k, v in batch.items()}
+
+        with torch.no_grad():
+            probs = torch.softmax(self.model(**batch).logits, dim=1)
+        conf, label = torch.max(probs, dim=1)
+        return [(int(l), float(c)) for l, c in zip(label.tolist(), conf.tolist())]
+
+
+class QuantizedTorchBackend(TorchBackend):
+    name = "torch-int8"
+
+    def __init__(self, model_path: str):
+        super().__init__(model_path)
+        torch = self.torch
+        # dynamic quantization is CPU-only
+        self.device = torch.device("cpu")
+        self.model = torch.ao.quantization.quantize_dynamic(
+            self.model.to(self.device),
+            {torch.nn.Linear},
+            dtype=torch.qint8,
+        )
+        self.model.eval()
+
+
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(self, model_path: str, onnx_path: str = ONNX_MODEL_PATH):
+        import numpy as np
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        if not os.path.exists(onnx_path):
+            raise FileNotFoundError(
+                f"{onnx_path} not found; run `python -m tools.08_export_onnx` first"
+            )
+
+        self.np = np
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(onnx_path, opts, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def classify(self, features) -> List[Tuple[int, float]]:
+        np = self.np
+        batch = self.tokenizer.pad(features, padding=True, return_tensors="np")
+        feed = {k: v.astype(np.int64) for k, v in batch.items() if k in self.input_names}
+
+        logits = self.session.run(None, feed)[0]
+        logits = logits - logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+        labels = probs.argmax(axis=1)
+        return [(int(l), float(probs[i, l])) for i, l in enumerate(labels)]
+
+
+def load_backend(name: str, model_path: str):
+    if name == "torch":
+        return TorchBackend(model_path)
+    if name == "torch-int8":
+        return QuantizedTorchBackend(model_path)
+    if name == "onnx":
+        return OnnxBackend(model_path)
+    raise ValueError(f"unknown DARKBERT_BACKEND {name!r}; expected one of {BACKENDS}")
@@ -0,0 +1,45 @@
+import os
+import threading
+from typing import List, Tuple
+
+# TF-IDF + LogisticRegression baseline from tools/02_train_baseline.py.
+# Used as the cheap first stage of the hybrid detector's cascade.
+
+BASELINE_MODEL_PATH = os.getenv("BASELINE_MODEL_PATH", "models/baseline_lr.pkl")
+TFIDF_PATH = os.getenv("BASELINE_TFIDF_PATH", "models/tfidf.pkl")
+
+# DarkBERT label ids (LabelEncoder order from tools/03_prepare_bert_data.py)
+LABELS = ["benign", "credential_leak", "forum", "marketplace", "scam"]
+
+_loaded = None
+_load_lock = threading.Lock()
+
+
+def get_baseline():
+    """(vectorizer, model, class_index -> DarkBERT label id), loaded on first use."""
+    global _loaded
+    if _loaded is None:
+        with _load_lock:
+            if _loaded is None:
+                import joblib
+
+                model = joblib.load(BASELINE_MODEL_PATH)
+                tfidf = joblib.load(TFIDF_PATH)
+                label_ids = [LABELS.index(str(c)) for c in model.classes_]
+                _loaded = (tfidf, model, label_ids)
+    return _loaded
+
+
+def predict_baseline_batch(texts: List[str]) -> List[Tuple[int, float]]:
+    """(label_id, probability) per text, label ids compatible with DarkBERT's."""
+    if not texts:
+        return []
+
+    tfidf, model, label_ids = get_baseline()
+    probs = model.predict_proba(tfidf.transform(texts))
+    best = probs.argmax(axis=1)
+    return [(label_ids[b], float(probs[i, b])) for i, b in enumerate(best)]
+
+
+def predict_baseline(text: str) -> Tuple[int, float]:
+    return predict_baseline_batch([text or ""])[0]
@@ -1,14 +1,73 @@
-import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+import os
+import threading
+from typing import List, Tuple, Optional
 
-MODEL_PATH = "models/darkbert-final"
+from services.ml.backends import load_backend
 
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+# torch / transformers / onnxruntime are imported on first use: importing this module
+# must stay cheap for the crawler CLI, the API and anything else that only needs the names
 
-tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
-model = AutoModelForSequenceClassification.from_pretrained(MODEL_PATH)
-model.to(device)
-model.eval()
+MODEL_PATH = os.getenv("DARKBERT_MODEL_PATH", "models/darkbert-final")
+
+# torch | torch-int8 | onnx (see services/ml/backends.py)
+BACKEND = os.getenv("DARKBERT_BACKEND", "torch")
+
+# chunks per forward pass in predict_batch
+BATCH_SIZE = int(os.getenv("DARKBERT_BATCH_SIZE", "16"))
+
+MIN_CHARS = 30
+MAX_CHARS = 1500
+MAX_LENGTH = 512
+
+# tokens shared by consecutive windows of a page in predict_windows
+# (0 = non-overlapping windows)
+WINDOW_STRIDE = int(os.getenv("DARKBERT_WINDOW_STRIDE", "0"))
+
+# windows produced / actually run through the model by predict_windows
+window_stats = {"windows": 0, "scored": 0}
+
+_loaded = None
+_load_lock = threading.Lock()
+
+
+# ---------------------------------------------------
+# Lazy model loading
+# ---------------------------------------------------
+def get_backend():
+    """
+    Returns the configured inference backend, loading it on the first call.
+    Thread-safe: concurrent first callers wait for a single load.
+    """
+    global _loaded
+    if _loaded is None:
+        with _load_lock:
+            if _loaded is None:
+                _loaded = load_backend(BACKEND, MODEL_PATH)
+                print(f"DarkBERT backend loaded: {_loaded.name}")
+    return _loaded
+
+
+def is_loaded() -> bool:
+    return _loaded is not None
+
+
+def warm_up():
+    """Load the model and run one dummy forward pass (call at worker start)."""
+    predict_text("warm up " * 8)
+
+
+def warm_up_in_background() -> threading.Thread:
+    """warm_up() on a daemon thread, so loading overlaps with the first fetches."""
+
+    def _run():
+        try:
+            warm_up()
+        except Exception as e:
+            print("DarkBERT warm-up failed:", e)
+
+    t = threading.Thread(target=_run, name="darkbert-warmup", daemon=True)
+    t.start()
+    return t
 
 
 # ---------------------------------------------------
@@ -16,26 +75,152 @@ model.eval()
 # ---------------------------------------------------
 def predict_text(text):
 
-    if not text or len(text) < 30:
+    if not text or len(text) < MIN_CHARS:
         return None, 0.0
 
-    # limit size for speed
-    text = text[:1500]
+    # truncation to MAX_CHARS / MAX_LENGTH happens in predict_batch
+    return predict_batch([text])[0]
+
+
+# ---------------------------------------------------
+# Batched prediction
+# ---------------------------------------------------
+def predict_batch(texts: List[str], batch_size: Optional[int] = None) -> List[Tuple[Optional[int], float]]:
+    """
+    Same contract as predict_text, for many texts at once: each text is cut
+    to MAX_CHARS / MAX_LENGTH tokens and tokenized in one call, then scored
+    with classify_features. Returns one (label, confidence) per input, in
+    input order.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    results: List[Tuple[Optional[int], float]] = [(None, 0.0)] * len(texts)
 
-    enc = tokenizer(
-        text,
+    idx = [i for i, t in enumerate(texts) if t and len(t) >= MIN_CHARS]
+    if not idx:
+        return results
+
+    backend = get_backend()
+
+    enc = backend.tokenizer(
+        [texts[i][:MAX_CHARS] for i in idx],
         truncation=True,
-        padding=True,
-        max_length=512,
-        return_tensors="pt"
+        max_length=MAX_LENGTH,
     )
+    features = [
+        {k: enc[k][j] for k in enc.keys()}
+        for j in range(len(idx))
+    ]
+
+    for j, pred in enumerate(classify_features(features, batch_size)):
+        results[idx[j]] = pred
+
+    return results
+
+
+def classify_features(features, batch_size: Optional[int] = None) -> List[Tuple[int, float]]:
+    """
+    (label, confidence) per tokenized item, in input order. Items are sorted
+    by token length and run in mini-batches padded only to the longest item
+    of each batch (dynamic padding).
+    """
+    batch_size = batch_size or BATCH_SIZE
+    backend = get_backend()
+    results: List[Tuple[int, float]] = [None] * len(features)
+
+    # similar lengths together → little padding per batch
+    order = sorted(range(len(features)), key=lambda j: len(features[j]["input_ids"]))
+
+    for start in range(0, len(order), batch_size):
+        part = order[start:start + batch_size]
+        preds = backend.classify([features[j] for j in part])
+        for j, pred in zip(part, preds):
+            results[j] = pred
+
+    return results
+
+
+# ---------------------------------------------------
+# Token windows
+# ---------------------------------------------------
+def encode_windows(texts: List[str], stride: Optional[int] = None) -> List[list]:
+    """
+    Tokenizes whole pages (no MAX_CHARS cut) into windows of exactly
+    MAX_LENGTH tokens, special tokens included; only the last window of a
+    page is shorter. Consecutive windows share `stride` tokens.
+    Returns, per text, its list of window features (empty below MIN_CHARS).
+    """
+    stride = WINDOW_STRIDE if stride is None else stride
+    windows: List[list] = [[] for _ in texts]
+
+    idx = [i for i, t in enumerate(texts) if t and len(t) >= MIN_CHARS]
+    if not idx:
+        return windows
+
+    enc = get_backend().tokenizer(
+        [texts[i] for i in idx],
+        truncation=True,
+        max_length=MAX_LENGTH,
+        stride=stride,
+        return_overflowing_tokens=True,
+    )
+    keys = [k for k in enc.keys() if k != "overflow_to_sample_mapping"]
+    for j, owner in enumerate(enc["overflow_to_sample_mapping"]):
+        windows[idx[owner]].append({k: enc[k][j] for k in keys})
+
+    return windows
+
+
+def predict_windows(
+    texts: List[str],
+    stride: Optional[int] = None,
+    exit_conf: Optional[float] = None,
+    benign_label: int = 0,
+    batch_size: Optional[int] = None,
+) -> List[List[Tuple[int, float]]]:
+    """
+    Per text, the (label, confidence) of its token windows in page order.
+
+    With exit_conf set, windows are scored in waves (the next windows of
+    every page still open, sharing mini-batches) and a page stops at its
+    first window whose label is not benign_label with confidence >=
+    exit_conf: its list ends with that window, later windows are never
+    scored. Pages below MIN_CHARS get an empty list.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    windows = encode_windows(texts, stride)
+    window_stats["windows"] += sum(len(page) for page in windows)
 
-    enc = {k: v.to(device) for k, v in enc.items()}
+    if exit_conf is None:
+        flat = [(i, f) for i, page in enumerate(windows) for f in page]
+        window_stats["scored"] += len(flat)
+        results: List[List[Tuple[int, float]]] = [[] for _ in texts]
+        for (i, _), pred in zip(flat, classify_features([f for _, f in flat], batch_size)):
+            results[i].append(pred)
+        return results
 
-    with torch.no_grad():
-        logits = model(**enc).logits
+    results = [[] for _ in texts]
+    open_pages = [i for i, page in enumerate(windows) if page]
+    # 1, 2, 4, ... windows per page and wave: short pages finish in the first
+    # wave, long ones cost at most about twice the windows they needed
+    step = 1
+    while open_pages:
+        wave = [
+            (i, f)
+            for i in open_pages
+            for f in windows[i][len(results[i]):len(results[i]) + step]
+        ]
+        step *= 2
+        preds = classify_features([f for _, f in wave], batch_size)
+        window_stats["scored"] += len(wave)
 
-    probs = torch.softmax(logits, dim=1)
-    conf, label = torch.max(probs, dim=1)
+        done = set()
+        for (i, _), pred in zip(wave, preds):
+            if i in done:
+                continue
+            results[i].append(pred)
+            label, conf = pred
+            if label != benign_label and conf >= exit_conf:
+                done.add(i)
+        open_pages = [i for i in open_pages if i not in done and len(results[i]) < len(windows[i])]
 
-    return int(label.item()), float(conf.item())
+    return results
@@ -0,0 +1,248 @@
+# services/pipeline/analyzer_worker.py
+"""
+Analyzer side of the fetch → analyze pipeline.
+
+Crawler workers call enqueue_page() with the fetched HTML instead of running
+save_page_to_db (clean + insert + hybrid detection) inline; a pool of
+analyzer threads consumes the queue, acks on success and nacks on failure
+(retry, then dead-letter after PIPELINE_MAX_ATTEMPTS).
+
+Env:
+  PIPELINE_MODE     inline | queue (default inline = old behaviour)
+  PIPELINE_WORKERS  analyzer threads per process (default 2)
+
+usage (Redis queue, separate process):
+  PIPELINE_QUEUE=redis python -m services.pipeline.analyzer_worker [--workers=N]
+"""
+
+import os
+import sys
+import time
+import threading
+from typing import Optional
+
+from services.crawler.crawler_db import save_page_to_db
+from services.crawler.batch_writer import BATCH_WRITES, get_batch_writer, close_batch_writer
+from services.crawler.fetch_cache import record_fetch
+from services.pipeline.work_queue import get_work_queue, InMemoryQueue
+
+
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "inline").lower()
+DEFAULT_WORKERS = int(os.getenv("PIPELINE_WORKERS", "2"))
+STATS_INTERVAL = 30.0
+
+
+# ---------------- STAGE METERS ----------------
+
+class StageMeter:
+    """Items/sec and busy time of one pipeline stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.ok = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, ok: bool, seconds: float):
+        with self._lock:
+            if ok:
+                self.ok += 1
+            else:
+                self.failed += 1
+            self.busy += seconds
+
+    def summary(self) -> dict:
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            done = self.ok + self.failed
+            return {
+                "stage": self.name,
+                "ok": self.ok,
+                "failed": self.failed,
+                "per_sec": self.ok / elapsed if elapsed else 0.0,
+                "avg_seconds": self.busy / done if done else 0.0,
+            }
+
+
+fetch_meter = StageMeter("fetch")
+analyze_meter = StageMeter("analyze")
+
+
+def queue_stats(queue=None) -> dict:
+    queue = queue or get_work_queue()
+    return {
+        "depth": queue.depth(),
+        "inflight": queue.inflight(),
+        "dead": queue.dead_letters(),
+    }
+
+
+def log_pipeline_stats(queue=None):
+    q = queue_stats(queue)
+    print(f" Pipeline queue: depth={q['depth']} inflight={q['inflight']} dead={q['dead']}")
+    for meter in (fetch_meter, analyze_meter):
+        s = meter.summary()
+        if s["ok"] or s["failed"]:
+            print(
+                f" Pipeline stage {s['stage']}: ok={s['ok']} failed={s['failed']} "
+                f"rate={s['per_sec']:.3f}/s avg={s['avg_seconds']:.2f}s"
+            )
+
+
+# ---------------- PRODUCER ----------------
+
+def enqueue_page(
+    org_name: str,
+    url: str,
+    html: str,
+    status_code: Optional[int] = None,
+    query_text: Optional[str] = None,
+    queue=None,
+    fetch_record: Optional[dict] = None,
+):
+    """
+    Hand a fetched page to the analyzer workers. fetch_record (fetch_cache)
+    is stored once the page is saved.
+    """
+    (queue or get_work_queue()).put({
+        "org_name": org_name,
+        "url": url,
+        "query_text": query_text,
+        "fetched_html": html,
+        "status_code": status_code,
+        "fetch_record": fetch_record,
+    })
+
+
+# ---------------- CONSUMER ----------------
+
+class AnalyzerPool:
+    def __init__(self, queue=None, workers: int = DEFAULT_WORKERS):
+        self.queue = queue or get_work_queue()
+        self.n_workers = max(1, workers)
+        self.writer = get_batch_writer() if BATCH_WRITES else None
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.n_workers):
+            t = threading.Thread(target=self._run, name=f"analyzer-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        print(f" Analyzer pool started ({self.n_workers} workers)")
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            delivery = self.queue.get(timeout=1.0)
+            if delivery is None:
+                continue
+
+            started = time.monotonic()
+            done = self._completion(delivery, started)
+            try:
+                if self.writer:
+                    job = delivery.job
+                    # acked / nacked by the writer once the batch commits or fails
+                    self.writer.add_page(
+                        job["org_name"], job["url"], job["fetched_html"],
+                        status_code=job.get("status_code"),
+                        query_text=job.get("query_text"),
+                        callback=done,
+                    )
+                    continue
+                job = dict(delivery.job)
+                job.pop("fetch_record", None)
+                save_page_to_db(**job)
+            except Exception as e:
+                # with the writer, failures already reached `done` via the callback
+                if not self.writer:
+                    done(False, e)
+                continue
+            done(True, None)
+
+    def _completion(self, delivery, started):
+        url = delivery.job.get("url")
+
+        def done(ok, error):
+            if ok:
+                record = delivery.job.get("fetch_record")
+                if record:
+                    try:
+                        record_fetch(delivery.job["org_name"], url, record)
+                    except Exception as e:
+                        print(" Fetch cache update failed:", e)
+                self.queue.ack(delivery)
+            else:
+                print(f" Analyzer failed for {url} (attempt {delivery.attempts + 1}): {error}")
+                self.queue.nack(delivery, str(error))
+            analyze_meter.record(ok, time.monotonic() - started)
+
+        return done
+
+    def drain(self, poll: float = 0.5):
+        """Block until the queue is empty and nothing is in flight, then stop."""
+        while self.queue.depth() or self.queue.inflight():
+            if self.writer and not self.queue.depth():
+                # the rest is buffered in the writer, waiting to be acked
+                try:
+                    self.writer.flush()
+                except Exception as e:
+                    # the batch's deliveries were nacked: retried or dead-lettered
+                    print(" Analyzer drain flush failed:", e)
+            time.sleep(poll)
+        self.stop()
+
+    def stop(self):
+        self._stop.set()
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+
+def start_local_analyzers() -> Optional[AnalyzerPool]:
+    """
+    In queue mode with the in-process queue nothing else can consume it, so
+    the crawler starts its own analyzer threads. With Redis, analyzers run
+    as separate processes (see usage above).
+    """
+    if PIPELINE_MODE != "queue":
+        return None
+    queue = get_work_queue()
+    if not isinstance(queue, InMemoryQueue):
+        return None
+    return AnalyzerPool(queue).start()
+
+
+# ---------------- MAIN ----------------
+
+def main():
+    workers = DEFAULT_WORKERS
+    for arg in sys.argv[1:]:
+        if arg.startswith("--workers="):
+            workers = int(arg.split("=", 1)[1])
+        elif arg in ("-h", "--help"):
+            print("Usage: python -m services.pipeline.analyzer_worker [--workers=N]")
+            sys.exit(1)
+
+    queue = get_work_queue()
+    if isinstance(queue, InMemoryQueue):
+        print(" WARNING: PIPELINE_QUEUE is not redis; this worker sees an empty in-process queue")
+
+    pool = AnalyzerPool(queue, workers).start()
+    try:
+        while True:
+            time.sleep(STATS_INTERVAL)
+            log_pipeline_stats(queue)
+    except KeyboardInterrupt:
+        print(" Stopping analyzer workers...")
+        pool.stop()
+        if BATCH_WRITES:
+            close_batch_writer()
+        log_pipeline_stats(queue)
+
+
+if __name__ == "__main__":
+    main()
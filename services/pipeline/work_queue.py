@@ -0,0 +1,192 @@
+# services/pipeline/work_queue.py
+"""
+Work queue between crawler (fetch) workers and analyzer workers.
+
+- put(job) enqueues a JSON-serialisable dict
+- get() leases a job; the consumer must ack() it, or nack() it to retry
+- after MAX_ATTEMPTS failed deliveries a job goes to the dead-letter list
+- RedisQueue: reliable-queue pattern (LMOVE ready → processing) with leases,
+  so jobs held by a crashed worker are re-delivered after LEASE_SECONDS; a
+  job moved by a worker that died before writing its lease gets one from the
+  reclaimer, so it is re-delivered too
+- InMemoryQueue: same semantics inside one process (tests / single-box runs)
+
+Env:
+  PIPELINE_QUEUE   memory | redis (default memory)
+  REDIS_URL        default redis://localhost:6379/0
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+from collections import deque
+from typing import Optional
+
+
+MAX_ATTEMPTS = int(os.getenv("PIPELINE_MAX_ATTEMPTS", "3"))
+LEASE_SECONDS = float(os.getenv("PIPELINE_LEASE_SECONDS", "300"))
+QUEUE_NAME = os.getenv("PIPELINE_QUEUE_NAME", "dwthreat:pages")
+
+
+class Delivery:
+    def __init__(self, job_id: str, job: dict, attempts: int, raw=None):
+        self.id = job_id
+        self.job = job
+        self.attempts = attempts
+        self.raw = raw
+
+
+def _envelope(job: dict, attempts: int = 0, job_id: Optional[str] = None) -> dict:
+    return {"id": job_id or uuid.uuid4().hex, "attempts": attempts, "job": job}
+
+
+# ---------------- IN-MEMORY ----------------
+
+class InMemoryQueue:
+    def __init__(self, max_attempts: int = MAX_ATTEMPTS):
+        self.max_attempts = max_attempts
+        self._ready = deque()
+        self._processing = {}
+        self._dead = []
+        self._cond = threading.Condition()
+
+    def put(self, job: dict):
+        with self._cond:
+            self._ready.append(_envelope(job))
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = 1.0) -> Optional[Delivery]:
+        with self._cond:
+            if not self._ready:
+                self._cond.wait(timeout)
+            if not self._ready:
+                return None
+            env = self._ready.popleft()
+            self._processing[env["id"]] = env
+            return Delivery(env["id"], env["job"], env["attempts"])
+
+    def ack(self, delivery: Delivery):
+        with self._cond:
+            self._processing.pop(delivery.id, None)
+
+    def nack(self, delivery: Delivery, error: str = ""):
+        with self._cond:
+            env = self._processing.pop(delivery.id, None)
+            if env is None:
+                return
+            env["attempts"] += 1
+            env["error"] = error
+            if env["attempts"] >= self.max_attempts:
+                self._dead.append(env)
+            else:
+                self._ready.append(env)
+                self._cond.notify()
+
+    def depth(self) -> int:
+        return len(self._ready)
+
+    def inflight(self) -> int:
+        return len(self._processing)
+
+    def dead_letters(self) -> int:
+        return len(self._dead)
+
+
+# ---------------- REDIS ----------------
+
+class RedisQueue:
+    def __init__(self, url: str, name: str = QUEUE_NAME, max_attempts: int = MAX_ATTEMPTS, lease_seconds: float = LEASE_SECONDS):
+        import redis
+
+        self.r = redis.Redis.from_url(url)
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.ready = f"{name}:ready"
+        self.processing = f"{name}:processing"
+        self.leases = f"{name}:leases"
+        self.dead = f"{name}:dead"
+
+    def put(self, job: dict):
+        self.r.lpush(self.ready, json.dumps(_envelope(job)))
+
+    def get(self, timeout: Optional[float] = 1.0) -> Optional[Delivery]:
+        self.reclaim_expired()
+        raw = self.r.blmove(self.ready, self.processing, timeout or 0, "RIGHT", "LEFT")
+        if raw is None:
+            return None
+        env = json.loads(raw)
+        self.r.hset(self.leases, env["id"], time.time() + self.lease_seconds)
+        return Delivery(env["id"], env["job"], env["attempts"], raw=raw)
+
+    def ack(self, delivery: Delivery):
+        pipe = self.r.pipeline()
+        pipe.lrem(self.processing, 1, delivery.raw)
+        pipe.hdel(self.leases, delivery.id)
+        pipe.execute()
+
+    def nack(self, delivery: Delivery, error: str = ""):
+        # whoever removes the job from processing owns the retry (avoids
+        # double re-queueing when a lease is reclaimed concurrently)
+        if not self.r.lrem(self.processing, 1, delivery.raw):
+            return
+        env = _envelope(delivery.job, delivery.attempts + 1, delivery.id)
+        env["error"] = error
+        target = self.dead if env["attempts"] >= self.max_attempts else self.ready
+
+        pipe = self.r.pipeline()
+        pipe.hdel(self.leases, delivery.id)
+        pipe.lpush(target, json.dumps(env))
+        pipe.execute()
+
+    def reclaim_expired(self):
+        """Move jobs whose lease ran out (worker died) back to ready as a failed attempt."""
+        now = time.time()
+        leases = {k.decode(): float(v) for k, v in self.r.hgetall(self.leases).items()}
+        expired = {job_id for job_id, deadline in leases.items() if deadline < now}
+        # BLMOVE and the lease HSET are two round trips: more jobs in processing
+        # than leases means a worker died in between
+        if not expired and len(leases) >= self.r.llen(self.processing):
+            return
+        in_processing = set()
+        for raw in self.r.lrange(self.processing, 0, -1):
+            env = json.loads(raw)
+            in_processing.add(env["id"])
+            if env["id"] in expired:
+                self.nack(Delivery(env["id"], env["job"], env["attempts"], raw=raw), "lease expired")
+            elif env["id"] not in leases:
+                # start the lease the worker never wrote (HSETNX: a live worker's own lease wins)
+                self.r.hsetnx(self.leases, env["id"], now + self.lease_seconds)
+        # expired leases without a job (acked during the scan, or an HSETNX that raced an ack)
+        stale = expired - in_processing
+        if stale:
+            self.r.hdel(self.leases, *stale)
+
+    def depth(self) -> int:
+        return self.r.llen(self.ready)
+
+    def inflight(self) -> int:
+        return self.r.llen(self.processing)
+
+    def dead_letters(self) -> int:
+        return self.r.llen(self.dead)
+
+
+# ---------------- FACTORY ----------------
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_work_queue():
+    """Process-wide queue selected by PIPELINE_QUEUE."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            kind = os.getenv("PIPELINE_QUEUE", "memory").lower()
+            if kind == "redis":
+                _queue = RedisQueue(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+            else:
+                _queue = InMemoryQueue()
+        return _queue
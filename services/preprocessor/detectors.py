@@ -1,57 +1,227 @@
 # (paste the detectors content from step 1B here)
 # services/preprocessor/detectors.py
+import os
 import re
-from typing import Dict, List
+from typing import Dict, List, NamedTuple, Tuple
+
+from services.preprocessor import ioc_checks
 
 # Simple high-precision regexes for initial detectors
 RE_EMAIL_PASS = re.compile(r"\b([A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}:[^\s:]{6,})\b")
 RE_EMAIL = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
 RE_BTC = re.compile(r"\b([13][a-km-zA-HJ-NP-Z1-9]{25,34})\b")
+RE_BTC_BECH32 = re.compile(r"\b(?:bc1[ac-hj-np-z02-9]{11,71}|BC1[AC-HJ-NP-Z02-9]{11,71})\b")
 RE_ETH = re.compile(r"\b0x[a-fA-F0-9]{40}\b")
 RE_CREDIT_CARD = re.compile(r"\b(?:\d[ -]*?){13,16}\b")
 RE_SQLI = re.compile(r"(union select|drop table|--\s|;--|or 1=1)", re.I)
 
+# threat keywords (hybrid_detector rule hits), matched case-insensitively as substrings
+KEYWORDS = [
+    "leak",
+    "database",
+    "dump",
+    "credentials",
+    "password",
+    "access for sale",
+    "ransomware",
+    "breach",
+]
+
+# -------------------------------------------------------
+# Single-pass indicator scanner
+# -------------------------------------------------------
+# Python's re is a backtracking engine, so OR-ing all patterns into one regex
+# costs as much as running them one by one. Instead:
+# - one pass of a cheap trigger regex finds the few places an IOC can start
+#   ("@", "0x", "bc1", a [13]-led base58 run, a 13+ char digit run); the exact
+#   patterns above only run inside those windows, widened to whitespace so
+#   \b and leftmost-match semantics are the same as on the full text
+# - keywords and SQLi literals are plain substring searches (str.find, C
+#   speed) on one lower-cased copy of the text
+# Texts with characters whose case folding differs between str.lower() and
+# re.IGNORECASE (İ ı ſ) use the per-pattern reference scan instead.
+
+TOKEN_PATTERNS = (
+    ("credential-leak", RE_EMAIL_PASS),
+    ("email", RE_EMAIL),
+    ("btc-address", RE_BTC),
+    ("btc-address", RE_BTC_BECH32),
+    ("eth-address", RE_ETH),
+    ("credit-card-like", RE_CREDIT_CARD),
+)
+# every alternative starts with [@\d], so re can skip ahead with its charset
+# scan instead of trying each alternative at every position
+RE_TRIGGER = re.compile(r"[@\d](?:(?<=@)|(?<=0)x|(?<=[bB][cC]1)|(?<=[13])[a-km-zA-HJ-NP-Z1-9]{25,}|[\d -]{11,}\d)")
+RE_SQLI_LOWER = re.compile(r"union select|drop table|--\s|;--|or 1=1")
+SQLI_GATES = ("union select", "drop table", "--", "or 1=1")
+_FOLD_SPECIALS = ("İ", "ı", "ſ")
+
+
+class IndicatorMatch(NamedTuple):
+    kind: str
+    value: str
+    start: int
+    end: int
+
+
+def _windows(text: str):
+    """Merged [start, end) spans around trigger hits, widened to whitespace."""
+    n = len(text)
+    spans = []
+    for m in RE_TRIGGER.finditer(text):
+        start, end = m.start(), m.end()
+        while start > 0 and not text[start - 1].isspace():
+            start -= 1
+        while end < n and not text[end].isspace():
+            end += 1
+        if spans and start <= spans[-1][1] + 1:
+            spans[-1][1] = max(spans[-1][1], end)
+        else:
+            spans.append([start, end])
+
+    # windows separated only by whitespace are merged (card numbers span spaces)
+    merged = []
+    for start, end in spans:
+        if merged and not text[merged[-1][1]:start].strip():
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _find_all(haystack: str, needle: str):
+    i = haystack.find(needle)
+    while i != -1:
+        yield i
+        i = haystack.find(needle, i + len(needle))
+
+
+def _scan_reference(text: str) -> List[IndicatorMatch]:
+    found = []
+    for kind, rx in TOKEN_PATTERNS:
+        found += [IndicatorMatch(kind, m.group(0), m.start(), m.end()) for m in rx.finditer(text)]
+    found += [IndicatorMatch("sqli-signature", m.group(0), m.start(), m.end()) for m in RE_SQLI.finditer(text)]
+    lower = text.lower()
+    for kw in KEYWORDS:
+        if kw in lower:
+            found += [IndicatorMatch("keyword", kw, m.start(), m.end()) for m in re.finditer(re.escape(kw), text, re.I)]
+    found.sort(key=lambda m: (m.start, m.end))
+    return found
+
+
+def scan(text: str) -> List[IndicatorMatch]:
+    """All indicator matches (IOCs, SQLi signatures, keywords) with offsets, by position."""
+    if not text:
+        return []
+    if any(c in text for c in _FOLD_SPECIALS):
+        return _scan_reference(text)
+
+    found = []
+    for start, end in _windows(text):
+        for kind, rx in TOKEN_PATTERNS:
+            found += [IndicatorMatch(kind, m.group(0), m.start(), m.end()) for m in rx.finditer(text, start, end)]
+
+    lower = text.lower()
+    if any(g in lower for g in SQLI_GATES):
+        found += [
+            IndicatorMatch("sqli-signature", text[m.start():m.end()], m.start(), m.end())
+            for m in RE_SQLI_LOWER.finditer(lower)
+        ]
+    for kw in KEYWORDS:
+        found += [IndicatorMatch("keyword", kw, i, i + len(kw)) for i in _find_all(lower, kw)]
+
+    found.sort(key=lambda m: (m.start, m.end))
+    return found
+
+
+def keyword_hits(text: str) -> List[str]:
+    """KEYWORDS present in text (case-insensitive), in KEYWORDS order."""
+    lower = (text or "").lower()
+    return [kw for kw in KEYWORDS if kw in lower]
+
+
+def _is_bech32(m: IndicatorMatch) -> bool:
+    # RE_BTC only matches [13]-led base58, so a bc1 value came from RE_BTC_BECH32
+    return m.kind == "btc-address" and m.value[:3] in ("bc1", "BC1")
+
+
 def detect_indicators(text: str) -> Dict[str, List[str]]:
     """
     Returns dictionary mapping indicator_type -> list of indicators found.
     Keep detectors conservative to avoid false positives.
     """
-    if not text:
-        return {}
+    found: Dict[str, List[str]] = {}
+    for m in scan(text):
+        # bech32 addresses are reported by extract_iocs only; this output stays as before
+        if m.kind != "keyword" and not _is_bech32(m):
+            found.setdefault(m.kind, []).append(m.value)
+    if "email" in found:
+        found["email"] = list(dict.fromkeys(found["email"]))
+    return found
 
-    found = {}
 
-    # email:pass-like patterns (high confidence)
-    creds = RE_EMAIL_PASS.findall(text)
-    if creds:
-        found["credential-leak"] = creds
+# -------------------------------------------------------
+# Validated, de-duplicated IOCs
+# -------------------------------------------------------
+# detect_indicators() reports every shape match. extract_iocs() is the stage
+# meant for storage: checksum validation (ioc_checks: Luhn, Base58Check,
+# bech32, EIP-55) and one entry per distinct IOC per page, keyed on a
+# canonical value (card digits, lower-cased ETH address / email / bech32).
+VALIDATE_IOCS = os.getenv("VALIDATE_IOCS", "true").lower() in ("1", "true", "yes")
+IOC_KINDS = ("credential-leak", "email", "btc-address", "eth-address", "credit-card-like")
 
-    # email addresses
-    emails = list(set(RE_EMAIL.findall(text)))
-    if emails:
-        found["email"] = emails
 
-    # bitcoin addresses
-    btcs = RE_BTC.findall(text)
-    if btcs:
-        found["btc-address"] = btcs
+class IOC(NamedTuple):
+    kind: str
+    value: str
+    offsets: List[Tuple[int, int]]
 
-    # ethereum addresses
-    eths = RE_ETH.findall(text)
-    if eths:
-        found["eth-address"] = eths
 
-    # credit-card-like sequences — flag as medium confidence
-    cards = RE_CREDIT_CARD.findall(text)
-    if cards:
-        found["credit-card-like"] = cards
+def canonical_ioc(kind: str, value: str) -> str:
+    if kind == "credit-card-like":
+        return ioc_checks.card_digits(value)
+    if kind in ("eth-address", "email") or (kind == "btc-address" and value[:3] == "BC1"):
+        return value.lower()
+    return value
 
-    # simple SQLi-like giveaways
-    sqli = RE_SQLI.findall(text)
-    if sqli:
-        found["sqli-signature"] = sqli
 
-    return found
+def _valid_mask(candidates: List[IndicatorMatch]) -> List[bool]:
+    ok = [True] * len(candidates)
+    cards = [i for i, m in enumerate(candidates) if m.kind == "credit-card-like"]
+    for i, valid in zip(cards, ioc_checks.cards_valid([candidates[i].value for i in cards])):
+        ok[i] = valid
+    eths = [i for i, m in enumerate(candidates) if m.kind == "eth-address"]
+    for i, valid in zip(eths, ioc_checks.eths_valid([candidates[i].value for i in eths])):
+        ok[i] = valid
+    for i, m in enumerate(candidates):
+        if m.kind == "btc-address":
+            ok[i] = ioc_checks.btc_valid(m.value)
+    return ok
+
+
+def extract_iocs(text: str, validate: bool = VALIDATE_IOCS) -> List[IOC]:
+    """Distinct IOCs of a page, in order of first occurrence, with every offset."""
+    # validate each distinct raw value once (dumps repeat the same wallet/card)
+    first = {}
+    for m in scan(text):
+        if m.kind in IOC_KINDS:
+            first.setdefault((m.kind, m.value), []).append((m.start, m.end))
+    raw = [IndicatorMatch(kind, value, *offsets[0]) for (kind, value), offsets in first.items()]
+    mask = _valid_mask(raw) if validate else [True] * len(raw)
+
+    iocs: Dict[Tuple[str, str], IOC] = {}
+    for m, ok in zip(raw, mask):
+        if not ok:
+            continue
+        key = (m.kind, canonical_ioc(m.kind, m.value))
+        ioc = iocs.setdefault(key, IOC(m.kind, key[1], []))
+        ioc.offsets.extend(first[(m.kind, m.value)])
+
+    out = list(iocs.values())
+    for ioc in out:
+        ioc.offsets.sort()
+    out.sort(key=lambda ioc: ioc.offsets[0])
+    return out
 
 def score_indicator(indicator_type: str, indicator_value: str) -> str:
     if indicator_type == "credential-leak":
@@ -66,4 +236,3 @@ def score_indicator(indicator_type: str, indicator_value: str) -> str:
     if indicator_type == "email":
         return "low"
     return "low"
-
@@ -0,0 +1,8 @@
+import hashlib
+
+# Page fingerprints used to skip re-analysing content that was already seen.
+
+
+def content_hash(clean_text: str) -> str:
+    """Exact fingerprint of cleaned page text (clean_html already normalizes whitespace/unicode)."""
+    return hashlib.sha256((clean_text or "").encode("utf-8")).hexdigest()
@@ -1,8 +1,32 @@
 from bs4 import BeautifulSoup
+from lxml import etree
 import unicodedata
+import os
 import re
 
-def clean_html(html: str) -> str:
+# CLEAN_ENGINE picks the HTML -> text engine:
+#   lxml (default)  streaming lxml parse into a text collector; script/style/
+#                   noscript/iframe content is dropped while parsing, no tree is built
+#   bs4             original BeautifulSoup tree + decompose + get_text
+# Both produce the same text (tools/bench_html_cleaner.py checks it).
+CLEAN_ENGINE = os.getenv("CLEAN_ENGINE", "lxml").lower()
+
+SKIP_TAGS = frozenset(("script", "style", "noscript", "iframe"))
+# bs4's get_text() leaves <template> content out as well
+_TEXTLESS_TAGS = SKIP_TAGS | {"template"}
+
+_WS_RE = re.compile(r"\s+")
+
+
+def _normalize(text: str) -> str:
+    # Unicode normalization
+    text = unicodedata.normalize("NFKC", text)
+
+    # Whitespace normalization
+    return _WS_RE.sub(" ", text).strip()
+
+
+def clean_html_bs4(html: str) -> str:
     if not html:
         return ""
 
@@ -12,12 +36,64 @@ def clean_html(html: str) -> str:
     for tag in soup(["script", "style", "noscript", "iframe"]):
         tag.decompose()
 
-    text = soup.get_text(separator=" ")
+    return _normalize(soup.get_text(separator=" "))
 
-    # Unicode normalization
-    text = unicodedata.normalize("NFKC", text)
 
-    # Whitespace normalization
-    text = re.sub(r"\s+", " ", text)
+class _TextCollector:
+    """
+    lxml parser target. Text between two tags is one string (like a bs4
+    NavigableString); strings are later joined with " " as get_text(separator=" ")
+    does. Comments end a string but are not text.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self._buf = []
+        self._skip = 0
 
-    return text.strip()
+    def _flush(self):
+        if self._buf:
+            self.parts.append("".join(self._buf))
+            self._buf = []
+
+    def start(self, tag, attrib):
+        self._flush()
+        if tag in _TEXTLESS_TAGS:
+            self._skip += 1
+
+    def end(self, tag):
+        self._flush()
+        if tag in _TEXTLESS_TAGS and self._skip:
+            self._skip -= 1
+
+    def data(self, text):
+        if not self._skip:
+            self._buf.append(text)
+
+    def comment(self, text):
+        self._flush()
+
+    def close(self):
+        self._flush()
+        return " ".join(self.parts)
+
+
+def clean_html_lxml(html: str) -> str:
+    if not html:
+        return ""
+
+    parser = etree.HTMLParser(target=_TextCollector())
+    try:
+        parser.feed(html)
+        text = parser.close()
+    except (etree.ParserError, etree.XMLSyntaxError):
+        # documents lxml's target interface rejects (e.g. whitespace only)
+        return clean_html_bs4(html)
+
+    return _normalize(text)
+
+
+def clean_html(html: str) -> str:
+    if CLEAN_ENGINE == "bs4":
+        return clean_html_bs4(html)
+    return clean_html_lxml(html)
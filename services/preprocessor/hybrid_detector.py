@@ -1,25 +1,55 @@
+import os
+import json
 from sqlalchemy import text
-from services.ml.darkbert_infer import predict_text
-from services.llm.intel_engine import analyze_darkweb_content
+from services.ml.darkbert_infer import predict_batch, predict_windows, window_stats
+from services.ml.baseline_infer import predict_baseline_batch
+from services.preprocessor.detectors import KEYWORDS, keyword_hits, extract_iocs, score_indicator
+from services.preprocessor.watchlist import page_orgs, recipient_org_ids
+
+
+# -------------------------------------------------------
+# Cascade config
+# -------------------------------------------------------
+# TF-IDF+LR scores every page first; only pages it cannot confidently call
+# benign (suspicious label, low confidence, or rule hits) go to DarkBERT.
+CASCADE_ENABLED = os.getenv("CASCADE_ENABLED", "true").lower() in ("1", "true", "yes")
+CASCADE_BENIGN_ACCEPT = float(os.getenv("CASCADE_BENIGN_ACCEPT", "0.5"))
+BENIGN_LABEL = 0
+
+cascade_stats = {"pages": 0, "escalated": 0}
+
+# one structured threat per distinct validated IOC (detectors.extract_iocs)
+# next to the hybrid verdict
+IOC_THREATS = os.getenv("IOC_THREATS", "true").lower() in ("1", "true", "yes")
+IOC_SNIPPET_CHARS = int(os.getenv("IOC_SNIPPET_CHARS", "80"))
+IOC_MAX_OFFSETS = int(os.getenv("IOC_MAX_OFFSETS", "100"))
+# threats.indicator is btree-indexed (ix_threats_indicator); Postgres rejects
+# index rows over ~2.7 KB, and credential / email values have no length limit
+IOC_MAX_CHARS = int(os.getenv("IOC_MAX_CHARS", "512"))
+
+# DarkBERT page chunking:
+#   tokens  windows of exactly the model's max length (darkbert_infer.predict_windows,
+#           overlap set by DARKBERT_WINDOW_STRIDE)
+#   words   512-word chunks, each cut to 1500 chars / 512 tokens (previous behaviour)
+CHUNKING = os.getenv("CHUNKING", "tokens")
+# stop scoring a page at the first window with a threat (non-benign) label at
+# or above this confidence; 0 scores every window (tokens chunking only)
+EARLY_EXIT_CONF = float(os.getenv("EARLY_EXIT_CONF", "0"))
+
+# chunks run through DarkBERT (with early exit: including windows of a wave
+# scored past the exit point)
+chunk_stats = {"pages": 0, "chunks": 0, "early_exits": 0}
 
 
 # -------------------------------------------------------
 # Indicators
 # -------------------------------------------------------
-INDICATORS = [
-    "leak",
-    "database",
-    "dump",
-    "credentials",
-    "password",
-    "access for sale",
-    "ransomware",
-    "breach",
-]
+# shared with the indicator scanner (services/preprocessor/detectors.py)
+INDICATORS = KEYWORDS
 
 
 # -------------------------------------------------------
-# Text Chunking (CRITICAL FIX)
+# Text Chunking (CHUNKING=words; token windows live in darkbert_infer)
 # -------------------------------------------------------
 def chunk_text(text, size=512):
     words = text.split()
@@ -47,21 +77,18 @@ def extract_snippet(text_data, keyword, window=220):
 # -------------------------------------------------------
 def detect_rules(clean_text):
 
-    lower = clean_text.lower()
-    return [ind for ind in INDICATORS if ind in lower]
+    return keyword_hits(clean_text)
 
 
 # -------------------------------------------------------
 # ML Prediction on Chunks
 # -------------------------------------------------------
-def ml_predict_page(clean_text):
+def best_prediction(preds):
 
     best_conf = 0
     best_label = None
 
-    for chunk in chunk_text(clean_text):
-        label, conf = predict_text(chunk)
-
+    for label, conf in preds:
         if conf > best_conf:
             best_conf = conf
             best_label = label
@@ -69,6 +96,96 @@ def ml_predict_page(clean_text):
     return best_label, best_conf
 
 
+def ml_predict_page(clean_text):
+
+    # all chunks of the page go through the model in mini-batches
+    return ml_predict_pages([clean_text])[0]
+
+
+def ml_predict_pages(clean_texts):
+
+    # chunks of several pages share mini-batches; regrouped per page afterwards
+    if CHUNKING == "words":
+        chunks, owners = [], []
+        for page_idx, page_text in enumerate(clean_texts):
+            for chunk in chunk_text(page_text or ""):
+                chunks.append(chunk)
+                owners.append(page_idx)
+
+        per_page = [[] for _ in clean_texts]
+        for owner, pred in zip(owners, predict_batch(chunks)):
+            per_page[owner].append(pred)
+        chunk_stats["chunks"] += len(chunks)
+    else:
+        scored = window_stats["scored"]
+        per_page = predict_windows(
+            [t or "" for t in clean_texts],
+            exit_conf=EARLY_EXIT_CONF or None,
+            benign_label=BENIGN_LABEL,
+        )
+        if EARLY_EXIT_CONF:
+            chunk_stats["early_exits"] += sum(
+                1 for preds in per_page
+                if preds and preds[-1][0] != BENIGN_LABEL and preds[-1][1] >= EARLY_EXIT_CONF
+            )
+        chunk_stats["chunks"] += window_stats["scored"] - scored
+
+    chunk_stats["pages"] += len(clean_texts)
+    return [best_prediction(preds) for preds in per_page]
+
+
+def chunks_per_page():
+    pages = chunk_stats["pages"]
+    return chunk_stats["chunks"] / pages if pages else 0.0
+
+
+# -------------------------------------------------------
+# Cascade: TF-IDF baseline → DarkBERT
+# -------------------------------------------------------
+def needs_escalation(baseline_label, baseline_conf, rule_hits):
+
+    if rule_hits:
+        return True
+
+    if baseline_label != BENIGN_LABEL:
+        return True
+
+    return baseline_conf < CASCADE_BENIGN_ACCEPT
+
+
+def classify_pages(clean_texts, rule_hits_per_page=None):
+    """
+    Returns [(label, conf, source)] per page, source being "baseline" or "darkbert".
+    With the cascade disabled every page goes to DarkBERT.
+    """
+    rule_hits_per_page = rule_hits_per_page or [[] for _ in clean_texts]
+
+    if not CASCADE_ENABLED:
+        return [(l, c, "darkbert") for l, c in ml_predict_pages(clean_texts)]
+
+    results = [(l, c, "baseline") for l, c in predict_baseline_batch(clean_texts)]
+
+    escalate = [
+        i for i, ((label, conf, _), hits) in enumerate(zip(results, rule_hits_per_page))
+        if needs_escalation(label, conf, hits)
+    ]
+    for i, (label, conf) in zip(escalate, ml_predict_pages([clean_texts[i] for i in escalate])):
+        results[i] = (label, conf, "darkbert")
+
+    cascade_stats["pages"] += len(clean_texts)
+    cascade_stats["escalated"] += len(escalate)
+    return results
+
+
+def classify_page(clean_text, rule_hits=None):
+    return classify_pages([clean_text], [rule_hits or []])[0]
+
+
+def escalation_rate():
+    pages = cascade_stats["pages"]
+    return cascade_stats["escalated"] / pages if pages else 0.0
+
+
 # -------------------------------------------------------
 # Hybrid Severity (Improved)
 # -------------------------------------------------------
@@ -90,50 +207,157 @@ def compute_severity(rule_hits, ml_conf):
 
 
 # -------------------------------------------------------
-# MAIN ENTRY
+# Evaluation (no DB access)
 # -------------------------------------------------------
-def analyze_page(engine, org_id, page_id, clean_text, org_name=None):
+def page_relevance(clean_texts, org_names=None):
+    """watchlist.page_orgs() per page: (relevant to its org, other matching orgs)."""
+    org_names = org_names or [None] * len(clean_texts)
+    return [page_orgs(clean_text or "", org_name) for clean_text, org_name in zip(clean_texts, org_names)]
+
+
+def evaluate_pages(clean_texts, org_names=None, relevance=None):
+    """
+    Threat row (without org/page ids) or None per page. Pages of one call
+    share the cascade's batches, so the batch writer scores a whole flush at once.
+    relevance: page_relevance() of the pages, when the caller already has it.
+    """
+    relevance = relevance or page_relevance(clean_texts, org_names)
+    results = [None] * len(clean_texts)
+
+    candidates = []
+    for i, (clean_text, (mentioned, others)) in enumerate(zip(clean_texts, relevance)):
+        if not clean_text or len(clean_text) < 200:
+            continue
+        # Optional org relevance boost (org name + watch terms, see watchlist.py):
+        # pages that concern neither their org nor any watched org are skipped
+        if not mentioned and not others:
+            print("Skipping — org not mentioned")
+            continue
+        candidates.append(i)
+
+    if not candidates:
+        return results
 
-    print("HYBRID DETECTOR RUNNING")
+    # Rules
+    rule_hits = [detect_rules(clean_texts[i]) for i in candidates]
 
-    if not clean_text or len(clean_text) < 200:
-        return
+    # ML (cascade: baseline first, DarkBERT only when escalated)
+    predictions = classify_pages([clean_texts[i] for i in candidates], rule_hits)
 
-    # Optional org relevance boost
-    if org_name and org_name.lower() not in clean_text.lower():
-        print("Skipping — org not mentioned")
-        return
+    for i, hits, (ml_label, ml_conf, ml_source) in zip(candidates, rule_hits, predictions):
+        clean_text = clean_texts[i]
+        print("ML RESULT:", ml_label, ml_conf, f"({ml_source}, escalation rate {escalation_rate():.0%})")
 
-    # Rules
-    rule_hits = detect_rules(clean_text)
+        severity = compute_severity(hits, ml_conf)
 
-    # ML
-    ml_label, ml_conf = ml_predict_page(clean_text)
+        # Evidence
+        if hits:
+            indicator = hits[0]
+            snippet = extract_snippet(clean_text, indicator)
+        elif ml_conf > 0.5:
+            indicator = f"ml-class-{ml_label}"
+            snippet = clean_text[:400]
+        else:
+            continue
 
-    print("ML RESULT:", ml_label, ml_conf)
+        if ml_label is None:
+            ml_label = 0
+            ml_conf = 0.0
 
-    severity = compute_severity(rule_hits, ml_conf)
+        results[i] = {
+            "indicator_type": "hybrid",
+            "indicator": indicator,
+            "severity": severity,
+            "evidence": snippet,
+            "ml_label": ml_label,
+            "ml_confidence": ml_conf,
+        }
 
-    
-    # Evidence
-    if rule_hits:
-     indicator = rule_hits[0]
-     snippet = extract_snippet(clean_text, indicator)
+    return results
 
-    elif ml_conf > 0.5:
-        indicator = f"ml-class-{ml_label}"
-        snippet = clean_text[:400]
 
-    else:
+def evaluate_page(clean_text, org_name=None):
+    return evaluate_pages([clean_text], [org_name])[0]
+
+
+# -------------------------------------------------------
+# Structured IOC threats
+# -------------------------------------------------------
+def ioc_threats(clean_text):
+    """
+    One threat row (without org/page ids) per distinct IOC of the page:
+    indicator is the canonical value (cut to IOC_MAX_CHARS; evidence then
+    records its full length), severity comes from score_indicator and
+    evidence is JSON with the character offsets of every occurrence in
+    clean_text (capped at IOC_MAX_OFFSETS), their count and a snippet around
+    the first one.
+    """
+    rows = []
+    for ioc in extract_iocs(clean_text or ""):
+        start, end = ioc.offsets[0]
+        evidence = {
+            "offsets": [list(o) for o in ioc.offsets[:IOC_MAX_OFFSETS]],
+            "count": len(ioc.offsets),
+            "snippet": clean_text[max(0, start - IOC_SNIPPET_CHARS):end + IOC_SNIPPET_CHARS],
+        }
+        if len(ioc.value) > IOC_MAX_CHARS:
+            evidence["indicator_chars"] = len(ioc.value)
+        rows.append({
+            "indicator_type": ioc.kind,
+            "indicator": ioc.value[:IOC_MAX_CHARS],
+            "severity": score_indicator(ioc.kind, ioc.value),
+            "evidence": json.dumps(evidence),
+            "ml_label": None,
+            "ml_confidence": None,
+        })
+    return rows
+
+
+def page_threat_rows(clean_texts, org_names=None):
+    """
+    (rows, relevance) per page: the hybrid verdict (if any) followed by the
+    page's IOC threats, and its page_relevance() (one watchlist match per
+    page). Pages that concern no org get no rows; recipient_org_ids() turns
+    the relevance into the orgs that get the rows.
+    """
+    relevance = page_relevance(clean_texts, org_names)
+    verdicts = evaluate_pages(clean_texts, org_names, relevance)
+
+    return [
+        (([verdict] if verdict is not None else []) + iocs, rel)
+        for verdict, (iocs, rel) in zip(verdicts, ioc_threat_rows(clean_texts, org_names, relevance))
+    ]
+
+
+def ioc_threat_rows(clean_texts, org_names=None, relevance=None):
+    """
+    (rows, relevance) per page like page_threat_rows, without the classifier
+    verdict (near duplicates reuse the verdict of the page they resemble but
+    keep their own IOCs).
+    """
+    relevance = relevance or page_relevance(clean_texts, org_names)
+    return [
+        (ioc_threats(clean_text) if IOC_THREATS and (mentioned or others) else [], (mentioned, others))
+        for clean_text, (mentioned, others) in zip(clean_texts, relevance)
+    ]
+
+
+# -------------------------------------------------------
+# MAIN ENTRY
+# -------------------------------------------------------
+def analyze_page(engine, org_id, page_id, clean_text, org_name=None):
+
+    print("HYBRID DETECTOR RUNNING")
+
+    threats, relevance = page_threat_rows([clean_text], [org_name])[0]
+    if not threats:
         return
-    # Save
-    try:
+    org_ids = recipient_org_ids(org_id, relevance)
 
-        if ml_label is None:
-            ml_label = 0
-            ml_conf = 0.0
+    # Save (all rows of the page in one transaction / executemany)
+    try:
 
-        print("Saving threat →", indicator)
+        print(f"Saving {len(threats)} threats →", ", ".join(t["indicator_type"] for t in threats[:5]))
 
         with engine.begin() as conn:
             conn.execute(text("""
@@ -150,24 +374,16 @@ def analyze_page(engine, org_id, page_id, clean_text, org_name=None):
                 VALUES (
                     :org_id,
                     :page_id,
-                    'hybrid',
+                    :indicator_type,
                     :indicator,
                     :severity,
                     :evidence,
                     :ml_label,
-                    :ml_conf
+                    :ml_confidence
                 )
-            """), {
-                "org_id": org_id,
-                "page_id": page_id,
-                "indicator": indicator,
-                "severity": severity,
-                "evidence": snippet,
-                "ml_label": ml_label,
-                "ml_conf": ml_conf
-            })
-
-        print("Threat inserted successfully")
+            """), [{"org_id": o, "page_id": page_id, **threat} for o in org_ids for threat in threats])
+
+        print("Threats inserted successfully")
 
     except Exception as e:
-        print("DB INSERT ERROR:", e)
\ No newline at end of file
+        print("DB INSERT ERROR:", e)
@@ -0,0 +1,273 @@
+# services/preprocessor/ioc_checks.py
+"""
+Checksum validation for IOC candidates found by detectors.scan().
+
+The regexes only look at shape: any 13-16 digit run is "card-like" and any
+[13]-led base58-ish word is a "btc-address", so order numbers, timestamps,
+phone numbers and random tokens in large dumps all come out as IOCs. The
+checks here drop candidates that cannot be real:
+
+- cards: Luhn, computed for all candidates of a page at once with numpy
+  (one matrix per digit count); numbers of a single repeated digit are dropped
+- BTC legacy (1.../3...): Base58Check, i.e. 25 bytes, version 0x00/0x05 and
+  the double-SHA256 checksum
+- BTC segwit (bc1...): bech32 / bech32m checksum and witness program rules (BIP173/BIP350)
+- ETH: mixed-case addresses must carry a valid EIP-55 checksum (keccak-256);
+  all-lower / all-upper addresses have no checksum and are kept
+
+hashlib has no keccak-256 (its sha3_256 pads differently), so it is
+implemented here; it only ever hashes 40-byte address strings.
+"""
+
+import hashlib
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+from typing import List, Optional
+
+import numpy as np
+
+# ---------------- CARDS ----------------
+
+def card_digits(value: str) -> str:
+    digits = "".join(c for c in value if c.isdigit())
+    if not digits.isascii():
+        digits = "".join(str(unicodedata.decimal(c)) for c in digits)
+    return digits
+
+
+def luhn_valid(numbers: List[str]) -> np.ndarray:
+    """bool[len(numbers)]: Luhn check of ASCII digit strings, batched per length."""
+    out = np.zeros(len(numbers), dtype=bool)
+    by_len = defaultdict(list)
+    for i, number in enumerate(numbers):
+        by_len[len(number)].append(i)
+
+    for length, idx in by_len.items():
+        if length < 2:
+            continue
+        d = np.frombuffer("".join(numbers[i] for i in idx).encode("ascii"), dtype=np.uint8)
+        d = d.reshape(len(idx), length).astype(np.int32) - 48
+        doubled = d[:, length - 2::-2] * 2
+        doubled -= 9 * (doubled > 9)
+        total = d[:, length - 1::-2].sum(axis=1) + doubled.sum(axis=1)
+        out[idx] = total % 10 == 0
+    return out
+
+
+def cards_valid(values: List[str]) -> List[bool]:
+    digits = [card_digits(v) for v in values]
+    luhn = luhn_valid(digits)
+    return [bool(ok) and len(set(d)) > 1 for ok, d in zip(luhn, digits)]
+
+
+# ---------------- BTC ----------------
+
+B58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+_B58_INDEX = {c: i for i, c in enumerate(B58_ALPHABET)}
+
+BECH32_CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+_BECH32_INDEX = {c: i for i, c in enumerate(BECH32_CHARSET)}
+_BECH32_GEN = (0x3B6A57B2, 0x26508E6D, 0x1EA119FA, 0x3D4233DD, 0x2A1462B3)
+BECH32_CONST = 1
+BECH32M_CONST = 0x2BC830A3
+
+
+def b58decode(value: str) -> Optional[bytes]:
+    num = 0
+    for c in value:
+        i = _B58_INDEX.get(c)
+        if i is None:
+            return None
+        num = num * 58 + i
+    body = num.to_bytes((num.bit_length() + 7) // 8, "big") if num else b""
+    return b"\x00" * (len(value) - len(value.lstrip("1"))) + body
+
+
+def base58check_valid(value: str) -> bool:
+    raw = b58decode(value)
+    if raw is None or len(raw) != 25 or raw[0] not in (0x00, 0x05):
+        return False
+    return hashlib.sha256(hashlib.sha256(raw[:21]).digest()).digest()[:4] == raw[21:]
+
+
+def bech32_polymod(values) -> int:
+    chk = 1
+    for v in values:
+        top = chk >> 25
+        chk = (chk & 0x1FFFFFF) << 5 ^ v
+        for i, gen in enumerate(_BECH32_GEN):
+            if (top >> i) & 1:
+                chk ^= gen
+    return chk
+
+
+def bech32_hrp_expand(hrp: str) -> List[int]:
+    return [ord(c) >> 5 for c in hrp] + [0] + [ord(c) & 31 for c in hrp]
+
+
+def convertbits(data, frombits: int, tobits: int, pad: bool) -> Optional[List[int]]:
+    acc, bits, out = 0, 0, []
+    maxv = (1 << tobits) - 1
+    for value in data:
+        acc = (acc << frombits) | value
+        bits += frombits
+        while bits >= tobits:
+            bits -= tobits
+            out.append((acc >> bits) & maxv)
+    if pad:
+        if bits:
+            out.append((acc << (tobits - bits)) & maxv)
+    elif bits >= frombits or (acc << (tobits - bits)) & maxv:
+        return None
+    return out
+
+
+def bech32_valid(value: str) -> bool:
+    if value.lower() != value and value.upper() != value or len(value) > 90:
+        return False
+    hrp, _, data = value.lower().rpartition("1")
+    if hrp != "bc" or len(data) < 7:
+        return False
+    values = [_BECH32_INDEX.get(c) for c in data]
+    if None in values:
+        return False
+
+    const = bech32_polymod(bech32_hrp_expand(hrp) + values)
+    version = values[0]
+    program = convertbits(values[1:-6], 5, 8, False)
+    if program is None or not 2 <= len(program) <= 40 or version > 16:
+        return False
+    if version == 0:
+        return const == BECH32_CONST and len(program) in (20, 32)
+    return const == BECH32M_CONST
+
+
+@lru_cache(maxsize=65536)
+def btc_valid(value: str) -> bool:
+    if value[:3].lower() == "bc1":
+        return bech32_valid(value)
+    return base58check_valid(value)
+
+
+# ---------------- ETH ----------------
+
+_KECCAK_RC = (
+    0x0000000000000001, 0x0000000000008082, 0x800000000000808A, 0x8000000080008000,
+    0x000000000000808B, 0x0000000080000001, 0x8000000080008081, 0x8000000000008009,
+    0x000000000000008A, 0x0000000000000088, 0x0000000080008009, 0x000000008000000A,
+    0x000000008000808B, 0x800000000000008B, 0x8000000000008089, 0x8000000000008003,
+    0x8000000000008002, 0x8000000000000080, 0x000000000000800A, 0x800000008000000A,
+    0x8000000080008081, 0x8000000000008080, 0x0000000080000001, 0x8000000080008008,
+)
+# rotation offsets r[x][y]; lane (x, y) is state[x + 5 * y]
+_KECCAK_ROT = (
+    (0, 36, 3, 41, 18),
+    (1, 44, 10, 45, 2),
+    (62, 6, 43, 15, 61),
+    (28, 55, 25, 21, 56),
+    (27, 20, 39, 8, 14),
+)
+_MASK64 = (1 << 64) - 1
+
+
+# rho + pi as one table: (source lane, destination lane, rotation)
+_KECCAK_PI = tuple(
+    (x + 5 * y, y + 5 * ((2 * x + 3 * y) % 5), _KECCAK_ROT[x][y]) for x in range(5) for y in range(5)
+)
+
+
+def _keccak_f(a: List[int]):
+    for rc in _KECCAK_RC:
+        c = [a[x] ^ a[x + 5] ^ a[x + 10] ^ a[x + 15] ^ a[x + 20] for x in range(5)]
+        d = [c[(x - 1) % 5] ^ (((c[(x + 1) % 5] << 1) | (c[(x + 1) % 5] >> 63)) & _MASK64) for x in range(5)]
+        b = [0] * 25
+        for src, dst, rot in _KECCAK_PI:
+            v = a[src] ^ d[src % 5]
+            b[dst] = ((v << rot) | (v >> (64 - rot))) & _MASK64 if rot else v
+        for y in (0, 5, 10, 15, 20):
+            b0, b1, b2, b3, b4 = b[y:y + 5]
+            a[y] = b0 ^ (~b1 & b2)
+            a[y + 1] = b1 ^ (~b2 & b3)
+            a[y + 2] = b2 ^ (~b3 & b4)
+            a[y + 3] = b3 ^ (~b4 & b0)
+            a[y + 4] = b4 ^ (~b0 & b1)
+        a[0] ^= rc
+
+
+def keccak256(data: bytes) -> bytes:
+    rate = 136
+    padded = bytearray(data) + b"\x01" + b"\x00" * (rate - 1 - len(data) % rate)
+    padded[-1] |= 0x80
+    state = [0] * 25
+    for off in range(0, len(padded), rate):
+        for i in range(rate // 8):
+            state[i] ^= int.from_bytes(padded[off + 8 * i:off + 8 * i + 8], "little")
+        _keccak_f(state)
+    return b"".join(lane.to_bytes(8, "little") for lane in state[:4])
+
+
+@lru_cache(maxsize=65536)
+def to_checksum_address(value: str) -> str:
+    """EIP-55 form of a 0x + 40 hex address."""
+    hexaddr = value[2:].lower()
+    digest = keccak256(hexaddr.encode("ascii")).hex()
+    return "0x" + "".join(c.upper() if int(h, 16) >= 8 else c for c, h in zip(hexaddr, digest))
+
+
+@lru_cache(maxsize=65536)
+def eth_valid(value: str) -> bool:
+    body = value[2:]
+    if body == body.lower() or body == body.upper():
+        return True
+    return to_checksum_address(value) == value
+
+
+def _rol_np(v: np.ndarray, n: int) -> np.ndarray:
+    return (v << np.uint64(n)) | (v >> np.uint64(64 - n)) if n else v
+
+
+def keccak256_batch(messages: List[bytes]) -> np.ndarray:
+    """uint8[N, 32] keccak-256 of N messages under one block (< 136 bytes), all lanes at once."""
+    rate = 136
+    block = np.zeros((len(messages), rate), dtype=np.uint8)
+    for i, msg in enumerate(messages):
+        block[i, :len(msg)] = np.frombuffer(msg, dtype=np.uint8)
+        block[i, len(msg)] ^= 0x01
+    block[:, rate - 1] |= 0x80
+
+    lanes = block.view("<u8").T.astype(np.uint64)
+    a = [lanes[i] for i in range(rate // 8)] + [np.zeros(len(messages), dtype=np.uint64)] * (25 - rate // 8)
+    for rc in _KECCAK_RC:
+        c = [a[x] ^ a[x + 5] ^ a[x + 10] ^ a[x + 15] ^ a[x + 20] for x in range(5)]
+        d = [c[(x - 1) % 5] ^ _rol_np(c[(x + 1) % 5], 1) for x in range(5)]
+        b = [None] * 25
+        for src, dst, rot in _KECCAK_PI:
+            b[dst] = _rol_np(a[src] ^ d[src % 5], rot)
+        a = [b[x + y] ^ (~b[(x + 1) % 5 + y] & b[(x + 2) % 5 + y]) for y in (0, 5, 10, 15, 20) for x in range(5)]
+        a[0] = a[0] ^ np.uint64(rc)
+    return np.stack(a[:4], axis=1).astype("<u8").view(np.uint8)
+
+
+# below this many mixed-case addresses the per-address (cached) path is faster
+ETH_BATCH_MIN = 16
+
+
+def eths_valid(values: List[str]) -> List[bool]:
+    """eth_valid over many addresses; mixed-case ones are checksummed in one keccak batch."""
+    mixed = [i for i, v in enumerate(values) if v[2:] != v[2:].lower() and v[2:] != v[2:].upper()]
+    if len(mixed) < ETH_BATCH_MIN:
+        return [eth_valid(v) for v in values]
+
+    out = [True] * len(values)
+    addrs = np.frombuffer("".join(values[i][2:] for i in mixed).encode("ascii"), dtype=np.uint8).reshape(-1, 40)
+    lower = np.where(addrs >= ord("A"), addrs | 0x20, addrs).astype(np.uint8)
+    digest = keccak256_batch([bytes(row) for row in lower])
+    # nibble i of the hash decides the case of hex character i
+    nibbles = np.stack([digest >> 4, digest & 0x0F], axis=2).reshape(-1, 64)[:, :40]
+    letters = lower >= ord("a")
+    expect_upper = letters & (nibbles >= 8)
+    is_upper = (addrs >= ord("A")) & (addrs <= ord("F"))
+    for i, ok in zip(mixed, (expect_upper == is_upper).all(axis=1)):
+        out[i] = bool(ok)
+    return out
@@ -0,0 +1,165 @@
+import os
+import re
+import zlib
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+# MinHash signatures over word shingles + an LSH near-duplicate index.
+#
+# Mirrored onion pages and reposted dumps differ in a few words, so their
+# content_hash differs while their shingle sets overlap almost completely.
+# A signature keeps NUM_PERM minimum hashes; BANDS x ROWS banding makes pages
+# with Jaccard similarity above ~(1/BANDS)^(1/ROWS) share at least one band
+# key with high probability, and candidates are confirmed with the
+# signature-estimated Jaccard (NEARDUP_THRESHOLD).
+#
+# The index keeps per-band keys in sorted numpy arrays (binary search) plus a
+# small dict for recent inserts that is merged in periodically, so a page
+# costs ~450 bytes (signature + 16 band keys/ids) instead of 16 Python dict
+# entries, and a lookup stays a handful of binary searches at millions of pages.
+
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+MIN_TOKENS = int(os.getenv("NEARDUP_MIN_TOKENS", "50"))
+THRESHOLD = float(os.getenv("NEARDUP_THRESHOLD", "0.7"))
+ENABLED = os.getenv("NEARDUP_ENABLED", "true").lower() in ("1", "true", "yes")
+
+MERGE_AT = 65536
+_PRIME = np.uint64((1 << 31) - 1)
+
+# fixed seeds: signatures are stored in crawled_pages.minhash and must stay comparable
+_rng = np.random.RandomState(20240611)
+_A = _rng.randint(1, (1 << 31) - 1, size=NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, (1 << 31) - 1, size=NUM_PERM).astype(np.uint64)
+_BAND_MULT = (_rng.randint(1, 1 << 62, size=ROWS).astype(np.uint64) << np.uint64(1)) | np.uint64(1)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str):
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def signature(text: str, shingle_size: int = SHINGLE_SIZE) -> Optional[np.ndarray]:
+    """uint32[NUM_PERM] MinHash of the page's shingle set, or None for texts too short to compare."""
+    tokens = tokenize(text)
+    if len(tokens) < max(MIN_TOKENS, shingle_size):
+        return None
+
+    shingles = {
+        zlib.crc32(" ".join(tokens[i:i + shingle_size]).encode("utf-8"))
+        for i in range(len(tokens) - shingle_size + 1)
+    }
+    x = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+    # x < 2^32 and a < 2^31, so a*x + b stays below 2^64
+    return ((x[:, None] * _A + _B) % _PRIME).min(axis=0).astype(np.uint32)
+
+
+def to_bytes(sig: Optional[np.ndarray]) -> Optional[bytes]:
+    return None if sig is None else sig.astype("<u4").tobytes()
+
+
+def from_bytes(blob) -> Optional[np.ndarray]:
+    return None if blob is None else np.frombuffer(bytes(blob), dtype="<u4").astype(np.uint32)
+
+
+def jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    return float((a == b).mean())
+
+
+def band_keys(sigs: np.ndarray) -> np.ndarray:
+    """(n, NUM_PERM) signatures -> (n, BANDS) uint64 band keys (wrapping multiply-add)."""
+    rows = sigs.reshape(len(sigs), BANDS, ROWS).astype(np.uint64)
+    with np.errstate(over="ignore"):
+        return (rows * _BAND_MULT).sum(axis=2, dtype=np.uint64)
+
+
+class MinHashIndex:
+    def __init__(self, threshold: float = THRESHOLD):
+        self.threshold = threshold
+        self._sigs = np.empty((1024, NUM_PERM), dtype=np.uint32)
+        self._values = []
+        self._base_keys = [np.empty(0, dtype=np.uint64) for _ in range(BANDS)]
+        self._base_ids = [np.empty(0, dtype=np.int32) for _ in range(BANDS)]
+        self._recent = [{} for _ in range(BANDS)]
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._values)
+
+    # ---------------- INSERT ----------------
+
+    def add(self, sig: np.ndarray, value):
+        self.add_many(sig[None, :], [value])
+
+    def add_many(self, sigs: np.ndarray, values):
+        if not len(values):
+            return
+        keys = band_keys(sigs)
+        with self._lock:
+            start = len(self._values)
+            ids = np.arange(start, start + len(values), dtype=np.int32)
+            self._reserve(start + len(values))
+            self._sigs[start:start + len(values)] = sigs
+            self._values.extend(values)
+
+            if len(values) >= MERGE_AT:
+                # bulk load (index build from the DB): straight into the sorted arrays
+                self._merge(keys, ids)
+                return
+
+            for i, row in zip(ids.tolist(), keys.tolist()):
+                for band, key in enumerate(row):
+                    self._recent[band].setdefault(key, []).append(i)
+            self._pending.append((keys, ids))
+            if sum(len(i) for _, i in self._pending) >= MERGE_AT:
+                self._merge(
+                    np.concatenate([k for k, _ in self._pending]),
+                    np.concatenate([i for _, i in self._pending]),
+                )
+                self._recent = [{} for _ in range(BANDS)]
+                self._pending = []
+
+    def _reserve(self, n: int):
+        if n > len(self._sigs):
+            grown = np.empty((max(n, 2 * len(self._sigs)), NUM_PERM), dtype=np.uint32)
+            grown[:len(self._values)] = self._sigs[:len(self._values)]
+            self._sigs = grown
+
+    def _merge(self, keys: np.ndarray, ids: np.ndarray):
+        for band in range(BANDS):
+            all_keys = np.concatenate([self._base_keys[band], keys[:, band]])
+            all_ids = np.concatenate([self._base_ids[band], ids])
+            order = np.argsort(all_keys, kind="stable")
+            self._base_keys[band] = all_keys[order]
+            self._base_ids[band] = all_ids[order]
+
+    # ---------------- LOOKUP ----------------
+
+    def query(self, sig: np.ndarray) -> Optional[Tuple[float, object]]:
+        """(estimated Jaccard, value) of the most similar entry above threshold, or None."""
+        keys = band_keys(sig[None, :])[0]
+        with self._lock:
+            candidates = set()
+            for band, key in enumerate(keys):
+                base = self._base_keys[band]
+                lo = np.searchsorted(base, key, side="left")
+                hi = np.searchsorted(base, key, side="right")
+                if hi > lo:
+                    candidates.update(self._base_ids[band][lo:hi].tolist())
+                candidates.update(self._recent[band].get(int(key), ()))
+            if not candidates:
+                return None
+
+            ids = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            sims = (self._sigs[ids] == sig).mean(axis=1)
+            best = int(sims.argmax())
+            if sims[best] < self.threshold:
+                return None
+            return float(sims[best]), self._values[ids[best]]
@@ -0,0 +1,378 @@
+# services/preprocessor/watchlist.py
+"""
+Org watchlist index: which orgs does a page concern?
+
+Each org watches its name plus the terms in org_watch_terms:
+  brand     word sequence, case-insensitive, whole words ("Acme Corp")
+  domain    host name, also matching subdomains and email domains
+            ("acme.com" matches "vpn.acme.com" and "bob@acme.com")
+  email     exact address, case-insensitive
+  ip_range  IPv4 CIDR or single address ("203.0.113.0/24")
+
+WatchlistIndex compiles every org's terms into hash tables, so matching a
+page costs the same whether 5 or 50,000 orgs are watched:
+- brands: words of the page that start some brand term are extended into
+  n-grams (up to the longest brand) and looked up in one dict
+- domains: every host / email domain on the page is looked up together
+  with its parent domains
+- emails: one dict lookup per address on the page
+- IPs: one lookup per distinct CIDR prefix length in the index (<= 33)
+
+Watchlist wraps the index for a process: it is built from the orgs and
+org_watch_terms tables, and at most every WATCHLIST_RELOAD_SECONDS a cheap
+fingerprint query (row counts, max ids, max updated_at) decides whether to
+rebuild. The new index is swapped in atomically; callers keep matching
+against the old one meanwhile. reload_watchlist() forces a rebuild (org
+renames do not change the fingerprint).
+
+usage:
+    python -m services.preprocessor.watchlist add <org> <kind> <term>
+    python -m services.preprocessor.watchlist remove <org> <kind> <term>
+    python -m services.preprocessor.watchlist list [org]
+    python -m services.preprocessor.watchlist match <text file>
+
+Env:
+  WATCHLIST                 true | false (default true)
+  WATCHLIST_RELOAD_SECONDS  default 60
+  WATCHLIST_MAX_WORDS       longest brand term in words (default 6)
+  WATCHLIST_MIN_CHARS       shorter brand terms are ignored (default 3); neither
+                            limit applies to the org's own name ("HP", "GE")
+  WATCHLIST_FANOUT          copy a page's threats to every other matching org (default true)
+"""
+
+import os
+import re
+import sys
+import time
+import ipaddress
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, func, delete, insert
+
+from api.models import Org, OrgWatchTerm
+from services.preprocessor.detectors import RE_EMAIL
+
+
+WATCHLIST = os.getenv("WATCHLIST", "true").lower() in ("1", "true", "yes")
+RELOAD_SECONDS = float(os.getenv("WATCHLIST_RELOAD_SECONDS", "60"))
+MAX_WORDS = int(os.getenv("WATCHLIST_MAX_WORDS", "6"))
+MIN_CHARS = int(os.getenv("WATCHLIST_MIN_CHARS", "3"))
+FANOUT = os.getenv("WATCHLIST_FANOUT", "true").lower() in ("1", "true", "yes")
+
+KINDS = ("brand", "domain", "email", "ip_range")
+
+_WORD_RE = re.compile(r"\w+")
+_HOST_RE = re.compile(r"(?<![\w.-])(?:[a-z0-9](?:[a-z0-9-]*[a-z0-9])?\.)+[a-z]{2,}(?![\w-])")
+_IPV4_RE = re.compile(r"(?<![\d.])(?:\d{1,3}\.){3}\d{1,3}(?![\d.])")
+
+
+def _words(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def normalize_domain(term: str) -> str:
+    term = term.strip().lower()
+    term = re.sub(r"^[a-z][a-z0-9+.-]*://", "", term)
+    term = term.split("/")[0].split(":")[0].rstrip(".")
+    return term[4:] if term.startswith("www.") else term
+
+
+class WatchlistIndex:
+    def __init__(self, orgs: Dict[int, str], terms: Iterable[Tuple[int, str, str]] = ()):
+        """orgs: id -> name; terms: (org_id, kind, term) rows of org_watch_terms."""
+        self.orgs = dict(orgs)
+        self.org_ids = {name.lower(): org_id for org_id, name in self.orgs.items()}
+        self.brands: Dict[str, list] = defaultdict(list)
+        self.domains: Dict[str, list] = defaultdict(list)
+        self.emails: Dict[str, list] = defaultdict(list)
+        self.networks: Dict[Tuple[int, int], list] = defaultdict(list)
+        self.plain_names: Dict[int, str] = {}
+        self.first_words = set()
+        self.max_words = 1
+        self.skipped = 0
+
+        for org_id, name in self.orgs.items():
+            self._add(org_id, "brand", name, own=True)
+        for org_id, kind, term in terms:
+            if org_id in self.orgs:
+                self._add(org_id, kind, term)
+        self.prefix_lengths = sorted({plen for plen, _ in self.networks}, reverse=True)
+
+    def _add(self, org_id: int, kind: str, term: str, own: bool = False):
+        entry = (org_id, term)
+        if kind == "brand":
+            words = _words(term)
+            if own and not words:
+                # no word characters to index: plain substring check, as before the index
+                if term.strip():
+                    self.plain_names[org_id] = term.strip().lower()
+                return
+            if not own and (not words or len(" ".join(words)) < MIN_CHARS or len(words) > MAX_WORDS):
+                self.skipped += 1
+                return
+            self.brands[" ".join(words)].append(entry)
+            self.first_words.add(words[0])
+            self.max_words = max(self.max_words, len(words))
+        elif kind == "domain":
+            domain = normalize_domain(term)
+            if "." not in domain:
+                self.skipped += 1
+                return
+            self.domains[domain].append(entry)
+        elif kind == "email":
+            self.emails[term.strip().lower()].append(entry)
+        elif kind == "ip_range":
+            try:
+                net = ipaddress.IPv4Network(term.strip(), strict=False)
+            except ValueError:
+                self.skipped += 1
+                return
+            self.networks[(net.prefixlen, int(net.network_address) >> (32 - net.prefixlen))].append(entry)
+        else:
+            self.skipped += 1
+
+    def __len__(self):
+        return len(self.orgs)
+
+    # ---------------- MATCH ----------------
+
+    def match(self, text: str) -> Dict[int, List[str]]:
+        """org_id -> watch terms found in text (each term once)."""
+        hits: Dict[int, List[str]] = defaultdict(list)
+        if not text:
+            return {}
+
+        def found(entries):
+            for org_id, term in entries:
+                if term not in hits[org_id]:
+                    hits[org_id].append(term)
+
+        lower = text.lower()
+
+        # brands: only positions whose word starts some brand term are extended
+        words = _WORD_RE.findall(lower)
+        starts = self.first_words.intersection(words)
+        if starts:
+            for i, word in enumerate(words):
+                if word not in starts:
+                    continue
+                for n in range(1, min(self.max_words, len(words) - i) + 1):
+                    entries = self.brands.get(" ".join(words[i:i + n]))
+                    if entries:
+                        found(entries)
+
+        if self.domains and "." in lower:
+            for host in set(_HOST_RE.findall(lower)):
+                parts = host.split(".")
+                for i in range(len(parts) - 1):
+                    entries = self.domains.get(".".join(parts[i:]))
+                    if entries:
+                        found(entries)
+
+        if self.emails and "@" in lower:
+            for address in set(RE_EMAIL.findall(lower)):
+                entries = self.emails.get(address)
+                if entries:
+                    found(entries)
+
+        for org_id, name in self.plain_names.items():
+            if name in lower:
+                found([(org_id, self.orgs[org_id])])
+
+        if self.networks and "." in lower:
+            for ip in set(_IPV4_RE.findall(lower)):
+                try:
+                    value = int(ipaddress.IPv4Address(ip))
+                except ValueError:
+                    continue
+                for plen in self.prefix_lengths:
+                    entries = self.networks.get((plen, value >> (32 - plen)))
+                    if entries:
+                        found(entries)
+
+        return {org_id: terms for org_id, terms in hits.items() if terms}
+
+    def concerns(self, org_name: str, text: str) -> Tuple[bool, List[int]]:
+        """
+        One match of text: (does it match a watch term of org_name, ids of the
+        other orgs it matches). Unknown orgs get the plain substring check.
+        """
+        hits = self.match(text)
+        org_id = self.org_ids.get((org_name or "").lower())
+        if org_id is None:
+            mentioned = (org_name or "").lower() in (text or "").lower()
+        else:
+            mentioned = org_id in hits
+        return mentioned, sorted(o for o in hits if o != org_id)
+
+    def mentions(self, org_name: str, text: str) -> bool:
+        """Does text match any watch term of org_name (unknown orgs: plain substring check)?"""
+        return self.concerns(org_name, text)[0]
+
+
+# ---------------- DB ----------------
+
+def load_index(conn) -> WatchlistIndex:
+    orgs = dict(conn.execute(select(Org.id, Org.name)).all())
+    terms = conn.execute(select(OrgWatchTerm.org_id, OrgWatchTerm.kind, OrgWatchTerm.term)).all()
+    return WatchlistIndex(orgs, terms)
+
+
+def fingerprint(conn) -> tuple:
+    orgs = conn.execute(select(func.count(Org.id), func.max(Org.id))).one()
+    terms = conn.execute(
+        select(func.count(OrgWatchTerm.id), func.max(OrgWatchTerm.id), func.max(OrgWatchTerm.updated_at))
+    ).one()
+    return tuple(orgs) + tuple(terms)
+
+
+class Watchlist:
+    """Hot-reloading WatchlistIndex over the orgs / org_watch_terms tables."""
+
+    def __init__(self, engine, reload_seconds: float = RELOAD_SECONDS):
+        self.engine = engine
+        self.reload_seconds = reload_seconds
+        self._lock = threading.Lock()
+        self.reloads = 0
+        self._index, self._fingerprint = self._build()
+        self._checked = time.monotonic()
+
+    def _build(self):
+        with self.engine.connect() as conn:
+            fp = fingerprint(conn)
+            index = load_index(conn)
+        return index, fp
+
+    def reload(self):
+        index, fp = self._build()
+        self._index, self._fingerprint = index, fp
+        self.reloads += 1
+        print(f" Watchlist reloaded: {len(index)} orgs, {len(index.brands)} brands, {len(index.domains)} domains, "
+              f"{len(index.emails)} emails, {len(index.networks)} IP ranges")
+
+    def index(self) -> WatchlistIndex:
+        # one caller checks the fingerprint when due; the others keep using the current index
+        if time.monotonic() - self._checked >= self.reload_seconds and self._lock.acquire(blocking=False):
+            try:
+                self._checked = time.monotonic()
+                with self.engine.connect() as conn:
+                    changed = fingerprint(conn) != self._fingerprint
+                if changed:
+                    self.reload()
+            except Exception as e:
+                print(" Watchlist reload failed:", e)
+            finally:
+                self._lock.release()
+        return self._index
+
+    def match(self, text: str) -> Dict[int, List[str]]:
+        return self.index().match(text)
+
+    def mentions(self, org_name: str, text: str) -> bool:
+        return self.index().mentions(org_name, text)
+
+    def concerns(self, org_name: str, text: str) -> Tuple[bool, List[int]]:
+        return self.index().concerns(org_name, text)
+
+
+# ---------------- SHARED INSTANCE ----------------
+
+_watchlist: Optional[Watchlist] = None
+_watchlist_failed = False
+_watchlist_lock = threading.Lock()
+
+
+def get_watchlist() -> Optional[Watchlist]:
+    """Shared watchlist, or None when WATCHLIST is off or the tables are unavailable."""
+    global _watchlist, _watchlist_failed
+    if not WATCHLIST or _watchlist_failed:
+        return None
+    with _watchlist_lock:
+        if _watchlist is None:
+            try:
+                # imported here: api.db needs DATABASE_URL, detection code runs without it too
+                from api.db import engine
+                _watchlist = Watchlist(engine)
+            except Exception as e:
+                print(" Watchlist unavailable:", e)
+                _watchlist_failed = True
+                return None
+        return _watchlist
+
+
+def reload_watchlist():
+    if _watchlist is not None:
+        _watchlist.reload()
+
+
+def org_mentioned(org_name: str, text: str) -> bool:
+    """Relevance check for a page crawled for org_name (watchlist, else substring)."""
+    watchlist = get_watchlist()
+    if watchlist is None:
+        return org_name.lower() in (text or "").lower()
+    return watchlist.mentions(org_name, text)
+
+
+def page_orgs(text: str, org_name: Optional[str]) -> Tuple[bool, List[int]]:
+    """
+    Who a page crawled for org_name concerns, from one watchlist match:
+    (is org_name relevant, ids of the other matching orgs). No org_name: always
+    relevant. The other orgs get the page's threats with WATCHLIST_FANOUT,
+    whether or not org_name is relevant.
+    """
+    watchlist = get_watchlist()
+    if watchlist is None:
+        return not org_name or org_name.lower() in (text or "").lower(), []
+    mentioned, others = watchlist.concerns(org_name, text)
+    return not org_name or mentioned, others if FANOUT else []
+
+
+def recipient_org_ids(org_id: int, relevance: Tuple[bool, List[int]]) -> List[int]:
+    """Orgs that get a page's threats: org_id if the page is relevant to it, plus the fan-out orgs."""
+    mentioned, others = relevance
+    return ([org_id] if mentioned else []) + [o for o in others if o != org_id]
+
+
+# ---------------- CLI ----------------
+
+def _cli(argv):
+    from api.db import engine
+
+    cmd = argv[0] if argv else "list"
+    if cmd in ("add", "remove"):
+        org_name, kind, term = argv[1], argv[2], " ".join(argv[3:])
+        if kind not in KINDS:
+            sys.exit(f"kind must be one of {', '.join(KINDS)}")
+        with engine.begin() as conn:
+            org_id = conn.execute(select(Org.id).where(Org.name == org_name)).scalar()
+            if org_id is None:
+                sys.exit(f"unknown org {org_name!r}")
+            if cmd == "add":
+                conn.execute(insert(OrgWatchTerm).values(org_id=org_id, kind=kind, term=term))
+            else:
+                conn.execute(delete(OrgWatchTerm).where(
+                    OrgWatchTerm.org_id == org_id, OrgWatchTerm.kind == kind, OrgWatchTerm.term == term
+                ))
+        print(f"{cmd}: {org_name} {kind} {term}")
+    elif cmd == "list":
+        stmt = select(Org.name, OrgWatchTerm.kind, OrgWatchTerm.term).join(Org, Org.id == OrgWatchTerm.org_id)
+        if len(argv) > 1:
+            stmt = stmt.where(Org.name == argv[1])
+        with engine.connect() as conn:
+            for name, kind, term in conn.execute(stmt.order_by(Org.name, OrgWatchTerm.kind, OrgWatchTerm.term)):
+                print(f"{name:30s} {kind:10s} {term}")
+    elif cmd == "match":
+        with open(argv[1], errors="replace") as f:
+            text = f.read()
+        with engine.connect() as conn:
+            index = load_index(conn)
+        for org_id, terms in sorted(index.match(text).items()):
+            print(f"{index.orgs[org_id]:30s} {', '.join(terms)}")
+    else:
+        sys.exit(__doc__)
+
+
+if __name__ == "__main__":
+    _cli(sys.argv[1:])
@@ -0,0 +1,62 @@
+import os
+import sys
+import numpy as np
+import torch
+import onnxruntime as ort
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+MODEL_SRC = os.getenv("DARKBERT_MODEL_PATH", "models/darkbert-final")
+ONNX_DST = os.getenv("DARKBERT_ONNX_PATH", "models/darkbert-onnx/model.onnx")
+
+# usage: python -m tools.08_export_onnx [--int8]
+#   --int8  also write an int8 dynamically-quantized copy next to the fp32 export
+
+tokenizer = AutoTokenizer.from_pretrained(MODEL_SRC)
+model = AutoModelForSequenceClassification.from_pretrained(MODEL_SRC)
+model.eval()
+# plain (non-SDPA) attention exports to a simpler, portable graph
+model.config._attn_implementation = "eager"
+
+os.makedirs(os.path.dirname(ONNX_DST), exist_ok=True)
+
+sample = tokenizer(
+    ["sample text for export", "a second, somewhat longer sample text for the export trace"],
+    padding=True,
+    truncation=True,
+    max_length=512,
+    return_tensors="pt",
+)
+
+torch.onnx.export(
+    model,
+    (sample["input_ids"], sample["attention_mask"]),
+    ONNX_DST,
+    input_names=["input_ids", "attention_mask"],
+    output_names=["logits"],
+    dynamic_axes={
+        "input_ids": {0: "batch", 1: "sequence"},
+        "attention_mask": {0: "batch", 1: "sequence"},
+        "logits": {0: "batch"},
+    },
+    opset_version=17,
+    dynamo=False,
+)
+print("ONNX export saved to", ONNX_DST)
+
+# ---- sanity check: ONNX Runtime logits vs. PyTorch ----
+with torch.no_grad():
+    ref = model(**sample).logits.numpy()
+
+session = ort.InferenceSession(ONNX_DST, providers=["CPUExecutionProvider"])
+out = session.run(None, {
+    "input_ids": sample["input_ids"].numpy(),
+    "attention_mask": sample["attention_mask"].numpy(),
+})[0]
+print("max |logit diff| vs PyTorch:", float(np.abs(ref - out).max()))
+
+if "--int8" in sys.argv:
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    int8_dst = ONNX_DST.replace(".onnx", ".int8.onnx")
+    quantize_dynamic(ONNX_DST, int8_dst, weight_type=QuantType.QInt8)
+    print("int8 ONNX model saved to", int8_dst)
@@ -0,0 +1,92 @@
+import os
+import sys
+import time
+import statistics
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import accuracy_score
+
+from services.ml.backends import load_backend, OnnxBackend, ONNX_MODEL_PATH
+from services.ml.darkbert_infer import MODEL_PATH
+
+# usage: python -m tools.09_eval_backends [dataset_csv] [batch_size]
+#
+# Accuracy parity of every available inference backend on the same held-out
+# split as tools/05_eval_darkbert.py, plus single-item latency and batched
+# throughput per backend (CPU).
+
+DATASET = sys.argv[1] if len(sys.argv) > 1 else "data/bert_dataset.csv"
+BATCH_SIZE = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+LATENCY_SAMPLES = 30
+
+df = pd.read_csv(DATASET)
+
+# same split as 05_eval_darkbert.py
+X_train, X_test, y_train, y_test = train_test_split(
+    df["clean_text"],
+    df["label_id"],
+    test_size=0.2,
+    random_state=42,
+    stratify=df["label_id"]
+)
+texts = X_test.astype(str).tolist()
+
+
+def run(backend, texts):
+    enc = backend.tokenizer(texts, truncation=True, max_length=512)
+    features = [{k: enc[k][j] for k in enc.keys()} for j in range(len(texts))]
+    order = sorted(range(len(texts)), key=lambda j: len(features[j]["input_ids"]))
+
+    preds = [None] * len(texts)
+    for start in range(0, len(order), BATCH_SIZE):
+        part = order[start:start + BATCH_SIZE]
+        for j, (label, _) in zip(part, backend.classify([features[j] for j in part])):
+            preds[j] = label
+    return preds, features
+
+
+candidates = [
+    ("torch", lambda: load_backend("torch", MODEL_PATH)),
+    ("torch-int8", lambda: load_backend("torch-int8", MODEL_PATH)),
+    ("onnx", lambda: OnnxBackend(MODEL_PATH, ONNX_MODEL_PATH)),
+    ("onnx-int8", lambda: OnnxBackend(MODEL_PATH, ONNX_MODEL_PATH.replace(".onnx", ".int8.onnx"))),
+]
+
+reference = None
+rows = []
+
+for name, factory in candidates:
+    try:
+        backend = factory()
+    except Exception as e:
+        print(f"[skip] {name}: {e}")
+        continue
+
+    # warm-up pass so one-off allocations do not count
+    run(backend, texts[:2])
+
+    t = time.perf_counter()
+    preds, features = run(backend, texts)
+    elapsed = time.perf_counter() - t
+
+    latencies = []
+    for f in features[:LATENCY_SAMPLES]:
+        t1 = time.perf_counter()
+        backend.classify([f])
+        latencies.append((time.perf_counter() - t1) * 1000)
+
+    if reference is None:
+        reference = preds
+    agreement = sum(a == b for a, b in zip(preds, reference)) / len(preds)
+
+    rows.append({
+        "backend": name,
+        "accuracy": accuracy_score(y_test, preds),
+        "agree_with_torch": agreement,
+        "items_per_sec": len(texts) / elapsed,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": sorted(latencies)[int(0.95 * (len(latencies) - 1))],
+    })
+
+print(f"\ntest items: {len(texts)}  batch_size: {BATCH_SIZE}  threads: {os.cpu_count()}")
+print(pd.DataFrame(rows).to_string(index=False, float_format=lambda v: f"{v:.3f}"))
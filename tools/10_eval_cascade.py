@@ -0,0 +1,76 @@
+import sys
+import time
+import pandas as pd
+from sklearn.metrics import accuracy_score
+
+from services.ml.baseline_infer import predict_baseline_batch, LABELS
+from services.preprocessor import hybrid_detector as hd
+
+# usage: python -m tools.10_eval_cascade [labeled_csv]
+#
+# Compares the TF-IDF → DarkBERT cascade with DarkBERT-only scoring on the
+# labeled dataset: escalation rate, end-to-end pages/sec, agreement with
+# DarkBERT-only labels and accuracy against the dataset labels. Also sweeps
+# the CASCADE_BENIGN_ACCEPT band using the cached predictions.
+#
+# Note: baseline_lr.pkl was trained on this dataset (80% split), so baseline
+# accuracy here is optimistic; agreement with DarkBERT is the number to watch.
+
+DATASET = sys.argv[1] if len(sys.argv) > 1 else "data/labeled_pages.csv"
+
+df = pd.read_csv(DATASET).dropna(subset=["clean_text"])
+texts = df["clean_text"].astype(str).tolist()
+truth = [LABELS.index(l) if l in LABELS else -1 for l in df["label"]]
+rule_hits = [hd.detect_rules(t) for t in texts]
+
+print(f"pages: {len(texts)}")
+
+# ---- DarkBERT only ----
+hd.ml_predict_pages(texts[:2])  # model load / warm-up outside the timing
+t = time.perf_counter()
+bert = hd.ml_predict_pages(texts)
+bert_s = time.perf_counter() - t
+
+# ---- baseline only (for the sweep) ----
+t = time.perf_counter()
+base = predict_baseline_batch(texts)
+base_s = time.perf_counter() - t
+
+# ---- cascade as configured ----
+t = time.perf_counter()
+cascade = hd.classify_pages(texts, rule_hits)
+cascade_s = time.perf_counter() - t
+
+bert_labels = [l for l, _ in bert]
+cascade_labels = [l for l, _, _ in cascade]
+escalated = sum(1 for _, _, src in cascade if src == "darkbert")
+
+print(f"\nDarkBERT only : {len(texts) / bert_s:8.2f} pages/sec  accuracy={accuracy_score(truth, bert_labels):.3f}")
+print(
+    f"cascade       : {len(texts) / cascade_s:8.2f} pages/sec  accuracy={accuracy_score(truth, cascade_labels):.3f}  "
+    f"escalation={escalated / len(texts):.1%}  "
+    f"agreement with DarkBERT={accuracy_score(bert_labels, cascade_labels):.3f}  "
+    f"(CASCADE_BENIGN_ACCEPT={hd.CASCADE_BENIGN_ACCEPT})"
+)
+print(f"baseline only : {len(texts) / base_s:8.2f} pages/sec")
+
+# ---- band sweep (no extra inference) ----
+bert_per_page = bert_s / len(texts)
+rows = []
+for accept in (0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9):
+    labels, n_esc = [], 0
+    for (bl, bc), (ml, _), hits in zip(base, bert, rule_hits):
+        esc = bool(hits) or bl != hd.BENIGN_LABEL or bc < accept
+        n_esc += esc
+        labels.append(ml if esc else bl)
+    est_s = base_s + n_esc * bert_per_page
+    rows.append({
+        "benign_accept": accept,
+        "escalation": n_esc / len(texts),
+        "agreement": accuracy_score(bert_labels, labels),
+        "accuracy": accuracy_score(truth, labels),
+        "est_pages_per_sec": len(texts) / est_s,
+    })
+
+print("\nband sweep:")
+print(pd.DataFrame(rows).to_string(index=False, float_format=lambda v: f"{v:.3f}"))
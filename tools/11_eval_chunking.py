@@ -0,0 +1,133 @@
+import sys
+import time
+import pandas as pd
+from sklearn.metrics import accuracy_score
+
+from services.ml.baseline_infer import LABELS
+from services.ml import darkbert_infer as di
+from services.preprocessor import hybrid_detector as hd
+
+# usage: python -m tools.11_eval_chunking [labeled_csv] [stride]
+#
+# DarkBERT page scoring with the previous chunking (512-word chunks, each cut
+# to 1500 chars / 512 tokens) vs token windows that fill the model's max
+# length (non-overlapping, and overlapping by `stride` tokens), then early
+# exit at several EARLY_EXIT_CONF thresholds. Per setting: chunks scored per
+# page, share of the page's tokens the model actually saw, pages/sec, threat
+# recall (pages labeled non-benign that get a non-benign label), accuracy
+# against the dataset labels and agreement with the previous behaviour.
+# Early exit is simulated from the cached per-window predictions; with
+# EARLY_EXIT_CONF set, that threshold is also run for real (windows scored in
+# waves) to time it and check it agrees with the simulation.
+
+DATASET = sys.argv[1] if len(sys.argv) > 1 else "data/labeled_pages.csv"
+STRIDE = int(sys.argv[2]) if len(sys.argv) > 2 else 128
+THRESHOLDS = (0.99, 0.95, 0.9, 0.8, 0.7)
+
+df = pd.read_csv(DATASET).dropna(subset=["clean_text"])
+texts = df["clean_text"].astype(str).tolist()
+truth = [LABELS.index(l) if l in LABELS else -1 for l in df["label"]]
+threat_pages = [i for i, t in enumerate(truth) if t not in (-1, hd.BENIGN_LABEL)]
+
+print(f"pages: {len(texts)}  threat pages: {len(threat_pages)}")
+
+tokenizer = di.get_backend().tokenizer
+page_tokens = [len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]]
+specials = tokenizer.num_special_tokens_to_add()
+di.predict_batch(texts[:2])  # warm-up outside the timing
+
+
+# ---- per-chunk predictions for each chunking ----
+def words_chunks():
+    chunks, owners = [], []
+    for i, page in enumerate(texts):
+        for chunk in hd.chunk_text(page):
+            chunks.append(chunk)
+            owners.append(i)
+    t = time.perf_counter()
+    preds = di.predict_batch(chunks)
+    seconds = time.perf_counter() - t
+
+    per_page = [[] for _ in texts]
+    for owner, pred in zip(owners, preds):
+        per_page[owner].append(pred)
+    # tokens the model saw: each chunk truncated to MAX_CHARS / MAX_LENGTH
+    seen = [0] * len(texts)
+    enc = tokenizer([c[:di.MAX_CHARS] for c in chunks], truncation=True, max_length=di.MAX_LENGTH,
+                    add_special_tokens=True)
+    for owner, ids, chunk in zip(owners, enc["input_ids"], chunks):
+        if len(chunk) >= di.MIN_CHARS:
+            seen[owner] += len(ids) - specials
+    return per_page, seconds, seen
+
+
+def token_windows(stride):
+    t = time.perf_counter()
+    per_page = di.predict_windows(texts, stride=stride)
+    seconds = time.perf_counter() - t
+    return per_page, seconds, [min(n, len(w) * (di.MAX_LENGTH - specials)) for n, w in zip(page_tokens, per_page)]
+
+
+def early_exit(per_page, threshold):
+    """Window predictions a page keeps with early exit at `threshold`."""
+    out = []
+    for preds in per_page:
+        kept = []
+        for label, conf in preds:
+            kept.append((label, conf))
+            if label != hd.BENIGN_LABEL and conf >= threshold:
+                break
+        out.append(kept)
+    return out
+
+
+old_per_page, old_s, old_seen = words_chunks()
+old_labels = [hd.best_prediction(p)[0] for p in old_per_page]
+
+rows = []
+
+
+def report(name, per_page, seconds, seen=None, n_chunks=None):
+    labels = [hd.best_prediction(p)[0] for p in per_page]
+    n_chunks = sum(len(p) for p in per_page) if n_chunks is None else n_chunks
+    detected = sum(1 for i in threat_pages if labels[i] not in (None, hd.BENIGN_LABEL))
+    rows.append({
+        "setting": name,
+        "chunks_per_page": n_chunks / len(texts),
+        "tokens_seen": sum(seen) / max(1, sum(page_tokens)) if seen else float("nan"),
+        "pages_per_sec": len(texts) / seconds,
+        "threat_recall": detected / max(1, len(threat_pages)),
+        "accuracy": accuracy_score(truth, [-2 if l is None else l for l in labels]),
+        "agreement_prev": accuracy_score(
+            [-2 if l is None else l for l in old_labels], [-2 if l is None else l for l in labels]
+        ),
+    })
+    return labels
+
+
+report("words 512 (previous)", old_per_page, old_s, old_seen)
+
+for stride in (0, STRIDE):
+    per_page, seconds, seen = token_windows(stride)
+    report(f"tokens stride={stride}", per_page, seconds, seen)
+
+    # early exit: time of the scored windows, prorated from the full run
+    per_window_s = seconds / max(1, sum(len(p) for p in per_page))
+    for threshold in THRESHOLDS:
+        kept = early_exit(per_page, threshold)
+        report(f"  early exit >= {threshold}", kept, per_window_s * max(1, sum(len(p) for p in kept)))
+
+    if hd.EARLY_EXIT_CONF:
+        scored = di.window_stats["scored"]
+        t = time.perf_counter()
+        live = di.predict_windows(texts, stride=stride, exit_conf=hd.EARLY_EXIT_CONF, benign_label=hd.BENIGN_LABEL)
+        live_s = time.perf_counter() - t
+        simulated = early_exit(per_page, hd.EARLY_EXIT_CONF)
+        same = sum(hd.best_prediction(a)[0] == hd.best_prediction(b)[0] for a, b in zip(live, simulated))
+        # counts every window of a wave, including those past the exit point
+        report(f"  early exit >= {hd.EARLY_EXIT_CONF} (live)", live, live_s,
+               n_chunks=di.window_stats["scored"] - scored)
+        print(f"stride={stride}: live early exit agrees with simulation on {same}/{len(texts)} pages")
+
+print("\nchunking:")
+print(pd.DataFrame(rows).to_string(index=False, float_format=lambda v: f"{v:.3f}"))
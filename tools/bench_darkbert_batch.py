@@ -0,0 +1,78 @@
+"""
+Benchmark DarkBERT page scoring on CPU: the old per-chunk loop (one
+batch-size-1 forward pass per 512-word chunk) vs. predict_batch.
+
+Uses clean_text from data/labeled_pages.csv when present, otherwise
+synthetic pages. Also checks both paths agree on every page.
+
+usage: python -m tools.bench_darkbert_batch [n_pages] [batch_size]
+"""
+import os
+import sys
+import time
+import random
+
+import torch
+
+from services.ml.darkbert_infer import predict_text, predict_batch
+from services.preprocessor.hybrid_detector import chunk_text, best_prediction, ml_predict_pages
+
+VOCAB = (
+    "leak database dump credentials password access for sale ransomware breach "
+    "forum thread reply vendor escrow market btc wallet login admin panel shell "
+    "the a of and to in is it for on with as by this that from"
+).split()
+
+
+def load_pages(n):
+    path = "data/labeled_pages.csv"
+    if os.path.exists(path):
+        import pandas as pd
+
+        texts = pd.read_csv(path)["clean_text"].dropna().astype(str).tolist()
+        return (texts * (n // max(1, len(texts)) + 1))[:n]
+
+    rng = random.Random(0)
+    return [
+        " ".join(rng.choice(VOCAB) for _ in range(rng.randint(200, 3000)))
+        for _ in range(n)
+    ]
+
+
+def per_chunk_loop(page):
+    return best_prediction(predict_text(chunk) for chunk in chunk_text(page))
+
+
+def main():
+    n_pages = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    torch.set_num_threads(os.cpu_count() or 1)
+    pages = load_pages(n_pages)
+    n_chunks = sum(1 for p in pages for _ in chunk_text(p))
+    print(f"pages={len(pages)} chunks={n_chunks} threads={torch.get_num_threads()}")
+
+    t = time.perf_counter()
+    loop = [per_chunk_loop(p) for p in pages]
+    loop_s = time.perf_counter() - t
+
+    t = time.perf_counter()
+    if batch_size:
+        # per-page batching with an explicit mini-batch size
+        batched = [best_prediction(predict_batch(list(chunk_text(p)), batch_size)) for p in pages]
+    else:
+        batched = ml_predict_pages(pages)
+    batch_s = time.perf_counter() - t
+
+    mismatches = sum(
+        1 for (l1, c1), (l2, c2) in zip(loop, batched)
+        if l1 != l2 or abs(c1 - c2) > 1e-3
+    )
+
+    print(f"per-chunk loop: {loop_s:.2f}s  {len(pages) / loop_s:.2f} pages/sec")
+    print(f"batched:        {batch_s:.2f}s  {len(pages) / batch_s:.2f} pages/sec")
+    print(f"speedup: {loop_s / batch_s:.2f}x  mismatching pages: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+import builtins
+import tempfile
+from contextlib import contextmanager
+
+# usage: python -m tools.bench_db_writes [database_url] [pages] [batch_size]
+#
+# Rows/sec of the legacy per-page persistence (save_page_to_db + analyze_page)
+# against BatchWriter on the same synthetic pages. Defaults to a throw-away
+# SQLite file; pass a Postgres URL to measure a real server (tables are
+# created if missing, rows are left behind).
+#
+# Detection is replaced by a constant verdict so only persistence is timed.
+
+DATABASE_URL = sys.argv[1] if len(sys.argv) > 1 else f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+PAGES = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+BATCH_SIZE = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+os.environ["DATABASE_URL"] = DATABASE_URL
+
+from api.db import engine  # noqa: E402
+from api.models import Base  # noqa: E402
+from services.crawler import crawler_db  # noqa: E402
+from services.crawler.batch_writer import BatchWriter  # noqa: E402
+from services.preprocessor import hybrid_detector  # noqa: E402
+
+Base.metadata.create_all(engine)
+
+
+def fake_evaluate_pages(clean_texts, org_names=None, relevance=None):
+    return [
+        {
+            "indicator_type": "hybrid",
+            "indicator": "leak",
+            "severity": "HIGH",
+            "evidence": t[:200],
+            "ml_label": 1,
+            "ml_confidence": 0.9,
+        }
+        for t in clean_texts
+    ]
+
+
+hybrid_detector.evaluate_pages = fake_evaluate_pages
+
+
+@contextmanager
+def quiet():
+    # both paths print per page; keep console I/O out of the timing
+    real = builtins.print
+    builtins.print = lambda *a, **k: None
+    try:
+        yield
+    finally:
+        builtins.print = real
+
+
+BODY = " ".join(["credentials database leak for sale forum post"] * 20)
+
+
+def page(i):
+    return f"<html><body><h1>Listing {i}</h1><p>{BODY} #{i}</p></body></html>"
+
+
+def bench_legacy(n):
+    t = time.perf_counter()
+    for i in range(n):
+        crawler_db.save_page_to_db(
+            org_name=f"bench-org-{i % 5}",
+            url=f"http://legacy{i}.onion/",
+            query_text="seed-run",
+            fetched_html=page(i),
+            status_code=200,
+        )
+    return time.perf_counter() - t
+
+
+def bench_batched(n):
+    writer = BatchWriter(engine, max_rows=BATCH_SIZE, max_seconds=0)
+    t = time.perf_counter()
+    for i in range(n):
+        writer.add_page(f"bench-org-{i % 5}", f"http://batched{i}.onion/", page(i), status_code=200, query_text="seed-run")
+    writer.flush()
+    elapsed = time.perf_counter() - t
+    return elapsed, writer.stats
+
+
+print(f"database: {engine.url.render_as_string(hide_password=True)}  pages: {PAGES}  batch_size: {BATCH_SIZE}")
+
+with quiet():
+    legacy_s = bench_legacy(PAGES)
+    batched_s, stats = bench_batched(PAGES)
+
+# every page yields one threat row
+rows = PAGES * 2
+print(f"legacy  : {legacy_s:7.2f}s  {rows / legacy_s:9.0f} rows/sec")
+print(f"batched : {batched_s:7.2f}s  {rows / batched_s:9.0f} rows/sec  "
+      f"({stats['flushes']} flushes, {stats['db_seconds']:.2f}s in DB)")
+print(f"speed-up: {legacy_s / batched_s:.1f}x")
@@ -0,0 +1,108 @@
+import sys
+import time
+import random
+from pathlib import Path
+
+from services.preprocessor.html_cleaner import clean_html_bs4, clean_html_lxml
+
+# usage: python -m tools.bench_html_cleaner [repeats]
+#
+# 1. output equivalence of the two clean_html engines (bs4 vs lxml) on the
+#    fixture pages, hand-written edge cases and randomly generated markup;
+#    exits 1 on any mismatch
+# 2. throughput (MB/sec of HTML) of both engines on the fixture pages and a
+#    synthetic large forum page
+
+REPEATS = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+ROOT = Path(__file__).resolve().parent.parent
+
+FIXTURES = {
+    "debug_ahmia_acme.html": ROOT / "debug_ahmia_acme.html",
+    "latest_page.html": ROOT / "services" / "crawler" / "latest_page.html",
+}
+
+EDGE_CASES = [
+    "", " ", "plain text, no tags",
+    "<p>a<b>b</b>c</p>", "a<!--x-->b", "<p>a</p><!-- <script>x</script> --><p>b</p>",
+    "<html><head><title>T</title><style>p{}</style></head><body>x<script>var a='<p>';</script>y</body></html>",
+    "<noscript><p>no</p>js</noscript>after", "<iframe>frame text</iframe>z", "<script>a</script><script>b",
+    "<p>caf&eacute; &amp; &#x41; &nbsp;x</p>", "<div>ﬁ ① ｆｕｌｌ</div>",
+    "<table><tr><td>1<td>2</table>", "<p>unclosed <b>bold <i>it</p> tail",
+    "<![CDATA[cdata]]> txt", "<?xml version='1.0'?><html><body>x</body></html>",
+    "<!DOCTYPE html><html><body>d</body></html>", "<textarea><b>raw</b></textarea>",
+    "<pre>  a\n\n b </pre>", "<svg><text>svg</text><style>x</style></svg>", "<template><p>tpl</p></template>",
+    "<br/>a<br>b<hr>c", "<<<>>> &lt;tag&gt;", "<body><p>one</p>\r\n<p>two</p></body>",
+    "<select><option>o1<option>o2</select>", "<title>a</title><title>b</title>",
+]
+
+FRAGMENTS = [
+    "<p>", "</p>", "<div class='post'>", "</div>", "<b>", "</b>", "<br>", "<a href='/x'>", "</a>",
+    "<script>var s = '<b>'; </script>", "<style>.x{color:red}</style>", "<noscript>enable js</noscript>",
+    "<!-- comment -->", "&amp;", "&nbsp;", "&#8217;", "\n", "  ", "<td>", "<tr>", "<table>", "</table>",
+    "<iframe src='x'>", "</iframe>", "<li>", "<ul>", "</ul>", "<h2>", "</h2>", "<template>", "</template>",
+]
+WORDS = "acme database dump leak credentials password café ｆｕｌｌ ﬁle 2024 user@example.com".split()
+
+
+def random_doc(rng: random.Random, n: int) -> str:
+    out = []
+    for _ in range(n):
+        out.append(rng.choice(FRAGMENTS) if rng.random() < 0.4 else rng.choice(WORDS) + rng.choice(("", " ")))
+    return "".join(out)
+
+
+def forum_page(posts: int = 400) -> str:
+    rng = random.Random(3)
+    head = "<html><head><title>Forum</title><style>" + ".c{margin:0}" * 200 + "</style>" \
+        + "<script>" + "var x = 1;" * 500 + "</script></head><body><div id='wrap'>"
+    body = []
+    for i in range(posts):
+        words = " ".join(rng.choice(WORDS) for _ in range(60))
+        body.append(
+            f"<div class='post' id='p{i}'><div class='meta'><a href='/u/{i}'>user{i}</a> "
+            f"<span>2024-01-{i % 28 + 1:02d}</span></div><div class='body'><p>{words}</p>"
+            f"<blockquote>quoted &amp; reposted {words[:80]}</blockquote></div>"
+            f"<script>track({i});</script><!-- post {i} --></div>"
+        )
+    return head + "".join(body) + "</div></body></html>"
+
+
+def check_equivalence() -> int:
+    docs = [(name, path.read_text(errors="replace")) for name, path in FIXTURES.items() if path.exists()]
+    docs += [(f"edge-{i}", doc) for i, doc in enumerate(EDGE_CASES)]
+    rng = random.Random(11)
+    docs += [(f"random-{i}", random_doc(rng, rng.randrange(1, 300))) for i in range(1000)]
+    docs.append(("forum-page", forum_page()))
+
+    mismatches = 0
+    for name, doc in docs:
+        a, b = clean_html_bs4(doc), clean_html_lxml(doc)
+        if a != b:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"  MISMATCH {name}: {doc[:120]!r}\n    bs4 : {a[:120]!r}\n    lxml: {b[:120]!r}")
+    print(f"equivalence: {len(docs) - mismatches}/{len(docs)} documents identical")
+    return mismatches
+
+
+def throughput(fn, html: str) -> float:
+    size_mb = len(html.encode("utf-8")) / 1e6
+    fn(html)  # warm-up
+    t = time.perf_counter()
+    for _ in range(REPEATS):
+        fn(html)
+    return size_mb * REPEATS / (time.perf_counter() - t)
+
+
+if __name__ == "__main__":
+    failed = check_equivalence()
+
+    pages = {name: path.read_text(errors="replace") for name, path in FIXTURES.items() if path.exists()}
+    pages["forum-page (synthetic)"] = forum_page()
+    print(f"\n{'page':28s} {'size':>9s} {'bs4 MB/s':>9s} {'lxml MB/s':>10s} {'speed-up':>9s}")
+    for name, html in pages.items():
+        bs4_rate = throughput(clean_html_bs4, html)
+        lxml_rate = throughput(clean_html_lxml, html)
+        print(f"{name:28s} {len(html) / 1024:8.1f}K {bs4_rate:9.2f} {lxml_rate:10.2f} {lxml_rate / bs4_rate:8.1f}x")
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,200 @@
+import re
+import sys
+import time
+import random
+from pathlib import Path
+
+from services.preprocessor.detectors import KEYWORDS, detect_indicators, keyword_hits, scan
+from services.preprocessor.html_cleaner import clean_html
+
+# usage: python -m tools.bench_indicators [repeats]
+#
+# 1. regression corpus: the single-pass scanner (detectors.scan /
+#    detect_indicators / keyword_hits) must report exactly what the previous
+#    one-regex-per-type detect_indicators and hybrid_detector.detect_rules did,
+#    on hand-written edge cases, the fixture pages and randomly generated
+#    text dense with IOC-like near misses; every reported offset must point
+#    at its value. Exits 1 on any mismatch. (bech32 BTC addresses, which the
+#    old detector never matched, are reported by extract_iocs only, so
+#    detect_indicators must still leave them out.)
+# 2. throughput (MB/sec of text), previous detectors vs scan(), on a ~1 MB
+#    leak-forum-like text, plain prose, and a long digit run that made the
+#    old credit-card pattern backtrack
+
+REPEATS = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+ROOT = Path(__file__).resolve().parent.parent
+
+FIXTURES = [
+    ROOT / "debug_ahmia_acme.html",
+    ROOT / "services" / "crawler" / "latest_page.html",
+]
+
+# ---------------- REFERENCE (previous implementation, verbatim) ----------------
+
+OLD_EMAIL_PASS = re.compile(r"\b([A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}:[^\s:]{6,})\b")
+OLD_EMAIL = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
+OLD_BTC = re.compile(r"\b([13][a-km-zA-HJ-NP-Z1-9]{25,34})\b")
+OLD_ETH = re.compile(r"\b0x[a-fA-F0-9]{40}\b")
+OLD_CREDIT_CARD = re.compile(r"\b(?:\d[ -]*?){13,16}\b")
+OLD_SQLI = re.compile(r"(union select|drop table|--\s|;--|or 1=1)", re.I)
+
+
+def old_detect_indicators(text):
+    if not text:
+        return {}
+    found = {}
+    creds = OLD_EMAIL_PASS.findall(text)
+    if creds:
+        found["credential-leak"] = creds
+    emails = list(set(OLD_EMAIL.findall(text)))
+    if emails:
+        found["email"] = emails
+    btcs = OLD_BTC.findall(text)
+    if btcs:
+        found["btc-address"] = btcs
+    eths = OLD_ETH.findall(text)
+    if eths:
+        found["eth-address"] = eths
+    cards = OLD_CREDIT_CARD.findall(text)
+    if cards:
+        found["credit-card-like"] = cards
+    sqli = OLD_SQLI.findall(text)
+    if sqli:
+        found["sqli-signature"] = sqli
+    return found
+
+
+def old_detect_rules(text):
+    lower = text.lower()
+    return [ind for ind in KEYWORDS if ind in lower]
+
+
+def old_all(text):
+    return old_detect_indicators(text), old_detect_rules(text)
+
+
+def new_all(text):
+    matches = scan(text)
+    return detect_indicators(text), [kw for kw in KEYWORDS if any(m.kind == "keyword" and m.value == kw for m in matches)]
+
+
+# ---------------- CORPUS ----------------
+
+EDGE_CASES = [
+    "", " ", "nothing to see here",
+    "alice@example.com", "alice@example.com:hunter22", "a@b.co:12345", "x alice@example.com:pass:word y",
+    "mail: Bob.Smith+tag@mail.example.org, again Bob.Smith+tag@mail.example.org",
+    "user@host", "@@@ @. a@.b.cc", "user@sub.example.c0m", "ünï@example.com",
+    "1BoatSLRHtKNngkdXEeobR76b53LETtpyT", "3J98t1WpEZ73CNmQviecrnyiWrnqRhWNLy", "x1BoatSLRHtKNngkdXEeobR76b53LETtpyT",
+    "1BoatSLRHtKNngkdXEeobR76b53LETtpyTO", "11111111111111111111111111111111111111",
+    "0x52908400098527886E0F7030069857D2E4169EE7", "0x52908400098527886E0F7030069857D2E4169EE70",
+    "pay to 0X52908400098527886E0F7030069857D2E4169EE7", "a0x52908400098527886E0F7030069857D2E4169EE7",
+    "4111 1111 1111 1111", "4111-1111-1111-1111", "4111111111111111", "41111111111111111111",
+    "4111 1111 1111 1111 2222", "card:4111111111111 ok", "1 2 3 4 5 6 7 8 9 0 1 2 3 4 5 6 7 8 9",
+    "4111 1111 1111 111x", "x4111111111111111", "4111111111111111_", "12--34  56-7 890 1 23 4 5",
+    "date 2024-01-05 12:30 id 1234567", "tel +1 (555) 123-4567 ext 89",
+    "' OR 1=1 --", "1; DROP TABLE users;--", "UNION SELECT * FROM t", "a--\tb", "a--", "--\n", ";-- x",
+    "Union Select and union  select", "or 1=12",
+    "LEAK Database DUMP", "dumpassword", "access for sale", "Access For  Sale", "ransomware breach",
+    "credentials", "KEY: Kelvin LEAK", "ſelect", "unıon select", "İstanbul leak", "pasſword",
+    "a@b.cc c@d.ee", "4111 1111 1111 1111 1111",
+    "pay bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4 or 1BoatSLRHtKNngkdXEeobR76b53LETtpyT",
+]
+
+IOC_BITS = [
+    "alice@example.com", "bob.smith@mail.example.org:S3cretPass!", "root@10.0.0.1", "x@y.z", "admin@acme.io:short",
+    "1BoatSLRHtKNngkdXEeobR76b53LETtpyT", "3J98t1WpEZ73CNmQviecrnyiWrnqRhWNLy", "1Boat", "3" * 30,
+    "0x52908400098527886E0F7030069857D2E4169EE7", "0x1234", "0xdeadbeef" * 5,
+    "4111 1111 1111 1111", "5500-0000-0000-0004", "378282246310005", "1234567890123456789", "2024-01-05",
+    "union select", "DROP TABLE", "--", ";--", "OR 1=1", "-- ", "1=1",
+    "leak", "Database", "DUMP", "credentials", "password", "access for sale", "Ransomware", "breach", "dumpassword",
+]
+WORDS = (
+    "the fresh combo list from a gaming site has emails and hashes for sale contact vendor "
+    "escrow price btc eth card cvv fullz shipping 100 200 2024 v2 id user pass login mirror"
+).split()
+SEPARATORS = [" ", " ", " ", "", "\n", ":", ",", "-", " - ", "\t", "@", "."]
+
+
+def random_text(rng: random.Random, n: int) -> str:
+    out = []
+    for _ in range(n):
+        if rng.random() < 0.25:
+            out.append(rng.choice(IOC_BITS))
+        elif rng.random() < 0.2:
+            out.append("".join(rng.choice("0123456789 -") for _ in range(rng.randrange(1, 30))))
+        else:
+            out.append(rng.choice(WORDS))
+        out.append(rng.choice(SEPARATORS))
+    return "".join(out)
+
+
+def leak_forum_text(size: int = 1_000_000) -> str:
+    rng = random.Random(5)
+    posts = []
+    total = 0
+    while total < size:
+        words = " ".join(rng.choice(WORDS) for _ in range(rng.randrange(40, 120)))
+        extra = " ".join(rng.choice(IOC_BITS) for _ in range(rng.randrange(0, 4)))
+        post = f"posted by user{rng.randrange(10**5)} on 2024-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d} {words} {extra}"
+        posts.append(post)
+        total += len(post) + 1
+    return " ".join(posts)
+
+
+def prose_text(size: int = 1_000_000) -> str:
+    rng = random.Random(9)
+    words = "welcome members please read the rules before posting new threads in this board".split()
+    return " ".join(rng.choice(words) for _ in range(size // 6))
+
+
+def check_corpus() -> int:
+    docs = [(f"edge-{i}", doc) for i, doc in enumerate(EDGE_CASES)]
+    docs += [(path.name, clean_html(path.read_text(errors="replace"))) for path in FIXTURES if path.exists()]
+    rng = random.Random(21)
+    docs += [(f"random-{i}", random_text(rng, rng.randrange(1, 400))) for i in range(3000)]
+    docs.append(("leak-forum", leak_forum_text(200_000)))
+
+    mismatches = 0
+    for name, doc in docs:
+        (old_found, old_rules), (new_found, new_rules) = old_all(doc), new_all(doc)
+        for found in (old_found, new_found):
+            if "email" in found:
+                found["email"] = sorted(found["email"])
+        bad_offsets = [
+            m for m in scan(doc)
+            if (doc[m.start:m.end].lower() if m.kind == "keyword" else doc[m.start:m.end]) != m.value
+        ]
+        if old_found != new_found or old_rules != new_rules or keyword_hits(doc) != old_rules or bad_offsets:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"  MISMATCH {name}: {doc[:120]!r}\n    old: {old_found} {old_rules}\n"
+                      f"    new: {new_found} {new_rules}\n    bad offsets: {bad_offsets[:3]}")
+    print(f"regression corpus: {len(docs) - mismatches}/{len(docs)} documents identical")
+    return mismatches
+
+
+def throughput(fn, text: str) -> float:
+    size_mb = len(text.encode("utf-8")) / 1e6
+    fn(text)  # warm-up
+    t = time.perf_counter()
+    for _ in range(REPEATS):
+        fn(text)
+    return size_mb * REPEATS / (time.perf_counter() - t)
+
+
+if __name__ == "__main__":
+    failed = check_corpus()
+
+    texts = {
+        "leak-forum (1 MB)": leak_forum_text(),
+        "prose (1 MB)": prose_text(),
+        "digit run (20 KB)": "1 2-" * 5000 + "x",
+    }
+    print(f"\n{'text':20s} {'old MB/s':>9s} {'scan MB/s':>10s} {'speed-up':>9s}")
+    for name, text in texts.items():
+        old_rate = throughput(old_all, text)
+        new_rate = throughput(scan, text)
+        print(f"{name:20s} {old_rate:9.2f} {new_rate:10.2f} {new_rate / old_rate:8.1f}x")
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,99 @@
+import sys
+import time
+import random
+import statistics
+
+import numpy as np
+
+from services.preprocessor import minhash
+
+# usage: python -m tools.bench_neardup [index_size] [base_docs]
+#
+# Synthetic corpus: base pages, mirrors of them with small edits (word
+# substitutions / insertions plus a mirror-specific header) and unrelated
+# pages. Reports signature cost, near-duplicate recall per edit rate and
+# false positives at NEARDUP_THRESHOLD, then lookup latency once the index
+# holds `index_size` pages (scale test; padding uses random signatures).
+
+INDEX_SIZE = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+BASE_DOCS = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+DOC_WORDS = 400
+EDIT_RATES = (0.01, 0.03, 0.05, 0.10, 0.20)
+
+rng = random.Random(42)
+VOCAB = [f"w{i}" for i in range(20_000)]
+
+
+def make_doc():
+    return [rng.choice(VOCAB) for _ in range(DOC_WORDS)]
+
+
+def mutate(words, rate):
+    out = list(words)
+    for _ in range(max(1, int(len(out) * rate))):
+        pos = rng.randrange(len(out))
+        if rng.random() < 0.5:
+            out[pos] = rng.choice(VOCAB)
+        else:
+            out.insert(pos, rng.choice(VOCAB))
+    # mirrors usually carry their own address / header
+    return [f"mirror{rng.randrange(10**6)}", "onion"] + out
+
+
+base = [make_doc() for _ in range(BASE_DOCS)]
+unrelated = [make_doc() for _ in range(BASE_DOCS)]
+
+# ---- signatures ----
+t = time.perf_counter()
+base_sigs = [minhash.signature(" ".join(d)) for d in base]
+sig_ms = (time.perf_counter() - t) * 1000 / len(base)
+print(
+    f"signature: {sig_ms:.3f} ms/page ({DOC_WORDS} words)  "
+    f"perms={minhash.NUM_PERM} bands={minhash.BANDS}x{minhash.ROWS} threshold={minhash.THRESHOLD}"
+)
+
+index = minhash.MinHashIndex()
+index.add_many(np.stack(base_sigs), list(range(len(base))))
+
+# ---- quality ----
+print("\nedit_rate  recall")
+for rate in EDIT_RATES:
+    hits = 0
+    for i, doc in enumerate(base):
+        hit = index.query(minhash.signature(" ".join(mutate(doc, rate))))
+        hits += hit is not None and hit[1] == i
+    print(f"  {rate:5.0%}    {hits / len(base):.3f}")
+
+false_hits = sum(index.query(minhash.signature(" ".join(d))) is not None for d in unrelated)
+print(f"false positive rate on unrelated pages: {false_hits / len(unrelated):.4f}")
+
+# ---- scale ----
+padding = INDEX_SIZE - len(index)
+t = time.perf_counter()
+np_rng = np.random.default_rng(7)
+for start in range(0, padding, 100_000):
+    n = min(100_000, padding - start)
+    index.add_many(np_rng.integers(0, 1 << 31, size=(n, minhash.NUM_PERM), dtype=np.uint32), [-1] * n)
+build_s = time.perf_counter() - t
+
+# incremental inserts (the pipeline's path) on top of the bulk-loaded index
+t = time.perf_counter()
+for _ in range(5_000):
+    index.add(np_rng.integers(0, 1 << 31, size=minhash.NUM_PERM, dtype=np.uint32), -1)
+insert_us = (time.perf_counter() - t) * 1e6 / 5_000
+
+queries = [minhash.signature(" ".join(mutate(d, 0.03))) for d in base[:200]]
+queries += [minhash.signature(" ".join(d)) for d in unrelated[:200]]
+latencies = []
+found = 0
+for q in queries:
+    t = time.perf_counter()
+    found += index.query(q) is not None
+    latencies.append((time.perf_counter() - t) * 1e6)
+
+print(f"\nindex size: {len(index):,} (bulk load {build_s:.1f}s, incremental insert {insert_us:.0f}us)")
+print(
+    f"lookup: p50={statistics.median(latencies):.1f}us "
+    f"p99={sorted(latencies)[int(0.99 * (len(latencies) - 1))]:.1f}us  "
+    f"(hits {found}/{len(queries)}, expected ~200)"
+)
@@ -0,0 +1,94 @@
+"""
+Benchmark the Playwright fallback path: one browser launch per URL (old
+behaviour) vs. the shared BrowserPool.
+
+Serves a small JS-rendered page with images/fonts from a local HTTP server
+(stand-in for an onion site, no Tor needed) and fetches it N times each way.
+
+usage: python -m tools.bench_playwright_fallback [n_fetches]
+"""
+import sys
+import time
+import threading
+import statistics
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from services.crawler.tor_playwright import fetch_via_tor_playwright_once
+from services.crawler.browser_pool import BrowserPool
+
+PAGE = b"""<!doctype html>
+<html><head><title>stand-in</title>
+<link rel="preload" href="/font.woff2" as="font" crossorigin>
+</head><body>
+<h1>Leak index</h1>
+<img src="/img/1.png"><img src="/img/2.png"><img src="/img/3.png">
+<div id="app">loading...</div>
+<script>
+setTimeout(function () {
+  document.getElementById("app").innerText = "dump: user@example.com:hunter22 ".repeat(50);
+}, 300);
+</script>
+</body></html>"""
+
+
+class StandIn(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/":
+            body, ctype = PAGE, "text/html"
+        else:
+            # slow "heavy" assets: these are what the pool blocks
+            time.sleep(0.5)
+            body, ctype = b"\0" * 50000, "application/octet-stream"
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def timed(fn, url, n):
+    samples = []
+    for _ in range(n):
+        t = time.perf_counter()
+        html = fn(url)
+        samples.append(time.perf_counter() - t)
+        assert "hunter22" in html, "page did not finish rendering"
+    return samples
+
+
+def report(name, samples):
+    print(
+        f"{name:<10} n={len(samples)} mean={statistics.mean(samples):.2f}s "
+        f"median={statistics.median(samples):.2f}s max={max(samples):.2f}s"
+    )
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    before = timed(lambda u: fetch_via_tor_playwright_once(u, proxy=None), url, n)
+
+    t = time.perf_counter()
+    pool = BrowserPool(proxy=None)
+    startup = time.perf_counter() - t
+    try:
+        after = timed(pool.fetch, url, n)
+    finally:
+        pool.close()
+        server.shutdown()
+
+    report("one-shot", before)
+    report("pool", after)
+    print(f"pool startup (paid once per process): {startup:.2f}s")
+    print(f"speedup (mean): {statistics.mean(before) / statistics.mean(after):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Startup benchmark: wall time and peak RSS of importing each entry point in a
+fresh interpreter, plus the one-off cost of loading DarkBERT on first use.
+
+usage: python -m tools.bench_startup [repeats]
+"""
+import sys
+import json
+import statistics
+import subprocess
+
+ENTRY_POINTS = [
+    "services.crawler.crawler_tor",
+    "services.crawler.runner",
+    "api.app",
+    "services.preprocessor.hybrid_detector",
+    "services.ml.darkbert_infer",
+]
+
+PROBE = """
+import json, resource, sys, time
+t = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t
+extra = None
+if {load_model}:
+    from services.ml import darkbert_infer
+    t = time.perf_counter()
+    darkbert_infer.warm_up()
+    extra = time.perf_counter() - t
+print(json.dumps({{
+    "import_s": elapsed,
+    "model_load_s": extra,
+    "torch_imported": "torch" in sys.modules,
+    "maxrss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}}))
+"""
+
+
+def probe(module, load_model=False):
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, load_model=load_model)],
+        capture_output=True,
+        text=True,
+    )
+    if out.returncode != 0:
+        return {"error": out.stderr.strip().splitlines()[-1] if out.stderr else "failed"}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    print(f"{'entry point':<40} {'import (s)':>10} {'RSS (MB)':>9}  torch loaded")
+    for module in ENTRY_POINTS:
+        runs = [probe(module) for _ in range(repeats)]
+        ok = [r for r in runs if "error" not in r]
+        if not ok:
+            print(f"{module:<40} ERROR: {runs[0]['error']}")
+            continue
+        print(
+            f"{module:<40} {statistics.median(r['import_s'] for r in ok):>10.3f} "
+            f"{statistics.median(r['maxrss_mb'] for r in ok):>9.0f}  {ok[0]['torch_imported']}"
+        )
+
+    first = probe("services.ml.darkbert_infer", load_model=True)
+    if "error" in first:
+        print("model warm-up: ERROR:", first["error"])
+    else:
+        print(f"model warm-up (first prediction): {first['model_load_s']:.2f}s, RSS {first['maxrss_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
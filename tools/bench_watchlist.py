@@ -0,0 +1,85 @@
+import sys
+import time
+import random
+
+from services.preprocessor.watchlist import WatchlistIndex
+
+# usage: python -m tools.bench_watchlist [repeats]
+#
+# Time to find the matching orgs of one page as the number of watched orgs
+# grows: the compiled WatchlistIndex vs the per-org substring loop
+# (org_name.lower() in clean_text.lower() for every org, names only).
+# Every org has a brand name, two domains, an executive email and an IP
+# range; the page mentions a handful of them. Also checks that both
+# approaches find the planted orgs.
+
+REPEATS = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+SIZES = (10, 100, 1000, 10000, 50000)
+SYLLABLES = "ka lo mi ne ru ta vo xi ze pa qu dro fen gal hor jin".split()
+
+
+def org_name(rng: random.Random) -> str:
+    return " ".join("".join(rng.choice(SYLLABLES) for _ in range(3)).capitalize() for _ in range(rng.randrange(1, 3)))
+
+
+def build(n: int, seed: int = 1):
+    rng = random.Random(seed)
+    orgs, terms = {}, []
+    names = set()
+    while len(orgs) < n:
+        name = org_name(rng)
+        if name.lower() in names:
+            continue
+        names.add(name.lower())
+        org_id = len(orgs) + 1
+        orgs[org_id] = name
+        slug = name.lower().replace(" ", "")
+        terms += [
+            (org_id, "domain", f"{slug}.com"),
+            (org_id, "domain", f"{slug}-corp.net"),
+            (org_id, "email", f"ceo@{slug}.com"),
+            (org_id, "ip_range", f"10.{org_id >> 8 & 255}.{org_id & 255}.0/24"),
+        ]
+    return orgs, terms
+
+
+def page(orgs, planted, rng: random.Random, words: int = 8000) -> str:
+    filler = "fresh dump of customer records for sale contact the vendor escrow only".split()
+    out = [rng.choice(filler) for _ in range(words)]
+    for org_id in planted:
+        slug = orgs[org_id].lower().replace(" ", "")
+        out.insert(rng.randrange(len(out)), rng.choice((orgs[org_id], f"vpn.{slug}.com", f"ceo@{slug}.com")))
+    out.insert(rng.randrange(len(out)), "10.0.3.77")  # inside org 3's range
+    return " ".join(out)
+
+
+def per_org_loop(orgs, text):
+    lower = text.lower()
+    return {org_id for org_id, name in orgs.items() if name.lower() in lower}
+
+
+def timed(fn, *args) -> float:
+    fn(*args)
+    t = time.perf_counter()
+    for _ in range(REPEATS):
+        fn(*args)
+    return (time.perf_counter() - t) / REPEATS * 1000
+
+
+if __name__ == "__main__":
+    rng = random.Random(7)
+    print(f"{'orgs':>7s} {'build s':>8s} {'index ms':>9s} {'per-org ms':>11s} {'found':>6s}")
+    for n in SIZES:
+        orgs, terms = build(n)
+        t = time.perf_counter()
+        index = WatchlistIndex(orgs, terms)
+        build_s = time.perf_counter() - t
+
+        planted = set(rng.sample(sorted(orgs), min(5, n))) | {3}
+        text = page(orgs, planted, rng)
+        hits = index.match(text)
+        ok = planted <= set(hits)
+        print(
+            f"{n:7d} {build_s:8.2f} {timed(index.match, text):9.2f} {timed(per_org_loop, orgs, text):11.2f} "
+            f"{'ok' if ok else 'MISSED':>6s}"
+        )
@@ -0,0 +1,205 @@
+"""
+Local fixture "dark web" for the focused crawler (services.crawler.focused).
+
+Generates a deterministic site graph over fake v3 onion hosts:
+- a directory host (the seed) linking to every other host with generic anchors
+- noise hosts (markets, blogs) that link heavily among themselves
+- forum hosts whose threads talk about dumps/leaks; a few threads name the
+  org next to leak indicators (the relevant pages, i.e. ground truth)
+- dead hosts that are linked but never answer
+- link spellings that must normalise to one URL (fragments, utm_* params,
+  upper-case hosts, explicit :80, relative paths) and clearnet links
+
+usage:
+    python -m tools.fixture_site [max_pages] [org]
+        in-process: focused ordering vs breadth-first on the same budget
+        (harvest rate = relevant pages / fetched pages), no network needed
+    python -m tools.fixture_site serve [port]
+        serves the same site over HTTP (virtual hosts by Host header); with
+        tools.socks_standin routing *.onion to 127.0.0.1 the real crawler
+        can run against it:
+        python -m tools.socks_standin 19050 &
+        TOR_SOCKS=socks5h://127.0.0.1:19050 python -m services.crawler.focused acme http://<directory>.onion:<port>/
+"""
+import sys
+import base64
+import random
+import hashlib
+from collections import Counter
+from urllib.parse import urlsplit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from services.crawler.links import normalize_url
+from services.crawler.scheduler import PolitenessScheduler
+from services.crawler.focused import FocusedCrawler
+
+NOISE_HOSTS = 25
+FORUM_HOSTS = 8
+DEAD_HOSTS = 3
+PAGES_PER_HOST = 20
+RELEVANT_PER_FORUM = 2
+
+FILLER = (
+    "welcome back members please read the rules before posting new threads vendors "
+    "must be verified shipping worldwide escrow available contact support for help"
+).split()
+
+
+def onion_host(name: str) -> str:
+    return base64.b32encode(hashlib.blake2b(name.encode(), digest_size=35).digest()).decode().lower() + ".onion"
+
+
+class FixtureSite:
+    def __init__(self, org: str = "acme", port: int = None, seed: int = 7):
+        self.org = org
+        self.port = port
+        rng = random.Random(seed)
+
+        self.directory = onion_host("directory")
+        noise = [onion_host(f"noise-{i}") for i in range(NOISE_HOSTS)]
+        forums = [onion_host(f"forum-{i}") for i in range(FORUM_HOSTS)]
+        self.dead = {onion_host(f"dead-{i}") for i in range(DEAD_HOSTS)}
+        self.pages = {}
+        self.relevant = set()
+
+        def text(n, extra=""):
+            return " ".join(rng.choice(FILLER) for _ in range(n)) + " " + extra
+
+        def page(title, body, links):
+            items = "".join(f'<li><a href="{href}">{anchor}</a></li>' for href, anchor in links)
+            return f"<html><head><title>{title}</title></head><body><h1>{title}</h1><p>{body}</p><ul>{items}</ul></body></html>"
+
+        # directory: generic anchors only, plus spellings that normalise to known URLs
+        others = noise + forums + sorted(self.dead)
+        rng.shuffle(others)
+        links = [(self.url(h, "/"), f"Link {i}") for i, h in enumerate(others)]
+        links += [
+            (self.url(noise[0], "/") + "#top", "Link again"),
+            (self.url(noise[1], "/") + "?utm_source=dir", "Featured"),
+            (self.url(noise[2].upper(), "/"), "MIRROR"),
+            ("https://example.com/", "Clearnet"),
+        ]
+        if not self.port:
+            links.append((f"http://{noise[3]}:80/", "Port 80"))
+        self.pages[(self.directory, "/")] = page("Onion directory", text(60), links)
+
+        for h in noise:
+            for p in range(PAGES_PER_HOST):
+                links = [(f"/p{rng.randrange(1, PAGES_PER_HOST)}", f"page {rng.randrange(100)}") for _ in range(5)]
+                links += [(self.url(rng.choice(noise), "/"), "partner shop") for _ in range(2)]
+                links.append(("../#reviews", "home"))
+                self.pages[(h, "/" if p == 0 else f"/p{p}")] = page(f"Shop {p}", text(120), links)
+
+        for fi, h in enumerate(forums):
+            relevant = set(rng.sample(range(1, PAGES_PER_HOST), RELEVANT_PER_FORUM))
+            threads = []
+            for p in range(1, PAGES_PER_HOST):
+                if p in relevant:
+                    body = text(80, f"fresh {org} database dump with employee credentials and password hashes leak")
+                    anchor = f"{org.upper()} database dump" if rng.random() < 0.5 else f"thread {p}"
+                    self.relevant.add(self.url(h, f"/thread/{p}"))
+                else:
+                    body = text(80, "old combo list dump from a gaming site, no fresh data")
+                    anchor = f"thread {p}"
+                threads.append((f"/thread/{p}", anchor))
+                self.pages[(h, f"/thread/{p}")] = page(f"Thread {p}", body, [("/", "back to index")])
+            self.pages[(h, "/")] = page(
+                f"Leak forum {fi}",
+                text(40, "breach and dump discussion board, databases for sale"),
+                threads + [(self.url(rng.choice(noise), "/"), "sponsor")],
+            )
+
+    def url(self, host: str, path: str) -> str:
+        return f"http://{host}{':%d' % self.port if self.port else ''}{path}"
+
+    def lookup(self, url: str):
+        parts = urlsplit(url)
+        return self.pages.get(((parts.hostname or "").lower(), parts.path or "/"))
+
+    def fetch(self, url: str):
+        """crawler_tor.fetch_page stand-in: (outcome, status_code, html)."""
+        html = self.lookup(url)
+        if html is None:
+            return False, None, None
+        return "new", 200, html
+
+
+# ---------------- EVAL ----------------
+
+def breadth_first(url, anchor, depth, parent_severity, terms):
+    # equal scores within a depth: the queue's insertion order makes this plain BFS
+    return 1.0 / (depth + 1)
+
+
+def run(site: FixtureSite, max_pages: int, score=None):
+    kwargs = {"score": score} if score else {}
+    crawler = FocusedCrawler(
+        site.org,
+        max_depth=3,
+        max_pages=max_pages,
+        per_host_max=PAGES_PER_HOST,
+        fetch=site.fetch,
+        save=lambda *a: True,
+        scheduler=PolitenessScheduler(default_rate=1e9, burst=10**6),
+        **kwargs,
+    )
+    crawler.add_seeds([site.url(site.directory, "/")])
+    stats = crawler.crawl()
+    found = [i for i, u in enumerate(crawler.visited) if normalize_url(u) in site.relevant]
+    return crawler, stats, found
+
+
+def evaluate(max_pages: int, org: str):
+    site = FixtureSite(org)
+    print(
+        f"fixture: {len(site.pages)} pages on {NOISE_HOSTS + FORUM_HOSTS + 1} hosts "
+        f"(+{DEAD_HOSTS} dead), {len(site.relevant)} relevant, budget {max_pages} fetches"
+    )
+    for name, score in (("focused", None), ("breadth-first", breadth_first)):
+        crawler, stats, found = run(site, max_pages, score)
+        hosts = Counter(urlsplit(u).hostname for u in crawler.visited)
+        last = found[-1] + 1 if found else 0
+        print(
+            f"  {name:13s} relevant {len(found):2d}/{len(site.relevant)}  "
+            f"harvest {len(found) / max(1, stats.get('fetched', 0)):.1%}  "
+            f"last relevant at fetch {last:3d}  failed {stats.get('failed', 0)}  "
+            f"discovered {stats.get('discovered', 0)}  already_seen {stats.get('already_seen', 0)}  "
+            f"max/host {max(hosts.values()) if hosts else 0}"
+        )
+
+
+# ---------------- SERVE ----------------
+
+def serve(port: int):
+    site = FixtureSite(port=port)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            host = (self.headers.get("Host") or "").split(":")[0]
+            html = site.lookup(f"http://{host}{self.path}")
+            if html is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = html.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    print(f"fixture site on 127.0.0.1:{port}, seed: {site.url(site.directory, '/')}")
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        serve(int(sys.argv[2]) if len(sys.argv) > 2 else 8088)
+    else:
+        evaluate(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 120,
+            sys.argv[2] if len(sys.argv) > 2 else "acme",
+        )
@@ -1,4 +1,3 @@
-import os
 import re
 import random
 import requests
@@ -6,6 +5,8 @@ from pathlib import Path
 from bs4 import BeautifulSoup
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from services.crawler.tor_session import DEFAULT_SOCKS
+
 # ---------- USER AGENTS ----------
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36",
@@ -35,8 +36,8 @@ SEARCH_ENGINE_ENDPOINTS = [
 # ---------- TOR PROXY ----------
 def get_tor_proxies():
     return {
-        "http": os.getenv("TOR_SOCKS", "socks5h://127.0.0.1:19050"),
-        "https": os.getenv("TOR_SOCKS", "socks5h://127.0.0.1:19050"),
+        "http": DEFAULT_SOCKS,
+        "https": DEFAULT_SOCKS,
     }
 
 # ---------- FETCH SINGLE SEARCH PAGE ----------
@@ -0,0 +1,103 @@
+"""
+Local SOCKS5 stand-in for Tor, for exercising the proxy pool without a Tor daemon.
+
+- listens on one or more ports; each port can add latency and fail a share of
+  connections, so the pool's slow-circuit routing can be observed
+- accepts no-auth and username/password auth (like IsolateSOCKSAuth)
+- *.onion hostnames are connected to ONION_TARGET (default 127.0.0.1)
+
+usage:
+    python -m tools.socks_standin 19050 19052:0.8 19054:0.1:0.5
+    (port[:latency_seconds[:failure_rate]])
+    TOR_SOCKS_POOL=socks5h://127.0.0.1:19050,socks5h://127.0.0.1:19052 python -m services.crawler.crawler_tor ...
+"""
+import os
+import sys
+import random
+import struct
+import asyncio
+
+ONION_TARGET = os.getenv("ONION_TARGET", "127.0.0.1")
+
+
+async def _pipe(reader, writer):
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except Exception:
+        pass
+    finally:
+        writer.close()
+
+
+def make_handler(latency: float, failure_rate: float):
+    async def handle(reader, writer):
+        try:
+            _, n_methods = await reader.readexactly(2)
+            methods = await reader.readexactly(n_methods)
+            if 2 in methods:
+                writer.write(b"\x05\x02")
+                await writer.drain()
+                await reader.readexactly(1)
+                await reader.readexactly((await reader.readexactly(1))[0])   # username
+                await reader.readexactly((await reader.readexactly(1))[0])   # password
+                writer.write(b"\x01\x00")
+            else:
+                writer.write(b"\x05\x00")
+            await writer.drain()
+
+            _, _, _, atyp = await reader.readexactly(4)
+            if atyp == 3:
+                host = (await reader.readexactly((await reader.readexactly(1))[0])).decode()
+            elif atyp == 1:
+                host = ".".join(str(b) for b in await reader.readexactly(4))
+            else:
+                raise ValueError("IPv6 not supported by stand-in")
+            port = struct.unpack(">H", await reader.readexactly(2))[0]
+
+            if latency:
+                await asyncio.sleep(latency)
+            if random.random() < failure_rate:
+                # 0x04 = host unreachable, what Tor reports for dead onions
+                writer.write(b"\x05\x04\x00\x01" + bytes(6))
+                await writer.drain()
+                writer.close()
+                return
+
+            target = ONION_TARGET if host.endswith(".onion") else host
+            up_reader, up_writer = await asyncio.open_connection(target, port)
+            writer.write(b"\x05\x00\x00\x01" + bytes(6))
+            await writer.drain()
+            await asyncio.gather(_pipe(reader, up_writer), _pipe(up_reader, writer))
+        except Exception:
+            writer.close()
+
+    return handle
+
+
+async def serve(specs):
+    servers = []
+    for spec in specs:
+        parts = spec.split(":")
+        port = int(parts[0])
+        latency = float(parts[1]) if len(parts) > 1 else 0.0
+        failure_rate = float(parts[2]) if len(parts) > 2 else 0.0
+        servers.append(await asyncio.start_server(make_handler(latency, failure_rate), "127.0.0.1", port))
+        print(f"SOCKS stand-in on 127.0.0.1:{port} latency={latency}s failure_rate={failure_rate}")
+    await asyncio.gather(*(s.serve_forever() for s in servers))
+
+
+def main():
+    specs = sys.argv[1:] or ["19050"]
+    try:
+        asyncio.run(serve(specs))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
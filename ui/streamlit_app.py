@@ -110,10 +110,13 @@ def load_threats(org, since_days, min_sev, limit):
 
 def load_full_page(pid):
 
+    # exact duplicates only link to the analyzed copy of their content (near
+    # duplicates keep their own clean_text)
     q = """
-    SELECT url, clean_text, fetched_at
-    FROM crawled_pages
-    WHERE id=:pid
+    SELECT cp.url, COALESCE(cp.clean_text, orig.clean_text) AS clean_text, cp.fetched_at
+    FROM crawled_pages cp
+    LEFT JOIN crawled_pages orig ON orig.id = cp.duplicate_of
+    WHERE cp.id=:pid
     """
 
     return pd.read_sql(text(q), engine.connect(), params={"pid": pid})